@@ -12,7 +12,8 @@ from app.models.tables import * # Import all models to ensure they are registere
 
 config = context.config
 
-if config.config_file_name is not None:
+# When the app runs migrations at startup it passes its own connection; leave its logging alone then
+if config.config_file_name is not None and "connection" not in config.attributes:
     fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
@@ -29,7 +30,24 @@ def run_migrations_offline() -> None:
     with context.begin_transaction():
         context.run_migrations()
 
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things in place; batch mode recreates the table
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
 def run_migrations_online() -> None:
+    # Connection handed over by app.migrations.run_migrations()
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
     # Handle env var override for DB URL
     from app.config import settings
     url = settings.DATABASE_URL
@@ -37,12 +55,7 @@ def run_migrations_online() -> None:
     connectable = create_engine(url)
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_with_connection(connection)
 
 # Need to import create_engine locally for online mode if not using config
 from sqlalchemy import create_engine
@@ -0,0 +1,124 @@
+"""baseline schema (what Base.metadata.create_all used to build)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'connections',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('provider', sa.String(), nullable=True),
+        sa.Column('user_label', sa.String(), nullable=True),
+        sa.Column('consent_id', sa.String(), nullable=True),
+        sa.Column('refresh_token_enc', sa.String(), nullable=True),
+        sa.Column('access_token_enc', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_connections_id', 'connections', ['id'])
+    op.create_index('ix_connections_consent_id', 'connections', ['consent_id'], unique=True)
+
+    op.create_table(
+        'accounts',
+        sa.Column('account_id', sa.String(), nullable=False),
+        sa.Column('connection_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('type', sa.String(), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+        sa.Column('masked_number', sa.String(), nullable=True),
+        sa.Column('last_sync_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['connection_id'], ['connections.id']),
+        sa.PrimaryKeyConstraint('account_id'),
+    )
+
+    op.create_table(
+        'transactions',
+        sa.Column('txn_id', sa.String(), nullable=False),
+        sa.Column('account_id', sa.String(), nullable=True),
+        sa.Column('booked_at', sa.DateTime(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('merchant', sa.String(), nullable=True),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('is_pending', sa.Boolean(), nullable=True),
+        sa.Column('raw_json', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.account_id']),
+        sa.PrimaryKeyConstraint('txn_id'),
+    )
+
+    op.create_table(
+        'balances',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('account_id', sa.String(), nullable=True),
+        sa.Column('as_of', sa.DateTime(), nullable=True),
+        sa.Column('available', sa.Float(), nullable=True),
+        sa.Column('current', sa.Float(), nullable=True),
+        sa.Column('raw_json', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.account_id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_balances_id', 'balances', ['id'])
+
+    op.create_table(
+        'category_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('pattern', sa.String(), nullable=True),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_category_rules_id', 'category_rules', ['id'])
+
+    op.create_table(
+        'oauth_states',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_oauth_states_id', 'oauth_states', ['id'])
+    op.create_index('ix_oauth_states_user_id', 'oauth_states', ['user_id'])
+    op.create_index('ix_oauth_states_state', 'oauth_states', ['state'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table('oauth_states')
+    op.drop_table('category_rules')
+    op.drop_table('balances')
+    op.drop_table('transactions')
+    op.drop_table('accounts')
+    op.drop_table('connections')
+    op.drop_table('users')
@@ -0,0 +1,34 @@
+"""composite indexes for the user-scoped transaction and balance queries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Connection.user_id -> Account.connection_id -> Transaction/Balance.account_id
+    op.create_index('ix_connections_user_id', 'connections', ['user_id'])
+    op.create_index('ix_accounts_connection_id', 'accounts', ['connection_id'])
+    # Range + ORDER BY booked_at per account
+    op.create_index('ix_transactions_account_id_booked_at', 'transactions', ['account_id', 'booked_at'])
+    # Latest balance per account: ORDER BY as_of DESC LIMIT 1
+    op.create_index('ix_balances_account_id_as_of', 'balances', ['account_id', 'as_of'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_balances_account_id_as_of', table_name='balances')
+    op.drop_index('ix_transactions_account_id_booked_at', table_name='transactions')
+    op.drop_index('ix_accounts_connection_id', table_name='accounts')
+    op.drop_index('ix_connections_user_id', table_name='connections')
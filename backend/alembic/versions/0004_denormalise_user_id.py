@@ -0,0 +1,42 @@
+"""user_id on transactions and balances
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_OWNER = (
+    "(SELECT connections.user_id FROM accounts "
+    "JOIN connections ON accounts.connection_id = connections.id "
+    "WHERE accounts.account_id = {table}.account_id)"
+)
+
+
+def upgrade() -> None:
+    for table in ('transactions', 'balances'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(f'fk_{table}_user_id_users', 'users', ['user_id'], ['id'])
+        op.execute(f"UPDATE {table} SET user_id = {_OWNER.format(table=table)}")
+
+    op.create_index('ix_transactions_user_id_booked_at', 'transactions', ['user_id', 'booked_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_user_id_booked_at', table_name='transactions')
+    for table in ('balances', 'transactions'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_user_id_users', type_='foreignkey')
+            batch_op.drop_column('user_id')
@@ -0,0 +1,44 @@
+"""latest balance columns on accounts
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_LATEST = (
+    "(SELECT balances.{column} FROM balances WHERE balances.account_id = accounts.account_id "
+    "ORDER BY balances.as_of DESC, balances.id DESC LIMIT 1)"
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.add_column(sa.Column('balance_current', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('balance_available', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('balance_as_of', sa.DateTime(), nullable=True))
+
+    op.execute(
+        "UPDATE accounts SET "
+        f"balance_current = {_LATEST.format(column='current')}, "
+        f"balance_available = {_LATEST.format(column='available')}, "
+        f"balance_as_of = {_LATEST.format(column='as_of')}"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.drop_column('balance_as_of')
+        batch_op.drop_column('balance_available')
+        batch_op.drop_column('balance_current')
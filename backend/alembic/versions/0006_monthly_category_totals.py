@@ -0,0 +1,45 @@
+"""monthly_category_totals rollup
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'monthly_category_totals',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=True),
+        sa.Column('txn_count', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'month', 'category'),
+    )
+
+    # Backfill from existing history (the same query rollups.rebuild_monthly_totals runs)
+    dialect = op.get_bind().dialect.name
+    month = "strftime('%Y-%m', booked_at)" if dialect == "sqlite" else "to_char(booked_at, 'YYYY-MM')"
+    op.execute(
+        "INSERT INTO monthly_category_totals (user_id, month, category, total, txn_count) "
+        f"SELECT user_id, {month}, category, sum(amount), count(*) FROM transactions "
+        f"WHERE user_id IS NOT NULL AND booked_at IS NOT NULL AND category IS NOT NULL "
+        f"GROUP BY user_id, {month}, category"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('monthly_category_totals')
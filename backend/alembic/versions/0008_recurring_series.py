@@ -0,0 +1,89 @@
+"""transactions.merchant_key and the recurring_series index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 10:00:00.000000
+
+recurring_series starts empty and is backfilled by 0012. Sync keeps it current
+from then on; `python rebuild_recurring.py` rebuilds it by hand.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 5000
+
+
+def _merchant_key(merchant, description):
+    # Frozen copy of app.services.recurring.merchant_key at this revision
+    if isinstance(merchant, str) and merchant:
+        return merchant.lower().strip()
+    return str(description).lower()[:20]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('merchant_key', sa.String(), nullable=True))
+    op.create_index('ix_transactions_user_id_merchant_key', 'transactions', ['user_id', 'merchant_key'])
+
+    op.create_table(
+        'recurring_series',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('merchant_key', sa.String(), nullable=False),
+        sa.Column('frequency', sa.String(), nullable=True),
+        sa.Column('median_gap_days', sa.Float(), nullable=True),
+        sa.Column('txn_count', sa.Integer(), nullable=True),
+        sa.Column('first_at', sa.DateTime(), nullable=True),
+        sa.Column('last_at', sa.DateTime(), nullable=True),
+        sa.Column('next_at', sa.DateTime(), nullable=True),
+        sa.Column('last_amount', sa.Float(), nullable=True),
+        sa.Column('mean_amount', sa.Float(), nullable=True),
+        sa.Column('std_amount', sa.Float(), nullable=True),
+        sa.Column('has_transfers', sa.Boolean(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'merchant_key'),
+    )
+
+    # Backfill keys in Python: SQL lower() is ASCII-only on SQLite
+    bind = op.get_bind()
+    txns = sa.table(
+        'transactions',
+        sa.column('txn_id', sa.String()),
+        sa.column('merchant', sa.String()),
+        sa.column('description', sa.String()),
+        sa.column('merchant_key', sa.String()),
+    )
+    update = (
+        txns.update()
+        .where(txns.c.txn_id == sa.bindparam('b_txn_id'))
+        .values(merchant_key=sa.bindparam('b_merchant_key'))
+    )
+    cursor = None
+    while True:
+        query = sa.select(txns.c.txn_id, txns.c.merchant, txns.c.description).order_by(txns.c.txn_id).limit(BATCH)
+        if cursor is not None:
+            query = query.where(txns.c.txn_id > cursor)
+        rows = bind.execute(query).all()
+        if not rows:
+            break
+        bind.execute(update, [
+            {"b_txn_id": txn_id, "b_merchant_key": _merchant_key(merchant, description)}
+            for txn_id, merchant, description in rows
+        ])
+        cursor = rows[-1].txn_id
+
+
+def downgrade() -> None:
+    op.drop_table('recurring_series')
+    op.drop_index('ix_transactions_user_id_merchant_key', table_name='transactions')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_column('merchant_key')
@@ -0,0 +1,56 @@
+"""per-connection sync schedule: activity stats and next_sync_at
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 13:00:00.000000
+
+Existing connections are backfilled from their stored data, so active ones
+keep syncing hourly from the first scheduled run rather than looking dormant.
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RATE_DAYS = 30
+_CONNECTION_TXNS = (
+    "FROM transactions JOIN accounts ON accounts.account_id = transactions.account_id "
+    "WHERE accounts.connection_id = connections.id"
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('connections') as batch_op:
+        batch_op.add_column(sa.Column('last_synced_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_change_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('txn_rate', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('next_sync_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_connections_status_next_sync_at', 'connections', ['status', 'next_sync_at'])
+
+    # next_sync_at stays NULL: every connection is due on the first run, which schedules it
+    since = sa.bindparam('since', datetime.utcnow() - timedelta(days=RATE_DAYS), type_=sa.DateTime())
+    op.get_bind().execute(
+        sa.text(
+            "UPDATE connections SET "
+            "last_synced_at = (SELECT MAX(accounts.last_sync_at) FROM accounts WHERE accounts.connection_id = connections.id), "
+            f"last_change_at = (SELECT MAX(transactions.booked_at) {_CONNECTION_TXNS}), "
+            f"txn_rate = (SELECT COUNT(*) {_CONNECTION_TXNS} AND transactions.booked_at >= :since) / {float(RATE_DAYS)}"
+        ).bindparams(since)
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_connections_status_next_sync_at', table_name='connections')
+    with op.batch_alter_table('connections') as batch_op:
+        batch_op.drop_column('next_sync_at')
+        batch_op.drop_column('txn_rate')
+        batch_op.drop_column('last_change_at')
+        batch_op.drop_column('last_synced_at')
@@ -0,0 +1,173 @@
+"""backfill recurring_series for users with history but no series
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 14:00:00.000000
+
+0008 created recurring_series empty. Until it is filled, forecasts project no
+bills and /api/transactions classifies nothing as a bill, and sync only
+refreshes the merchant keys it touches, so rarer bills (quarterly, yearly)
+would stay missing for months. Users who already have series are left alone.
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of app.services.recurring at this revision (FREQUENCIES,
+# TRANSFER_KEYWORDS, is_transfer, find_series, _series_rows)
+FREQUENCIES = (
+    ("weekly", 6, 8, 7),
+    ("monthly", 26, 35, 30),
+    ("yearly", 360, 370, 365),
+)
+TRANSFER_KEYWORDS = ('transfer', 'internal', 'save the change', 'credit card payment')
+
+transactions = sa.table(
+    'transactions',
+    sa.column('txn_id', sa.String()),
+    sa.column('user_id', sa.Integer()),
+    sa.column('booked_at', sa.DateTime()),
+    sa.column('amount', sa.Float()),
+    sa.column('description', sa.String()),
+    sa.column('merchant_key', sa.String()),
+)
+recurring_series = sa.table(
+    'recurring_series',
+    sa.column('user_id', sa.Integer()),
+    sa.column('merchant_key', sa.String()),
+    sa.column('frequency', sa.String()),
+    sa.column('median_gap_days', sa.Float()),
+    sa.column('txn_count', sa.Integer()),
+    sa.column('first_at', sa.DateTime()),
+    sa.column('last_at', sa.DateTime()),
+    sa.column('next_at', sa.DateTime()),
+    sa.column('last_amount', sa.Float()),
+    sa.column('mean_amount', sa.Float()),
+    sa.column('std_amount', sa.Float()),
+    sa.column('has_transfers', sa.Boolean()),
+    sa.column('updated_at', sa.DateTime()),
+)
+
+
+def _is_transfer(description):
+    if not description:
+        return False
+    d = description.lower()
+    return any(k in d for k in TRANSFER_KEYWORDS)
+
+
+def _find_series(df):
+    # Rows ordered by (key, booked_at), and one row per recurring key with its stats
+    codes, names = pd.factorize(df['key'], sort=True)
+    order = np.lexsort((df.index.values, codes))
+    ordered = df.iloc[order]
+    codes = codes[order]
+    dates = ordered.index
+
+    gaps = pd.Series((dates[1:] - dates[:-1]).days, dtype='float64')
+    gaps = gaps.where(codes[1:] == codes[:-1])
+    work = pd.DataFrame({
+        'code': codes,
+        'amount': ordered['amount'].to_numpy(dtype='float64'),
+        'gap': np.concatenate(([np.nan], gaps.to_numpy())),
+    })
+    stats = work.groupby('code', sort=True).agg(
+        size=('amount', 'size'),
+        median_gap=('gap', 'median'),
+        mean_amt=('amount', 'mean'),
+        std_amt=('amount', 'std'),
+    )
+    stats['end'] = stats['size'].cumsum()
+    stats['start'] = stats['end'] - stats['size']
+
+    stats['frequency'] = None
+    stats['days_to_add'] = 0
+    for label, low, high, days in FREQUENCIES:
+        hit = stats['median_gap'].between(low, high)
+        stats.loc[hit, 'frequency'] = label
+        stats.loc[hit, 'days_to_add'] = days
+
+    cv = (stats['std_amt'] / stats['mean_amt'].abs()).where(stats['mean_amt'].abs() > 0.01, 0)
+    is_consistent = (cv < 0.2) | (stats['std_amt'] < 1.0)
+    bills = stats[(stats['size'] >= 2) & stats['frequency'].notna() & is_consistent]
+    return ordered, bills.set_axis(names[bills.index])
+
+
+def _series_rows(user_id, df, now):
+    df = df.set_index('booked_at')
+    df['key'] = df['merchant_key'].astype(object)
+    ordered, bills = _find_series(df)
+    transfers = ordered['description'].map(_is_transfer).to_numpy(dtype=bool) if len(bills) else None
+
+    rows = []
+    for key, bill in zip(bills.index, bills.itertuples(index=False)):
+        dates = ordered.index[bill.start:bill.end]
+        last_at = dates[-1].to_pydatetime()
+        rows.append({
+            "user_id": user_id,
+            "merchant_key": key,
+            "frequency": bill.frequency,
+            "median_gap_days": float(bill.median_gap),
+            "txn_count": int(bill.size),
+            "first_at": dates[0].to_pydatetime(),
+            "last_at": last_at,
+            "next_at": last_at + timedelta(days=int(bill.days_to_add)),
+            "last_amount": float(ordered['amount'].iloc[bill.end - 1]),
+            "mean_amount": float(bill.mean_amt),
+            "std_amount": float(bill.std_amt),
+            "has_transfers": bool(transfers[bill.start:bill.end].any()),
+            "updated_at": now,
+        })
+    return rows
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    user_ids = bind.execute(
+        sa.select(transactions.c.user_id).distinct()
+        .where(
+            transactions.c.user_id.isnot(None),
+            transactions.c.merchant_key.isnot(None),
+            transactions.c.user_id.notin_(sa.select(recurring_series.c.user_id)),
+        )
+        .order_by(transactions.c.user_id)
+    ).scalars().all()
+
+    now = datetime.utcnow()
+    for user_id in user_ids:
+        # Same rows, types and input order as rebuild_series loads
+        result = bind.execute(
+            sa.select(
+                transactions.c.txn_id, transactions.c.booked_at, transactions.c.amount,
+                transactions.c.description, transactions.c.merchant_key,
+            )
+            .where(
+                transactions.c.user_id == user_id,
+                transactions.c.merchant_key.isnot(None),
+            )
+            .order_by(transactions.c.txn_id)
+        )
+        df = pd.DataFrame(result.all(), columns=list(result.keys()))
+        if df.empty:
+            continue
+        df['booked_at'] = pd.to_datetime(df['booked_at'].astype(object))
+        df['amount'] = df['amount'].astype('float64')
+        rows = _series_rows(user_id, df, now)
+        if rows:
+            bind.execute(recurring_series.insert(), rows)
+
+
+def downgrade() -> None:
+    # The rows are a derived index; 0011's schema is unchanged
+    pass
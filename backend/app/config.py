@@ -18,6 +18,69 @@ class Settings(BaseSettings):
     JWT_SECRET: str | None = None
     FRONTEND_URL: str = "http://localhost:3000"
 
+    # DB connection pool, shared by API threads, sync workers and the scheduler.
+    # Recycle and pre-ping apply to server databases only.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLite only: WAL lets readers run alongside the writer; busy_timeout waits on a lock instead of failing
+    SQLITE_WAL: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Statements slower than this are logged and counted (0 disables)
+    DB_SLOW_QUERY_MS: int = 500
+    # If set, /metrics requires `Authorization: Bearer <METRICS_TOKEN>`
+    METRICS_TOKEN: str | None = None
+
+    # Serve the I/O-bound routes with async handlers on an async engine (asyncpg/aiosqlite)
+    ASYNC_DB: bool = False
+
+    # TrueLayer HTTP client: timeouts (seconds), retries with jittered exponential
+    # backoff, and a client-wide rate limit (requests/second, with bursts)
+    TRUELAYER_CONNECT_TIMEOUT: float = 5.0
+    TRUELAYER_READ_TIMEOUT: float = 30.0
+    TRUELAYER_MAX_RETRIES: int = 4
+    TRUELAYER_BACKOFF_BASE: float = 0.5
+    TRUELAYER_BACKOFF_MAX: float = 30.0
+    TRUELAYER_RATE_LIMIT: float = 20.0
+    TRUELAYER_RATE_BURST: int = 40
+
+    # Access tokens are reused until this many seconds before they expire
+    TOKEN_REFRESH_MARGIN: int = 300
+
+    # Per-connection sync schedule: intervals follow each connection's transaction rate within
+    # [MIN, MAX], capped at ACTIVE_INTERVAL for connections with new transactions in ACTIVE_DAYS
+    SYNC_MIN_INTERVAL_MINUTES: int = 30
+    SYNC_MAX_INTERVAL_MINUTES: int = 1440
+    SYNC_ACTIVE_INTERVAL_MINUTES: int = 60
+    SYNC_ACTIVE_DAYS: int = 7
+
+    # Sync engine: connections synced in parallel, and TrueLayer calls in flight per run
+    SYNC_MAX_WORKERS: int = 8
+    SYNC_MAX_CONCURRENCY: int = 16
+
+    # SYNC_QUEUE: the API only enqueues sync jobs (sync_jobs table) and `python sync_worker.py`
+    # processes run them under per-connection leases, with heartbeats and retry backoff
+    SYNC_QUEUE: bool = False
+    SYNC_JOB_LEASE_SECONDS: int = 300
+    SYNC_JOB_MAX_ATTEMPTS: int = 5
+    SYNC_JOB_BACKOFF_BASE: float = 60.0
+    SYNC_JOB_BACKOFF_MAX: float = 3600.0
+    SYNC_WORKER_POLL_SECONDS: float = 5.0
+
+    # Balance snapshots older than this are downsampled to one per account per day
+    BALANCE_HISTORY_RAW_DAYS: int = 7
+
+    # Forecast cache: in-process LRU size, optional on-disk tier, and horizons precomputed after sync
+    FORECAST_CACHE_SIZE: int = 256
+    FORECAST_CACHE_DIR: str | None = None
+    FORECAST_WARM_DAYS: list[int] = [30]
+
+    # Batch forecaster: worker processes (0 = one per CPU) and the horizons it precomputes
+    FORECAST_BATCH_WORKERS: int = 0
+    FORECAST_BATCH_DAYS: list[int] = [30]
+
     @field_validator("TRUELAYER_CLIENT_ID", "TRUELAYER_CLIENT_SECRET", "TRUELAYER_REDIRECT_URI", "TRUELAYER_AUTH_URL", "TRUELAYER_API_URL", "ENCRYPTION_KEY", "JWT_SECRET", "FRONTEND_URL")
     @classmethod
     def strip_whitespace(cls, v: str) -> str:
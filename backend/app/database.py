@@ -1,8 +1,43 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
+from app import metrics
 
-engine = create_engine(settings.DATABASE_URL)
+def engine_options(url, poolclass=metrics.InstrumentedQueuePool) -> dict:
+    """create_engine keyword arguments for `url` from the DB_POOL_* settings."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in one connection per thread; there is no pool to size
+        return {}
+    options = {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    if parsed.get_backend_name() != "sqlite":
+        options["pool_recycle"] = settings.DB_POOL_RECYCLE
+        options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Durable at each WAL checkpoint rather than every commit; safe against corruption
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+def configure_engine(engine, name: str):
+    """SQLite pragmas on each new connection, plus statement and pool metrics."""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    metrics.instrument_engine(engine, name)
+    return engine
+
+engine = configure_engine(create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL)), "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -12,4 +47,41 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- Async (ASYNC_DB=1) ---
+# Same database through an async driver. Created on first use, so the sync-only
+# deployment never imports asyncpg/aiosqlite.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+
+_async_sessionmaker = None
+
+def async_database_url(url: str):
+    """DATABASE_URL with its driver swapped for the async one (psycopg2 -> asyncpg, pysqlite -> aiosqlite)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+    if "sslmode" in parsed.query:
+        # libpq spelling; asyncpg takes the same values as `ssl`
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed
+
+def get_async_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = async_database_url(settings.DATABASE_URL)
+        async_engine = create_async_engine(url, **engine_options(url, poolclass=metrics.InstrumentedAsyncQueuePool))
+        configure_engine(async_engine.sync_engine, "async")
+        # expire_on_commit=False: attribute access after commit would need an await
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
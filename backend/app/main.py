@@ -1,15 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, sync, data, users
-from app.database import engine, Base
+from app.routers import auth, sync, data, data_async, users, users_async
+from app.migrations import run_migrations
 from app.config import settings
+from app import metrics
 from apscheduler.schedulers.background import BackgroundScheduler
-from app.routers.sync import run_sync_job_logic
+from app.routers.sync import run_scheduled_sync_job
+from app.services.balance_history import run_compaction_job
+from app.services.batch_forecast import run_batch_forecast_job
+from app.services.sync_queue import run_enqueue_job
 import logging
 import os
 
-# Initialize DB tables (for MVP)
-Base.metadata.create_all(bind=engine)
+# Bring the schema up to date (alembic/versions)
+run_migrations()
 
 app = FastAPI(title="Spending Dashboard API")
 
@@ -28,14 +32,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(users.router) # Auth Endpoints (Register/Login)
+# Added last so it wraps CORS; unhandled errors are counted as 500s
+app.add_middleware(metrics.PrometheusMiddleware)
+
+# ASYNC_DB swaps in the async twins of the user and data routers (same paths and responses)
+app.include_router((users_async if settings.ASYNC_DB else users).router) # Auth Endpoints (Register/Login)
 app.include_router(auth.router)  # TrueLayer Auth
 app.include_router(sync.router)
-app.include_router(data.router)
+app.include_router((data_async if settings.ASYNC_DB else data).router)
 
 # Scheduler
 scheduler = BackgroundScheduler()
-scheduler.add_job(run_sync_job_logic, 'interval', hours=1)
+# Each connection has its own next_sync_at (app/services/sync_schedule.py); these only pick up the due ones
+if settings.SYNC_QUEUE:
+    # Every replica enqueues (idempotently); sync_worker.py processes run the jobs
+    scheduler.add_job(run_enqueue_job, 'interval', minutes=5)
+else:
+    scheduler.add_job(run_scheduled_sync_job, 'interval', minutes=5)
+    # Between hourly syncs; only stale users are refitted. With SYNC_QUEUE there are
+    # several replicas, so run `python batch_forecast.py` hourly from one host instead
+    scheduler.add_job(run_batch_forecast_job, 'cron', minute=30)
+scheduler.add_job(run_compaction_job, 'cron', hour=3)
 if os.getenv("DISABLE_SCHEDULER") != "1":
     scheduler.start()
 
@@ -48,6 +65,13 @@ def shutdown_event():
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: str | None = Header(None)):
+    """Prometheus scrape target (text exposition format)."""
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 @app.get("/")
 def root():
     return {"message": "Banking Dashboard API is running. Go to /docs for Swagger UI."}
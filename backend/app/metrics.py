@@ -0,0 +1,245 @@
+"""
+Prometheus metrics for this process, rendered by GET /metrics.
+
+Metrics live in the default prometheus_client registry. Recording one is a
+lock and an add (about a microsecond), so it is safe on hot paths; label
+children that are hit per request or statement are bound once and reused.
+Batch forecasts fitted in worker processes are recorded by the parent.
+"""
+import logging
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Database ---
+
+DB_STATEMENT_SECONDS = Histogram(
+    "vault_db_statement_seconds",
+    "Time to execute one SQL statement, by leading keyword",
+    ["engine", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_SLOW_STATEMENTS = Counter(
+    "vault_db_slow_statements_total",
+    "Statements slower than DB_SLOW_QUERY_MS",
+    ["engine", "operation"],
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "vault_db_pool_checkout_seconds",
+    "Time to get a connection from the pool, including waiting for one to be free",
+    ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "vault_db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "vault_db_pool_connections",
+    "Pooled connections: checked_out, idle, or overflow beyond pool_size",
+    ["engine", "state"],
+)
+
+_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA"})
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip()[:8].split(None, 1)
+    word = word[0].upper() if word else ""
+    return word if word in _OPERATIONS else "OTHER"
+
+
+class _TimedCheckout:
+    """Pool mixin timing connect(): the wait for a free slot plus opening a connection if needed."""
+
+    metrics_name = "sync"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.metrics_name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.metrics_name).observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+def instrument_engine(engine, name: str):
+    """Records statement latency (and logs slow statements) for a sync Engine, and exports its pool gauges."""
+    slow_seconds = settings.DB_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    # Bound label children per operation: labels() takes a lock and builds a key on every call
+    children = {
+        operation: (DB_STATEMENT_SECONDS.labels(name, operation), DB_SLOW_STATEMENTS.labels(name, operation))
+        for operation in _OPERATIONS | {"OTHER"}
+    }
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        operation = _operation(statement)
+        latency, slow = children[operation]
+        latency.observe(elapsed)
+        if slow_seconds and elapsed >= slow_seconds:
+            slow.inc()
+            # Statement text only: parameters can hold personal data
+            logger.warning(f"Slow query ({elapsed * 1000:.0f}ms, {name}): {' '.join(statement.split())[:500]}")
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        started = context.connection.info.get("statement_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        DB_POOL_CONNECTIONS.labels(name, "checked_out").set_function(pool.checkedout)
+        DB_POOL_CONNECTIONS.labels(name, "idle").set_function(pool.checkedin)
+        DB_POOL_CONNECTIONS.labels(name, "overflow").set_function(lambda: max(pool.overflow(), 0))
+
+
+# --- HTTP API ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "vault_http_request_duration_seconds",
+    "Time from request start to the last byte of the response, per route template",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_REQUESTS = Counter(
+    "vault_http_requests_total",
+    "Responses sent, per route template and status code",
+    ["method", "route", "status"],
+)
+
+# Requests that matched no route share one label instead of one per URL
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request, streamed bodies included.
+    The route label is the matched path template (/api/connections/{connection_id}),
+    which the router stores in the scope.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._children = {}
+
+    def _child(self, method: str, route: str, status: int):
+        key = (method, route, status)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = (
+                HTTP_REQUEST_SECONDS.labels(method, route),
+                HTTP_REQUESTS.labels(method, route, str(status)),
+            )
+        return child
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            latency, count = self._child(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status)
+            latency.observe(time.perf_counter() - started)
+            count.inc()
+
+
+# --- Sync ---
+
+SYNC_RUNS = Counter("vault_sync_runs_total", "Sync engine runs")
+SYNC_RUN_SECONDS = Histogram(
+    "vault_sync_run_seconds",
+    "Wall time of one sync run across all its connections",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+SYNC_CONNECTION_SECONDS = Histogram(
+    "vault_sync_connection_seconds",
+    "Time to sync one connection, by outcome",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+SYNC_TRANSACTIONS = Counter(
+    "vault_sync_transactions_total",
+    "Transactions fetched from TrueLayer, and of those newly inserted",
+    ["stage"],
+)
+SYNC_JOBS = Counter(
+    "vault_sync_jobs_total",
+    "Queued sync jobs finished by workers: done, retry (requeued with backoff), failed (out of attempts) or lost (lease taken over)",
+    ["outcome"],
+)
+
+# --- TrueLayer ---
+
+TRUELAYER_REQUEST_SECONDS = Histogram(
+    "vault_truelayer_request_seconds",
+    "TrueLayer HTTP call latency, per endpoint",
+    ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+TRUELAYER_RESPONSES = Counter(
+    "vault_truelayer_responses_total",
+    "TrueLayer HTTP calls by endpoint and status code ('error' when no response arrived)",
+    ["endpoint", "status"],
+)
+
+TRUELAYER_RETRIES = Counter(
+    "vault_truelayer_retries_total",
+    "TrueLayer calls retried after a retryable status or connection error",
+    ["endpoint"],
+)
+
+# --- Forecasting ---
+
+FORECAST_SECONDS = Histogram(
+    "vault_forecast_seconds",
+    "Time to compute one forecast: inline in the API, or per user in the batch forecaster",
+    ["engine", "source"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+FORECAST_REQUESTS = Counter(
+    "vault_forecast_requests_total",
+    "Forecast lookups by where the answer came from: cache, stored (batch) or computed",
+    ["result"],
+)
+
+
+def render() -> bytes:
+    """Every metric in the Prometheus text exposition format."""
+    return generate_latest()
@@ -0,0 +1,45 @@
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Schema that Base.metadata.create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+# Arbitrary key so only one API worker migrates a Postgres database at a time
+_PG_LOCK_KEY = 7_340_112
+
+
+def alembic_config(connection=None) -> Config:
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    if connection is not None:
+        cfg.attributes["connection"] = connection
+    return cfg
+
+
+def run_migrations(bind=None):
+    """
+    Upgrades the database to the latest Alembic revision.
+
+    Databases created by the old `Base.metadata.create_all` call (tables present,
+    no alembic_version) are stamped at the baseline revision first so only the
+    newer migrations run against them.
+    """
+    bind = bind if bind is not None else engine
+    with bind.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+
+        cfg = alembic_config(connection)
+        tables = set(inspect(connection).get_table_names())
+        if "users" in tables and "alembic_version" not in tables:
+            logger.info(f"Existing schema without alembic_version; stamping baseline {BASELINE_REVISION}")
+            command.stamp(cfg, BASELINE_REVISION)
+        command.upgrade(cfg, "head")
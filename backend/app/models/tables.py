@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Float, JSON, Boolean
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Float, JSON, Boolean, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -9,12 +9,13 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    data_version = Column(Integer, nullable=False, default=0, server_default="0") # Bumped whenever the user's transactions change
 
 class Connection(Base):
     __tablename__ = "connections"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Nullable for migration, but logic should enforce
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True) # Nullable for migration, but logic should enforce
     provider = Column(String) # e.g. "mock-payments-gb-redirect" or "barclays"
     user_label = Column(String, nullable=True)
     consent_id = Column(String, unique=True, index=True, nullable=True) # ID from TrueLayer
@@ -23,37 +24,61 @@ class Connection(Base):
     status = Column(String) # "active", "expired", "pending"
     expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Sync schedule (app/services/sync_schedule.py)
+    last_synced_at = Column(DateTime, nullable=True) # Last successful sync
+    last_change_at = Column(DateTime, nullable=True) # Last sync that brought new transactions
+    txn_rate = Column(Float, nullable=True) # New transactions per day, decaying average
+    next_sync_at = Column(DateTime, nullable=True) # Due from then; NULL means due now
+
+    __table_args__ = (
+        Index("ix_connections_status_next_sync_at", "status", "next_sync_at"),
+    )
 
 class Account(Base):
     __tablename__ = "accounts"
 
     account_id = Column(String, primary_key=True) # TrueLayer account_id
-    connection_id = Column(Integer, ForeignKey("connections.id"))
+    connection_id = Column(Integer, ForeignKey("connections.id"), index=True)
     name = Column(String)
     type = Column(String)
     currency = Column(String)
     masked_number = Column(String, nullable=True)
     last_sync_at = Column(DateTime, nullable=True)
+    # Latest balance snapshot, upserted by sync (history lives in `balances`)
+    balance_current = Column(Float, nullable=True)
+    balance_available = Column(Float, nullable=True)
+    balance_as_of = Column(DateTime, nullable=True)
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_account_id_booked_at", "account_id", "booked_at"),
+        Index("ix_transactions_user_id_booked_at", "user_id", "booked_at"),
+        Index("ix_transactions_user_id_merchant_key", "user_id", "merchant_key"),
+    )
 
     txn_id = Column(String, primary_key=True) # TrueLayer transaction_id or hash
     account_id = Column(String, ForeignKey("accounts.account_id"))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Denormalised from Connection.user_id
     booked_at = Column(DateTime)
     amount = Column(Float)
     currency = Column(String)
     description = Column(String)
     merchant = Column(String, nullable=True)
+    merchant_key = Column(String, nullable=True) # Recurring-detection group, see services/recurring.py
     category = Column(String, default="Uncategorised")
     is_pending = Column(Boolean, default=False)
     raw_json = Column(JSON)
 
 class Balance(Base):
     __tablename__ = "balances"
+    __table_args__ = (
+        Index("ix_balances_account_id_as_of", "account_id", "as_of"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(String, ForeignKey("accounts.account_id"))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Denormalised from Connection.user_id
     as_of = Column(DateTime)
     available = Column(Float, nullable=True)
     current = Column(Float, nullable=True)
@@ -74,3 +99,70 @@ class OAuthState(Base):
     state = Column(String, unique=True, index=True)
     expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String, primary_key=True) # e.g. "recategorise:all" or "recategorise:user:42"
+    cursor = Column(String, nullable=True) # Last key fully processed (keyset pagination)
+    status = Column(String, default="running") # "running", "done", "failed"
+    processed = Column(Integer, default=0)
+    changed = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class MonthlyCategoryTotal(Base):
+    __tablename__ = "monthly_category_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(String, primary_key=True) # "YYYY-MM"
+    category = Column(String, primary_key=True)
+    total = Column(Float, default=0.0)
+    txn_count = Column(Integer, default=0)
+
+class RecurringSeries(Base):
+    __tablename__ = "recurring_series"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    merchant_key = Column(String, primary_key=True) # Members are the user's transactions with this merchant_key
+    frequency = Column(String) # "weekly", "monthly", "yearly"
+    median_gap_days = Column(Float)
+    txn_count = Column(Integer)
+    first_at = Column(DateTime)
+    last_at = Column(DateTime)
+    next_at = Column(DateTime) # Projected next occurrence
+    last_amount = Column(Float)
+    mean_amount = Column(Float)
+    std_amount = Column(Float)
+    has_transfers = Column(Boolean, default=False) # Some members look like internal transfers; not projected in forecasts
+    updated_at = Column(DateTime)
+
+class Forecast(Base):
+    __tablename__ = "forecasts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    days = Column(Integer, primary_key=True) # Horizon
+    data_version = Column(Integer, nullable=False) # User.data_version the forecast was fitted on
+    payload = Column(JSON) # generate_forecast output, served as-is by /api/forecast
+    fit_seconds = Column(Float)
+    computed_at = Column(DateTime)
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+
+    connection_id = Column(Integer, ForeignKey("connections.id"), primary_key=True) # At most one job per connection
+    status = Column(String, nullable=False, default="queued") # "queued", "running", "done", "failed"
+    run_after = Column(DateTime, nullable=False) # Not claimed before this (retry backoff)
+    attempts = Column(Integer, nullable=False, default=0) # Claims since the last success
+    lease_owner = Column(String, nullable=True) # Worker holding the job while "running"
+    lease_expires_at = Column(DateTime, nullable=True) # Extended by heartbeats; past it, any worker may reclaim
+    last_error = Column(String, nullable=True)
+    enqueued_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_sync_jobs_status_run_after", "status", "run_after"),
+    )
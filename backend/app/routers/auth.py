@@ -3,7 +3,8 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.config import settings
-from app.services import truelayer, crypto
+from app.services import truelayer
+from app.services.tokens import store_tokens
 from app.models.tables import Connection, OAuthState
 from app.routers.users import get_current_user
 import uuid
@@ -75,11 +76,10 @@ def auth_callback(code: str, state: str, db: Session = Depends(get_db), provider
     conn = Connection(
         user_id=oauth_state.user_id,
         provider=final_provider_id,
-        access_token_enc=crypto.encrypt(tokens["access_token"]),
-        refresh_token_enc=crypto.encrypt(tokens["refresh_token"]),
         status="active",
-        # expires_in is usually 3600 (1h)
     )
+    # Tokens and their expiry (expires_in is usually 3600, 1h)
+    store_tokens(conn, tokens)
     db.add(conn)
     db.commit()
     db.refresh(conn)
@@ -1,59 +1,162 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
 from typing import List, Optional
-from datetime import date, datetime
-import pandas as pd
+from datetime import date, datetime, timedelta
+import base64
+import json
 
-from app.database import get_db
-from app.models.tables import Transaction, Account, Connection, Balance
+from app.database import SessionLocal, get_db
+from app.models.tables import Transaction, Account, Connection, Balance, MonthlyCategoryTotal, RecurringSeries, SyncJob
 from app.schemas import TransactionOut, BalanceOut, ConnectionOut
-from app.services import forecasting
+from app.services import export, forecasting, forecast_cache, recurring, rollups, tokens
 from app.routers.users import get_current_user
 
 router = APIRouter()
 
-@router.get("/api/balances", response_model=List[BalanceOut])
-def get_balances(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    accounts = (
-        db.query(Account, Connection.provider)
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+MAX_FORECAST_DAYS = 1825 # Five years
+STREAM_BATCH = 500 # Rows fetched per round trip when streaming NDJSON
+EXPORT_BATCH = 10000 # Rows per fetch, and per Parquet row group / Arrow batch, in exports
+
+TRANSACTION_OUT_COLUMNS = (
+    "txn_id", "account_id", "booked_at", "amount", "currency", "description", "merchant", "merchant_key", "category",
+)
+
+# Statements and row shaping shared with the async handlers in data_async.py
+
+def balances_query(user_id: int):
+    # Latest balance is materialised on the account row by sync: one query, no per-account lookup
+    return (
+        select(Account, Connection.provider)
         .join(Connection, Account.connection_id == Connection.id)
-        .filter(Connection.user_id == current_user.id)
-        .all()
+        .where(Connection.user_id == user_id)
+    )
+
+def balance_out(acc: Account, provider: Optional[str]) -> dict:
+    return {
+        "account_id": acc.account_id,
+        "account_name": acc.name,
+        "provider_id": provider,
+        "currency": acc.currency,
+        "current": acc.balance_current if acc.balance_as_of else 0.0,
+        "available": acc.balance_available if acc.balance_as_of else 0.0,
+        "updated_at": acc.balance_as_of or datetime.now(),
+    }
+
+def connections_query(user_id: int):
+    return select(Connection).where(Connection.user_id == user_id)
+
+def monthly_summary_query(user_id: int):
+    # Maintained incrementally by sync/recategorise; see services/rollups.py
+    return (
+        select(MonthlyCategoryTotal)
+        .where(MonthlyCategoryTotal.user_id == user_id, MonthlyCategoryTotal.txn_count > 0)
+        .order_by(MonthlyCategoryTotal.month.desc(), MonthlyCategoryTotal.category)
+    )
+
+def account_labels_query(user_id: int):
+    return (
+        select(Account.account_id, Account.name, Connection.provider)
+        .join(Connection, Account.connection_id == Connection.id)
+        .where(Connection.user_id == user_id)
+    )
+
+def bill_keys_query(user_id: int):
+    # Bills are the user's persisted recurring series, not re-detected per request
+    return select(RecurringSeries.merchant_key).where(RecurringSeries.user_id == user_id)
+
+def encode_cursor(booked_at: datetime, txn_id: str) -> str:
+    raw = json.dumps([booked_at.isoformat(), txn_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        booked_at, txn_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(booked_at), str(txn_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def transactions_query(user_id: int, start_date, end_date, account_id, cursor, undated: bool = False):
+    # Newest first; (booked_at, txn_id) is unique, so it is a stable keyset. Undated rows
+    # have no place in it (and no cursor), so only unpaged callers may ask for them
+    stmt = (
+        select(*(getattr(Transaction, c) for c in TRANSACTION_OUT_COLUMNS))
+        .where(Transaction.user_id == user_id)
+        .order_by(Transaction.booked_at.desc(), Transaction.txn_id.desc())
     )
+    if not undated:
+        stmt = stmt.where(Transaction.booked_at.isnot(None))
+    if start_date:
+        stmt = stmt.where(Transaction.booked_at >= start_date)
+    if end_date:
+        # Whole end day: booked_at is a timestamp, end_date alone would mean its midnight
+        stmt = stmt.where(Transaction.booked_at < end_date + timedelta(days=1))
+    if account_id:
+        stmt = stmt.where(Transaction.account_id == account_id)
+    if cursor:
+        booked_at, txn_id = decode_cursor(cursor)
+        # Expanded row comparison so the (user_id, booked_at) index still applies
+        stmt = stmt.where(or_(
+            Transaction.booked_at < booked_at,
+            and_(Transaction.booked_at == booked_at, Transaction.txn_id < txn_id),
+        ))
+    return stmt
+
+class TransactionRows:
+    """Turns selected transaction rows into TransactionOut dicts, classified from the recurring index."""
+
+    def __init__(self, labels, bill_keys):
+        self.names = {acc_id: name for acc_id, name, _ in labels}
+        self.providers = {acc_id: provider for acc_id, _, provider in labels}
+        self.bill_keys = set(bill_keys)
+
+    @classmethod
+    def load(cls, db: Session, user_id: int):
+        return cls(db.execute(account_labels_query(user_id)).all(), db.execute(bill_keys_query(user_id)).scalars())
+
+    def __call__(self, row) -> dict:
+        out = {c: getattr(row, c) for c in TRANSACTION_OUT_COLUMNS if c != "merchant_key"}
+        key = row.merchant_key or recurring.merchant_key(row.merchant, row.description)
+        out["account_name"] = self.names.get(row.account_id)
+        out["provider_id"] = self.providers.get(row.account_id)
+        out["classification"] = forecasting.classify_transaction(row.amount, key, self.bill_keys)
+        return out
+
+def ndjson_lines(rows: list[dict]) -> str:
+    return "".join(json.dumps(row, default=_json_default) + "\n" for row in rows)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
 
-    out = []
-    for acc, provider in accounts:
-        latest_bal = (
-            db.query(Balance)
-            .filter(Balance.account_id == acc.account_id)
-            .order_by(Balance.as_of.desc())
-            .first()
-        )
-
-        out.append(
-            {
-                "account_id": acc.account_id,
-                "account_name": acc.name,
-                "provider_id": provider,
-                "currency": acc.currency,
-                "current": latest_bal.current if latest_bal else 0.0,
-                "available": latest_bal.available if latest_bal else 0.0,
-                "updated_at": latest_bal.as_of if latest_bal else datetime.now(),
-            }
-        )
-    return out
+# --- Routes ---
+
+@router.get("/api/balances", response_model=List[BalanceOut])
+def get_balances(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    return [balance_out(acc, provider) for acc, provider in db.execute(balances_query(current_user.id)).all()]
 
 @router.get("/api/connections", response_model=List[ConnectionOut])
 def get_connections(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return db.query(Connection).filter(Connection.user_id == current_user.id).all()
+    return db.execute(connections_query(current_user.id)).scalars().all()
 
 @router.get("/api/forecast")
-def get_forecast(days: int = 30, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def get_forecast(
+    days: int = Query(30, ge=1, le=MAX_FORECAST_DAYS),
+    engine: str = forecasting.DEFAULT_ENGINE,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
     """
     Returns predicted cumulative balance/spend trend for the next N days.
+    `engine` picks the variable-spend model: "statsmodels" (default), "fast" or "trend".
     """
-    return forecasting.generate_forecast(db, days_ahead=days, user_id=current_user.id)
+    if engine not in forecasting.FORECASTERS:
+        raise HTTPException(status_code=400, detail=f"Unknown engine. Use one of: {', '.join(sorted(forecasting.FORECASTERS))}")
+    return forecast_cache.get_forecast(db, current_user.id, days, engine=engine)
 
 @router.delete("/api/connections/{connection_id}")
 def delete_connection(
@@ -67,72 +170,100 @@ def delete_connection(
     if not conn:
         raise HTTPException(status_code=404, detail="Connection not found")
 
-    db.query(Account).filter(Account.connection_id == connection_id).delete()
+    # Transactions and balances carry a denormalised user_id, so they must go with their accounts
+    account_ids = db.query(Account.account_id).filter(Account.connection_id == connection_id)
+    db.query(Transaction).filter(Transaction.account_id.in_(account_ids)).delete(synchronize_session=False)
+    db.query(Balance).filter(Balance.account_id.in_(account_ids)).delete(synchronize_session=False)
+    db.query(Account).filter(Account.connection_id == connection_id).delete(synchronize_session=False)
+    db.query(SyncJob).filter(SyncJob.connection_id == connection_id).delete(synchronize_session=False)
     db.delete(conn)
+    rollups.rebuild_monthly_totals(db, user_id=current_user.id)
+    recurring.rebuild_series(db, user_id=current_user.id)
+    forecast_cache.bump_data_version(db, current_user.id)
     db.commit()
+    tokens.forget(connection_id)
     return {"status": "deleted"}
 
 @router.get("/api/transactions", response_model=List[TransactionOut])
 def get_transactions(
+    response: Response,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     account_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    query = (
-        db.query(
-            Transaction,
-            Account.name.label("account_name"),
-            Connection.provider.label("provider_id"),
-        )
-        .join(Account, Transaction.account_id == Account.account_id)
-        .join(Connection, Account.connection_id == Connection.id)
-        .filter(Connection.user_id == current_user.id)
-    )
+    """
+    The user's transactions, newest first.
 
-    if start_date:
-        query = query.filter(Transaction.booked_at >= start_date)
-    if end_date:
-        query = query.filter(Transaction.booked_at <= end_date)
-    if account_id:
-        query = query.filter(Transaction.account_id == account_id)
+    JSON pages hold `limit` rows (default 1000); when there are more, the
+    X-Next-Cursor header carries the `cursor` for the next page.
+    `format=ndjson` streams every matching row (or `limit` of them) one JSON
+    object per line from a server-side cursor, without building the list.
+    """
+    stmt = transactions_query(current_user.id, start_date, end_date, account_id, cursor)
 
-    results = query.order_by(Transaction.booked_at.desc()).limit(1000).all()
+    if format == "ndjson":
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return StreamingResponse(_stream_transactions(current_user.id, stmt), media_type="application/x-ndjson")
 
-    if not results:
-        return []
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = db.execute(stmt.limit(page_size + 1)).all()
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].booked_at, rows[-1].txn_id)
 
-    data = []
-    for txn, acc_name, prov_id in results:
-        t_dict = txn.__dict__.copy()
-        t_dict["account_name"] = acc_name
-        t_dict["provider_id"] = prov_id
-        data.append(t_dict)
+    to_out = TransactionRows.load(db, current_user.id)
+    return [to_out(row) for row in rows]
 
-    df = pd.DataFrame(data)
-    df_classified = forecasting.classify_transactions(df)
+def _row_batches(user_id: int, stmt, batch_size: int):
+    """Lists of TransactionOut dicts fetched `batch_size` at a time from a server-side cursor."""
+    # Own session: the request's one is closed once the endpoint returns
+    db = SessionLocal()
+    try:
+        to_out = TransactionRows.load(db, user_id)
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+        for rows in result.partitions():
+            yield [to_out(row) for row in rows]
+    finally:
+        db.close()
 
-    if isinstance(df_classified.index, pd.DatetimeIndex) and "booked_at" not in df_classified.columns:
-        df_classified = df_classified.reset_index()
+def _stream_transactions(user_id: int, stmt):
+    for rows in _row_batches(user_id, stmt, STREAM_BATCH):
+        yield ndjson_lines(rows)
 
-    out = df_classified.to_dict(orient="records")
-    return out
+@router.get("/api/export/transactions")
+def export_transactions(
+    format: str = Query("parquet", pattern="^(parquet|arrow|csv)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    account_id: Optional[str] = None,
+    current_user=Depends(get_current_user),
+):
+    """
+    The user's whole (filtered) history as one Parquet, Arrow IPC stream or CSV
+    file, newest first, with category and classification. Written EXPORT_BATCH
+    rows at a time straight from the DB cursor. Transactions without a booked_at
+    are included too, unless a date range excludes them.
+    """
+    try:
+        export.require(format)
+    except ImportError:
+        raise HTTPException(status_code=501, detail=f"{format} export needs pyarrow installed")
 
-@router.get("/api/summary/monthly")
-def get_monthly_summary(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    results = (
-        db.query(
-            func.to_char(Transaction.booked_at, "YYYY-MM").label("month"),
-            Transaction.category,
-            func.sum(Transaction.amount).label("total"),
-        )
-        .join(Account, Transaction.account_id == Account.account_id)
-        .join(Connection, Account.connection_id == Connection.id)
-        .filter(Connection.user_id == current_user.id)
-        .group_by("month", Transaction.category)
-        .order_by(text("month DESC"))
-        .all()
+    stmt = transactions_query(current_user.id, start_date, end_date, account_id, None, undated=True)
+    media_type, extension = export.FORMATS[format]
+    return StreamingResponse(
+        export.iter_export(_row_batches(current_user.id, stmt, EXPORT_BATCH), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{extension}"'},
     )
 
+@router.get("/api/summary/monthly")
+def get_monthly_summary(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    results = db.execute(monthly_summary_query(current_user.id)).scalars().all()
     return [{"month": r.month, "category": r.category, "total": r.total} for r in results]
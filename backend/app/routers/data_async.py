@@ -0,0 +1,81 @@
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db, get_async_sessionmaker
+from app.routers import data
+from app.routers.data import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH, TransactionRows, account_labels_query, balance_out,
+    balances_query, bill_keys_query, connections_query, encode_cursor, monthly_summary_query, ndjson_lines,
+    transactions_query,
+)
+from app.routers.users_async import get_current_user
+from app.schemas import TransactionOut, BalanceOut, ConnectionOut
+
+# Async twin of data.py, served instead of it when ASYNC_DB is set. Only the
+# I/O-bound reads are rewritten; see the end of the file for the rest.
+router = APIRouter()
+
+async def _transaction_rows(db: AsyncSession, user_id: int) -> TransactionRows:
+    labels = (await db.execute(account_labels_query(user_id))).all()
+    bill_keys = (await db.execute(bill_keys_query(user_id))).scalars().all()
+    return TransactionRows(labels, bill_keys)
+
+@router.get("/api/balances", response_model=List[BalanceOut])
+async def get_balances(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    return [balance_out(acc, provider) for acc, provider in (await db.execute(balances_query(current_user.id))).all()]
+
+@router.get("/api/connections", response_model=List[ConnectionOut])
+async def get_connections(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    return (await db.execute(connections_query(current_user.id))).scalars().all()
+
+@router.get("/api/transactions", response_model=List[TransactionOut])
+async def get_transactions(
+    response: Response,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    account_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """Same contract as data.get_transactions."""
+    stmt = transactions_query(current_user.id, start_date, end_date, account_id, cursor)
+
+    if format == "ndjson":
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return StreamingResponse(_stream_transactions(current_user.id, stmt), media_type="application/x-ndjson")
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = (await db.execute(stmt.limit(page_size + 1))).all()
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].booked_at, rows[-1].txn_id)
+
+    to_out = await _transaction_rows(db, current_user.id)
+    return [to_out(row) for row in rows]
+
+async def _stream_transactions(user_id: int, stmt):
+    # Own session: the request's one is closed once the endpoint returns
+    async with get_async_sessionmaker()() as db:
+        to_out = await _transaction_rows(db, user_id)
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH))
+        async for rows in result.partitions():
+            yield ndjson_lines([to_out(row) for row in rows])
+
+@router.get("/api/summary/monthly")
+async def get_monthly_summary(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    results = (await db.execute(monthly_summary_query(current_user.id))).scalars().all()
+    return [{"month": r.month, "category": r.category, "total": r.total} for r in results]
+
+# Forecasting (pandas/statsmodels), the export and connection deletion are CPU
+# work on the sync services: they stay sync handlers, run in the threadpool.
+router.add_api_route("/api/forecast", data.get_forecast, methods=["GET"])
+router.add_api_route("/api/connections/{connection_id}", data.delete_connection, methods=["DELETE"])
+router.add_api_route("/api/export/transactions", data.export_transactions, methods=["GET"])
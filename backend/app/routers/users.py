@@ -13,23 +13,30 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 # --- Dependency ---
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def email_from_token(token: str) -> str:
+    """The account email a bearer token was issued to; 401 if it isn't valid."""
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+        raise credentials_exception()
+    return email
+
+# Sync on purpose: FastAPI runs it in the threadpool. As an `async def` the blocking
+# query below would stall the event loop on every authenticated request.
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.email == email_from_token(token)).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
 # --- Routes ---
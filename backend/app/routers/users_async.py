@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth_utils import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.database import get_async_db
+from app.models.tables import User
+from app.routers.users import oauth2_scheme, email_from_token, credentials_exception
+from app.schemas import UserCreate, Token, User as UserSchema
+
+# Async twin of users.py, served instead of it when ASYNC_DB is set
+router = APIRouter()
+
+# --- Dependency ---
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == email_from_token(token)))).scalars().first()
+    if user is None:
+        raise credentials_exception()
+    return user
+
+# --- Routes ---
+
+@router.post("/auth/register", response_model=UserSchema)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    # bcrypt is deliberately slow CPU work; keep it off the event loop
+    hashed_pw = await run_in_threadpool(get_password_hash, user.password)
+    new_user = User(email=user.email, hashed_password=hashed_pw)
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+@router.post("/auth/token", response_model=Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == form_data.username))).scalars().first()
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.get("/auth/me", response_model=UserSchema)
+async def read_users_me(current_user: User = Depends(get_current_user)):
+    return current_user
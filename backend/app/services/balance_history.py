@@ -0,0 +1,78 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.tables import Account, Balance
+
+logger = logging.getLogger(__name__)
+
+
+def record_balance(db: Session, account: Account, user_id: Optional[int], snapshot: dict, as_of: datetime):
+    """
+    Stores a balance snapshot from sync.
+
+    The account's latest-balance columns are updated when the snapshot is at least
+    as new as what they hold. A history row is only appended when the provider's
+    timestamp moved, so hourly syncs of an idle account don't add duplicates.
+    """
+    previous = account.balance_as_of
+    # Stored naive, in UTC (update_timestamp is reported as UTC)
+    as_of_naive = as_of.astimezone(timezone.utc).replace(tzinfo=None) if as_of.tzinfo else as_of
+    if previous is not None and as_of_naive < previous:
+        return
+
+    account.balance_current = snapshot.get("current")
+    account.balance_available = snapshot.get("available")
+    account.balance_as_of = as_of_naive
+
+    if previous is None or as_of_naive != previous:
+        db.add(Balance(
+            account_id=account.account_id,
+            user_id=user_id,
+            as_of=as_of,
+            available=snapshot.get("available"),
+            current=snapshot.get("current"),
+            raw_json=snapshot
+        ))
+
+
+def compact_balances(db: Session, raw_days: Optional[int] = None, now: Optional[datetime] = None) -> int:
+    """
+    Downsamples balance history older than `raw_days` to the last snapshot of
+    each account per day. Returns the number of rows deleted. Does not commit.
+    """
+    raw_days = settings.BALANCE_HISTORY_RAW_DAYS if raw_days is None else raw_days
+    cutoff = (now or datetime.utcnow()) - timedelta(days=raw_days)
+
+    day = func.date(Balance.as_of)
+    ranked = (
+        select(
+            Balance.id,
+            func.row_number().over(
+                partition_by=(Balance.account_id, day),
+                order_by=(Balance.as_of.desc(), Balance.id.desc()),
+            ).label("rn"),
+        )
+        .where(Balance.as_of < cutoff)
+        .subquery()
+    )
+    superseded = select(ranked.c.id).where(ranked.c.rn > 1)
+    return db.query(Balance).filter(Balance.id.in_(superseded)).delete(synchronize_session=False)
+
+
+def run_compaction_job():
+    db = SessionLocal()
+    try:
+        deleted = compact_balances(db)
+        db.commit()
+        logger.info(f"Balance history compaction removed {deleted} snapshots")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Balance history compaction failed: {e}")
+    finally:
+        db.close()
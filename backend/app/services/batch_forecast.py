@@ -0,0 +1,246 @@
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import repeat
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app import metrics
+from app.database import SessionLocal
+from app.models.tables import Forecast, Transaction, User
+from app.services import forecasting
+
+logger = logging.getLogger(__name__)
+
+# Users whose results are written per commit
+STORE_BATCH = 100
+
+
+@dataclass
+class UserForecastResult:
+    user_id: int
+    data_version: int = 0
+    payloads: dict = field(default_factory=dict)
+    fit_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchStats:
+    """Timings for one batch forecasting run."""
+    workers: int = 0
+    users_total: int = 0
+    users_ok: int = 0
+    users_failed: int = 0
+    wall_seconds: float = 0.0
+    fit_seconds: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+
+    def add(self, result: UserForecastResult):
+        if result.error is None:
+            self.users_ok += 1
+            self.fit_seconds[result.user_id] = result.fit_seconds
+        else:
+            self.users_failed += 1
+            self.errors[result.user_id] = result.error
+
+    def as_dict(self):
+        fits = sorted(self.fit_seconds.values())
+
+        def pct(p):
+            return round(fits[min(len(fits) - 1, int(p * len(fits)))], 4) if fits else 0.0
+
+        wall = self.wall_seconds or 1e-9
+        return {
+            "workers": self.workers,
+            "users_total": self.users_total,
+            "users_ok": self.users_ok,
+            "users_failed": self.users_failed,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "fit_seconds_total": round(sum(fits), 3),
+            "fit_seconds_p50": pct(0.5),
+            "fit_seconds_p95": pct(0.95),
+            "fit_seconds_max": pct(1.0),
+            "users_per_second": round(self.users_total / wall, 2),
+            # Sum of per-user fit time over wall time: ~workers when the pool is saturated
+            "parallelism": round(sum(fits) / wall, 2),
+        }
+
+
+def forecast_user(user_id: int, horizons: tuple[int, ...]) -> UserForecastResult:
+    """Fits every horizon for one user with its own session (runs in a worker process)."""
+    result = UserForecastResult(user_id=user_id)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        # Read the version first: data changing mid-fit leaves the row stale, never wrong
+        result.data_version = db.query(User.data_version).filter(User.id == user_id).scalar() or 0
+        for days in horizons:
+            result.payloads[days] = forecasting.generate_forecast(db, days_ahead=days, user_id=user_id)
+    except Exception as e:
+        result.error = str(e)
+    finally:
+        db.close()
+        result.fit_seconds = time.perf_counter() - started
+    return result
+
+
+def stale_users(db: Session, horizons: Iterable[int], user_ids: Optional[Iterable[int]] = None) -> list[int]:
+    """Users with transactions whose stored forecast is missing or older than their data."""
+    horizons = set(horizons)
+    query = select(Transaction.user_id).where(Transaction.user_id.isnot(None)).distinct()
+    if user_ids is not None:
+        query = query.where(Transaction.user_id.in_(list(user_ids)))
+    candidates = sorted(set(db.execute(query).scalars()))
+    if not candidates:
+        return []
+
+    versions = dict(db.execute(select(User.id, User.data_version).where(User.id.in_(candidates))).all())
+    fresh = {}
+    for user_id, days, version in db.execute(
+        select(Forecast.user_id, Forecast.days, Forecast.data_version).where(Forecast.user_id.in_(candidates))
+    ):
+        if days in horizons and version == (versions.get(user_id) or 0):
+            fresh[user_id] = fresh.get(user_id, 0) + 1
+    return sorted(u for u in candidates if fresh.get(u, 0) < len(horizons))
+
+
+def _upsert(dialect_name: str):
+    """INSERT that replaces an existing (user_id, days) forecast unless it was fitted on newer data."""
+    table = Forecast.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.days],
+        set_={c: stmt.excluded[c] for c in ("data_version", "payload", "fit_seconds", "computed_at")},
+        where=table.c.data_version <= stmt.excluded.data_version,
+    )
+
+
+def store_results(db: Session, results: list[UserForecastResult]):
+    """
+    Replaces the stored forecasts of these users. Does not commit.
+
+    An upsert, so two overlapping runs storing the same user don't collide on
+    the primary key.
+    """
+    ok = [r for r in results if r.error is None]
+    if not ok:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": r.user_id,
+            "days": days,
+            "data_version": r.data_version,
+            "payload": payload,
+            "fit_seconds": r.fit_seconds,
+            "computed_at": now,
+        }
+        for r in ok
+        for days, payload in r.payloads.items()
+    ]
+    stmt = _upsert(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+    db.execute(delete(Forecast).where(
+        Forecast.user_id.in_([r.user_id for r in ok]),
+        Forecast.days.in_(sorted({row["days"] for row in rows})),
+    ))
+    db.execute(insert(Forecast), rows)
+
+
+def load_stored(db: Session, user_id: int, days: int, data_version: int):
+    """The stored forecast for (user, days), or None if missing or fitted on older data."""
+    row = db.execute(
+        select(Forecast.payload, Forecast.data_version).where(Forecast.user_id == user_id, Forecast.days == days)
+    ).first()
+    if row is None or row.data_version != data_version:
+        return None
+    return row.payload
+
+
+def run_batch(
+    user_ids: Optional[Iterable[int]] = None,
+    horizons: Optional[Iterable[int]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> BatchStats:
+    """
+    Fits forecasts for every user with stale (or, with `force`, any) stored
+    forecasts across a process pool and writes them to the forecasts table.
+
+    Users are sharded over `workers` processes (FORECAST_BATCH_WORKERS, default
+    one per CPU) so statsmodels fits run in parallel and never inside an API
+    worker. Workers only read; results are written here, STORE_BATCH users per
+    commit.
+    """
+    horizons = tuple(sorted(set(horizons if horizons is not None else settings.FORECAST_BATCH_DAYS)))
+    workers = workers or settings.FORECAST_BATCH_WORKERS or os.cpu_count() or 1
+    stats = BatchStats(workers=workers)
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        if force:
+            query = select(Transaction.user_id).where(Transaction.user_id.isnot(None)).distinct()
+            if user_ids is not None:
+                query = query.where(Transaction.user_id.in_(list(user_ids)))
+            todo = sorted(db.execute(query).scalars())
+        else:
+            todo = stale_users(db, horizons, user_ids)
+        stats.users_total = len(todo)
+        # Don't sit in an open read transaction while the pool works
+        db.commit()
+
+        if todo:
+            fit_seconds = metrics.FORECAST_SECONDS.labels(forecasting.DEFAULT_ENGINE, "batch")
+            workers = stats.workers = max(1, min(workers, len(todo)))
+            # A few shards per worker keeps them busy when some users are much slower
+            chunksize = max(1, math.ceil(len(todo) / (workers * 4)))
+            # spawn, not fork: forking a process that runs scheduler/HTTP threads (or holds
+            # pooled DB connections) can deadlock or share sockets between processes
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pending = []
+                for result in pool.map(forecast_user, todo, repeat(horizons), chunksize=chunksize):
+                    stats.add(result)
+                    if result.error is None:
+                        # Workers are separate processes; their timings are recorded here
+                        fit_seconds.observe(result.fit_seconds)
+                    else:
+                        logger.error(f"Batch forecast failed for user {result.user_id}: {result.error}")
+                    pending.append(result)
+                    if len(pending) >= STORE_BATCH:
+                        store_results(db, pending)
+                        db.commit()
+                        pending = []
+                store_results(db, pending)
+                db.commit()
+    finally:
+        db.close()
+
+    stats.wall_seconds = time.perf_counter() - started
+    logger.info(f"Batch forecast finished: {stats.as_dict()}")
+    return stats
+
+
+def run_batch_forecast_job():
+    """Scheduler entry point: refresh every stale stored forecast."""
+    try:
+        run_batch()
+    except Exception as e:
+        logger.error(f"Batch forecast job failed: {e}")
@@ -0,0 +1,141 @@
+import re
+import threading
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.tables import CategoryRule
+
+UNCATEGORISED = "Uncategorised"
+
+# Built-in keyword rules, checked in order after any CategoryRule rows
+DEFAULT_RULES = {
+    "Groceries": ["tesco", "sainsbury", "asda", "aldi", "lidl", "waitrose", "morrisons", "co-op"],
+    "Transport": ["uber", "train", "bus", "tfl", "petrol", "shell", "bp ", "esso", "parking"],
+    "Eating Out": ["restaurant", "cafe", "coffee", "starbucks", "costa", "pret", "mcdonalds", "kfc", "nandos", "deliveroo", "eats"],
+    "Entertainment": ["netflix", "spotify", "cinema", "odeon", "prime video", "disney", "ticketmaster"],
+    "Shopping": ["amazon", "ebay", "asos", "zara", "boots", "argos", "apple"],
+    "Bills": ["council tax", "water", "gas", "electricity", "energy", "virgin media", "bt ", "sky ", "vodafone", "o2", "ee "],
+    "Income": ["salary", "payroll", "dividend", "interest"],
+    "Transfers": ["transfer", "amex", "credit card", "save the change", "paypal"]
+}
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Builds one regex from a keyword trie, e.g. ["bt ", "bus", "bp "] -> "b(?:p\\ |t\\ |us)".
+    Python's `re` tries alternatives one by one at every position, so a flat
+    "kw1|kw2|..." over ~60 keywords is slower than the old `in` loop; the trie
+    form only ever follows one branch per character.
+    """
+    root = {}
+    for word in keywords:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        children = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not children:
+            return ""
+        body = children[0] if len(children) == 1 else "(?:" + "|".join(children) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(root)
+
+
+class Categoriser:
+    """
+    Keyword matcher compiled into a single trie-shaped regex.
+
+    `rules` is a list of (keyword, category) pairs in priority order; the result
+    for a text is the category of the highest-priority keyword it contains, which
+    is what the old "first category with any keyword in the text" loop returned.
+
+    The trie sits inside a lookahead so `findall` reports a keyword at every
+    position one starts, overlaps included. At a given position the regex reports
+    the longest keyword, so each keyword's rank is pre-folded with the ranks of
+    every keyword it contains.
+    """
+
+    def __init__(self, rules: Iterable[tuple[str, str]]):
+        rank = {}
+        self._categories = []
+        for keyword, category in rules:
+            keyword = (keyword or "").lower()
+            if not keyword or keyword in rank:
+                continue
+            rank[keyword] = len(rank)
+            self._categories.append(category)
+
+        self._rank = {
+            k: min(r for other, r in rank.items() if other in k)
+            for k in rank
+        }
+        self._findall = re.compile(f"(?=({_trie_pattern(rank)}))").findall if rank else None
+
+    @classmethod
+    def from_rule_rows(cls, rows: Iterable[tuple[str, str]]) -> "Categoriser":
+        # Custom rules take precedence over the built-in defaults
+        rules = list(rows)
+        for category, keywords in DEFAULT_RULES.items():
+            rules.extend((k, category) for k in keywords)
+        return cls(rules)
+
+    def match(self, text: str) -> Optional[str]:
+        if self._findall is None:
+            return None
+        found = self._findall(text)
+        if not found:
+            return None
+        if len(found) == 1:
+            return self._categories[self._rank[found[0]]]
+        return self._categories[min(map(self._rank.__getitem__, found))]
+
+    def categorise(self, description: Optional[str], merchant: Optional[str], provider_classification=None) -> str:
+        cat = self.match(f"{(description or '').lower()} {(merchant or '').lower()}")
+        if cat is not None:
+            return cat
+        # Fallback to TrueLayer if no keyword match
+        if provider_classification:
+            return provider_classification[0]
+        return UNCATEGORISED
+
+    def categorise_many(self, txns: Iterable[dict]) -> list[str]:
+        """Categorises a batch of TrueLayer transaction payloads."""
+        categorise = self.categorise
+        return [
+            categorise(t.get("description"), t.get("merchant_name"), t.get("transaction_classification"))
+            for t in txns
+        ]
+
+
+_lock = threading.Lock()
+_cached: Optional[Categoriser] = None
+_fingerprint = None
+
+
+def get_categoriser(db: Session) -> Categoriser:
+    """
+    Returns the shared compiled categoriser, recompiling only when the contents of
+    the CategoryRule table differ from what it was built from. Reading the (small)
+    rules table is cheap; compiling is what gets skipped.
+    """
+    global _cached, _fingerprint
+    rows = tuple(
+        (r.pattern, r.category)
+        for r in db.query(CategoryRule.pattern, CategoryRule.category).order_by(CategoryRule.id)
+    )
+    with _lock:
+        if _cached is None or rows != _fingerprint:
+            _cached = Categoriser.from_rule_rows(rows)
+            _fingerprint = rows
+        return _cached
+
+
+def invalidate():
+    global _cached, _fingerprint
+    with _lock:
+        _cached = None
+        _fingerprint = None
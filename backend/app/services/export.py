@@ -0,0 +1,121 @@
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Iterator
+
+# Columns of an export file, in order
+EXPORT_COLUMNS = (
+    "txn_id", "account_id", "account_name", "booked_at", "amount", "currency",
+    "description", "merchant", "category", "classification",
+)
+
+# format -> (media type, file extension)
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands back what was written since the last drain().
+    tell() keeps counting across drains, which Parquet needs for its footer offsets.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def require(fmt: str):
+    """Raises ImportError if `fmt` needs pyarrow and it isn't installed."""
+    if fmt in ("parquet", "arrow"):
+        import pyarrow  # noqa: F401
+        if fmt == "parquet":
+            import pyarrow.parquet  # noqa: F401
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    types = {"booked_at": pa.timestamp("us"), "amount": pa.float64()}
+    return pa.schema([(c, types.get(c, pa.string())) for c in EXPORT_COLUMNS])
+
+
+def _record_batch(schema, rows: list[dict]):
+    import pyarrow as pa
+
+    return pa.record_batch([[row.get(c) for row in rows] for c in EXPORT_COLUMNS], schema=schema)
+
+
+def _iter_csv(batches: Iterable[list[dict]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([
+                v.isoformat() if isinstance(v, datetime) else v
+                for v in (row.get(c) for c in EXPORT_COLUMNS)
+            ])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        # Header of an export with no rows
+        yield buf.getvalue().encode()
+
+
+def _iter_arrow(batches: Iterable[list[dict]], fmt: str) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = lambda batch: writer.write_batch(batch, row_group_size=len(batch))  # noqa: E731
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    try:
+        for rows in batches:
+            if rows:
+                write(_record_batch(schema, rows))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(batches: Iterable[list[dict]], fmt: str) -> Iterator[bytes]:
+    """
+    Encodes batches of transaction dicts (EXPORT_COLUMNS keys) as one `fmt` file,
+    yielding bytes as each batch is written. Only one batch is held at a time:
+    a Parquet row group or Arrow record batch per input batch.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    if fmt == "csv":
+        return _iter_csv(batches)
+    return _iter_arrow(batches, fmt)
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app import metrics
+from app.database import SessionLocal
+from app.models.tables import User
+from app.services import batch_forecast, forecasting
+
+logger = logging.getLogger(__name__)
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    return db.query(User.data_version).filter(User.id == user_id).scalar() or 0
+
+
+def bump_data_version(db: Session, user_id: Optional[int]):
+    """Marks the user's cached forecasts stale. Call in the same transaction as the data change."""
+    if user_id is None:
+        return
+    db.query(User).filter(User.id == user_id).update(
+        {User.data_version: User.data_version + 1}, synchronize_session=False
+    )
+
+
+class MemoryBackend:
+    """Thread-safe LRU holding at most `maxsize` forecasts."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DiskBackend:
+    """
+    One JSON file per forecast under `directory`. Writing a new data_version for a
+    user removes that user's older files, so the store holds at most one version
+    per (user, days, engine).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        user_id, days, engine, version = key
+        return os.path.join(self.directory, f"{user_id}_{days}_{engine}_{version}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        user_id, days, engine, version = key
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(value, fh, default=float)
+        os.replace(tmp, path)
+
+        prefix = f"{user_id}_{days}_{engine}_"
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".json") and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+
+class ForecastCache:
+    """LRU in front of an optional disk store; disk hits are promoted into memory."""
+
+    def __init__(self, memory: MemoryBackend, disk: Optional[DiskBackend] = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+cache = ForecastCache(
+    MemoryBackend(settings.FORECAST_CACHE_SIZE),
+    DiskBackend(settings.FORECAST_CACHE_DIR) if settings.FORECAST_CACHE_DIR else None,
+)
+
+
+def get_forecast(db: Session, user_id: int, days: int = 30, engine: str = forecasting.DEFAULT_ENGINE):
+    """
+    generate_forecast, memoised on (user_id, days, engine, data_version). On a
+    cache miss the batch forecaster's stored result (default engine only) is used
+    when it is current; fitting inline is the last resort.
+    """
+    version = get_data_version(db, user_id)
+    key = (user_id, days, engine, version)
+    result = cache.get(key)
+    if result is not None:
+        metrics.FORECAST_REQUESTS.labels("cache").inc()
+        return result
+
+    if engine == forecasting.DEFAULT_ENGINE:
+        result = batch_forecast.load_stored(db, user_id, days, version)
+    if result is not None:
+        metrics.FORECAST_REQUESTS.labels("stored").inc()
+    else:
+        started = time.perf_counter()
+        result = forecasting.generate_forecast(db, days_ahead=days, user_id=user_id, engine=engine)
+        metrics.FORECAST_SECONDS.labels(engine, "inline").observe(time.perf_counter() - started)
+        metrics.FORECAST_REQUESTS.labels("computed").inc()
+    cache.set(key, result)
+    return result
+
+
+def warm_up(user_ids: Iterable[int], horizons: Optional[Iterable[int]] = None):
+    """Precomputes forecasts for users whose data just changed (run after sync)."""
+    horizons = list(horizons if horizons is not None else settings.FORECAST_WARM_DAYS)
+    db = SessionLocal()
+    try:
+        for user_id in user_ids:
+            for days in horizons:
+                try:
+                    get_forecast(db, user_id, days)
+                except Exception as e:
+                    logger.error(f"Forecast warm-up failed for user {user_id} ({days}d): {e}")
+    finally:
+        db.close()
@@ -1,101 +1,143 @@
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
 from sqlalchemy.orm import Session
-from app.models.tables import Transaction, Account, Connection
+from app.services import frames, recurring
+from abc import ABC, abstractmethod
 from datetime import timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+class Forecaster(ABC):
+    """Projects a daily series (cumulative variable spend) `steps` days past its last value."""
+
+    name = ""
+
+    @abstractmethod
+    def predict(self, history: pd.Series, steps: int) -> np.ndarray:
+        ...
+
+class StatsmodelsForecaster(Forecaster):
+    """Holt-Winters with an additive trend, parameters fitted by statsmodels' optimiser."""
+
+    name = "statsmodels"
+
+    def predict(self, history, steps):
+        # Imported on first use: statsmodels adds seconds to API startup
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        # Additive trend is robust for spending accumulation
+        model = ExponentialSmoothing(history, trend='add').fit()
+        return np.asarray(model.forecast(steps), dtype='float64')
+
+class HoltForecaster(Forecaster):
+    """
+    Holt's linear smoothing with fixed alpha/beta: one O(n) pass, no optimiser.
+    Level and trend start from the first two points.
+    """
+
+    name = "fast"
+
+    def __init__(self, alpha: float = 0.3, beta: float = 0.05):
+        self.alpha = alpha
+        self.beta = beta
+
+    def predict(self, history, steps):
+        values = np.asarray(history, dtype='float64')
+        level, trend = values[0], values[1] - values[0]
+        alpha, beta = self.alpha, self.beta
+        for value in values[1:].tolist():
+            previous = level
+            level = alpha * value + (1 - alpha) * (level + trend)
+            trend = beta * (level - previous) + (1 - beta) * trend
+        return level + trend * np.arange(1, steps + 1)
+
+class TrendForecaster(Forecaster):
+    """
+    Theil-Sen line through the last `window` days: the median of all pairwise
+    slopes, so a one-off large payment barely moves it.
+    """
+
+    name = "trend"
+
+    def __init__(self, window: int = 90):
+        self.window = window
+
+    def predict(self, history, steps):
+        values = np.asarray(history, dtype='float64')[-self.window:]
+        t = np.arange(len(values), dtype='float64')
+        i, j = np.triu_indices(len(values), k=1)
+        slope = np.median((values[j] - values[i]) / (j - i))
+        intercept = np.median(values - slope * t)
+        return intercept + slope * (t[-1] + np.arange(1, steps + 1))
+
+FORECASTERS = {f.name: f for f in (StatsmodelsForecaster(), HoltForecaster(), TrendForecaster())}
+DEFAULT_ENGINE = StatsmodelsForecaster.name
+
+def get_forecaster(engine: str) -> Forecaster:
+    try:
+        return FORECASTERS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown forecast engine {engine!r}; expected one of {sorted(FORECASTERS)}")
+
 def analyze_patterns(df):
     """
     Core logic to identify recurring patterns in transaction history.
     Returns:
     1. recurring_groups: List of (name, dataframe_of_txns, frequency_type, next_date, next_amount)
     2. variable_indices: Set of indices that are NOT recurring
+
+    Vectorised: rows are ordered once by (key, date) and every group's gap median
+    and amount mean/std come out of one grouped aggregation (recurring.find_series),
+    so the cost no longer scales with a Python iteration per merchant.
     """
     if df.empty:
         return [], set(df.index)
 
-    # Smart Grouping Key
-    def get_key(row):
-        if row.get('merchant'):
-            return str(row['merchant']).lower().strip()
-        return str(row.get('description', '')).lower()[:20]
-
     # Use a copy to avoid SettingWithCopy warnings
     df = df.copy()
-    df['key'] = df.apply(get_key, axis=1)
-    
+    df['key'] = recurring.pattern_keys(df)
+    ordered, bills = recurring.find_series(df)
+
     recurring_groups = []
-    variable_indices = set(df.index) 
-    
-    grouped = df.groupby('key')
-    
-    for name, group in grouped:
-        if len(group) < 2: continue
-        
-        # Sort by date
-        group = group.sort_index()
-        dates = group.index
-        amounts = group['amount']
-        
-        # 1. Interval Analysis
-        gaps = (dates[1:] - dates[:-1]).days
-        if len(gaps) == 0: continue
-        
-        median_gap = np.median(gaps)
-        
-        # Frequencies
-        is_weekly = 6 <= median_gap <= 8
-        is_monthly = 26 <= median_gap <= 35
-        is_yearly = 360 <= median_gap <= 370
-        
-        if not (is_weekly or is_monthly or is_yearly):
-            continue
-            
-        # 2. Amount Consistency Analysis
-        mean_amt = amounts.mean()
-        std_amt = amounts.std()
-        
-        # Handle zero division
-        cv = 0
-        if abs(mean_amt) > 0.01:
-            cv = std_amt / abs(mean_amt)
-            
-        is_consistent = (cv < 0.2) or (std_amt < 1.0)
-        
-        if is_consistent:
-            # It's a bill!
-            variable_indices -= set(group.index)
-            
-            # Project Next Occurrence
-            last_date = dates[-1]
-            last_amount = amounts.iloc[-1]
-            
-            days_to_add = 0
-            if is_weekly: days_to_add = 7
-            elif is_monthly: days_to_add = 30 
-            elif is_yearly: days_to_add = 365
-            
-            next_date = last_date + timedelta(days=days_to_add)
-            
-            recurring_groups.append({
-                "name": name,
-                "txns": group,
-                "frequency": "monthly" if is_monthly else ("weekly" if is_weekly else "yearly"),
-                "next_date": next_date,
-                "next_amount": last_amount
-            })
-            
+    bill_rows = np.zeros(len(ordered), dtype=bool)
+    for name, start, end, frequency, days_to_add in zip(
+        bills.index, bills['start'], bills['end'], bills['frequency'], bills['days_to_add']
+    ):
+        # It's a bill! Project the next occurrence from the last one
+        group = ordered.iloc[start:end]
+        bill_rows[start:end] = True
+        recurring_groups.append({
+            "name": name,
+            "txns": group,
+            "frequency": frequency,
+            "next_date": group.index[-1] + timedelta(days=int(days_to_add)),
+            "next_amount": group['amount'].iloc[-1],
+        })
+
+    variable_indices = set(df.index[~df.index.isin(ordered.index[bill_rows])])
+
     return recurring_groups, variable_indices
 
-def detect_recurring(df):
+def detect_recurring(df, series=None):
     """
     Wrapper for analyze_patterns to return the Future Projection DataFrame
     and the Historical Variable DataFrame (for forecasting).
+
+    With `series` (recurring.load_series) the bills come from the persisted
+    index instead of being detected again.
     """
+    if series is not None:
+        series = series[~series['has_transfers'].astype(bool)]
+        recurring_future_df = pd.DataFrame({
+            "ds": pd.to_datetime(series['next_at']),
+            "amount": series['last_amount'],
+            "name": series['merchant_key'],
+            "frequency": series['frequency'],
+        })
+        variable_df = df[~recurring.frame_keys(df).isin(series['merchant_key'])].copy()
+        return recurring_future_df, variable_df
+
     recurring_groups, variable_indices = analyze_patterns(df)
     
     # Build Future Projections
@@ -113,12 +155,15 @@ def detect_recurring(df):
     
     return recurring_future_df, variable_df
 
-def classify_transactions(df):
+def classify_transactions(df, recurring_keys=None):
     """
     Returns the dataframe with a new 'classification' column:
     - 'bill': identified as recurring
     - 'income': amount > 0 (simplification)
     - 'variable': everything else
+
+    `recurring_keys` (the user's recurring series) turns bill detection into a
+    merchant_key lookup; without it patterns are detected from `df` alone.
     """
     if df.empty:
         return df
@@ -131,94 +176,109 @@ def classify_transactions(df):
     # Default to variable
     df['classification'] = 'variable'
     
-    # Identify Recurring
-    recurring_groups, _ = analyze_patterns(df)
-    
-    # Mark Recurring IDs
-    recurring_ids = set()
-    for g in recurring_groups:
-        recurring_ids.update(g['txns']['txn_id'].values)
-        
     # Apply tags
     # 1. Bills (Recurring)
-    df.loc[df['txn_id'].isin(recurring_ids), 'classification'] = 'bill'
+    if recurring_keys is not None:
+        df.loc[recurring.frame_keys(df).isin(recurring_keys), 'classification'] = 'bill'
+    else:
+        recurring_groups, _ = analyze_patterns(df)
+        recurring_ids = set()
+        for g in recurring_groups:
+            recurring_ids.update(g['txns']['txn_id'].values)
+        df.loc[df['txn_id'].isin(recurring_ids), 'classification'] = 'bill'
     
     # 2. Income (Positive amounts)
     df.loc[df['amount'] > 0, 'classification'] = 'income'
     
     return df
 
-def generate_forecast(db: Session, days_ahead: int = 30, user_id: int | None = None):
-    # 1. Fetch History
-    query = db.query(Transaction)
-    if user_id is not None:
-        query = (
-            query.join(Account, Transaction.account_id == Account.account_id)
-            .join(Connection, Account.connection_id == Connection.id)
-            .filter(Connection.user_id == user_id)
-        )
-    raw_tx = query.all()
-    if not raw_tx: return {}
-
-    df = pd.DataFrame([t.__dict__ for t in raw_tx])
-    if 'booked_at' not in df.columns:
+def bill_calendar(future_recurring, last_date, days_ahead: int) -> np.ndarray:
+    """
+    Total projected bill amount per forecast day (index 0 is day 1, i.e.
+    last_date + 1 day).
+
+    Each bill repeats every 7/30/365 days (by frequency) from its next date, so
+    weekly and monthly bills are counted at every occurrence inside the horizon.
+    An occurrence lands on the first forecast day at or after it. A bill whose
+    next date is more than one period before last_date has missed a cycle and
+    is treated as ended.
+    """
+    totals = np.zeros(days_ahead + 1)
+    if future_recurring is None or future_recurring.empty or days_ahead <= 0:
+        return totals[1:]
+
+    day_ns = np.int64(86_400 * 10**9)
+    periods = future_recurring['frequency'].map({label: days for label, _, _, days in recurring.FREQUENCIES})
+    periods = periods.fillna(0).to_numpy(dtype='int64') * day_ns
+    first = pd.to_datetime(future_recurring['ds']).to_numpy(dtype='datetime64[ns]').astype('int64')
+    amounts = future_recurring['amount'].to_numpy(dtype='float64')
+    start = np.int64(pd.Timestamp(last_date).value)
+    end = start + days_ahead * day_ns
+
+    # Drop ended bills; one-off projections (no period) only count if they fall in the window
+    live = (periods > 0) & (first >= start - periods) | (periods == 0) & (first > start)
+    first, periods, amounts = first[live], periods[live], amounts[live]
+    step = np.where(periods > 0, periods, 1)
+
+    # Occurrences k_first..k_last of first + k * period fall in (start, end]
+    k_first = np.where(first > start, 0, (start - first) // step + 1)
+    k_last = np.where(periods > 0, (end - first) // step, np.where(first <= end, 0, -1))
+    counts = np.clip(k_last - k_first + 1, 0, None)
+    if not counts.sum():
+        return totals[1:]
+
+    owner = np.repeat(np.arange(len(first)), counts)
+    k = k_first[owner] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    when = first[owner] + k * periods[owner]
+    day_index = -((start - when) // day_ns)  # ceil((when - start) / 1 day)
+    totals += np.bincount(day_index, weights=amounts[owner], minlength=days_ahead + 1)[:days_ahead + 1]
+    return totals[1:]
+
+def classify_transaction(amount, merchant_key, bill_keys) -> str:
+    """Row-at-a-time classify_transactions, given the user's recurring merchant keys."""
+    if amount is not None and amount > 0:
+        return 'income'
+    return 'bill' if merchant_key in bill_keys else 'variable'
+
+def generate_forecast(db: Session, days_ahead: int = 30, user_id: int | None = None, engine: str = DEFAULT_ENGINE):
+    forecaster = get_forecaster(engine)
+
+    # 1. Fetch History (only the columns we use, typed)
+    df = frames.load_transactions_frame(db, user_id=user_id)
+    if df.empty:
         return {}
-        
-    df['booked_at'] = pd.to_datetime(df['booked_at'])
+
     df = df.set_index('booked_at').sort_index()
     
     # Filter Internal Transfers
-    exclude = ['transfer', 'internal', 'save the change', 'credit card payment']
-    
-    def is_excluded(desc):
-        if not desc: return False
-        d = desc.lower()
-        return any(k in d for k in exclude)
-
-    mask = df['description'].apply(lambda x: not is_excluded(x))
+    mask = df['description'].apply(lambda x: not recurring.is_transfer(x))
     df = df[mask]
+    if df.empty:
+        return {}
 
-    # 2. Separate Recurring vs Variable
-    future_recurring, history_variable = detect_recurring(df)
+    # 2. Separate Recurring vs Variable (per-user bills come from the persisted index)
+    series = recurring.load_series(db, user_id) if user_id is not None else None
+    future_recurring, history_variable = detect_recurring(df, series)
     
-    # 3. Forecast Variable Spend (statsmodels)
+    # 3. Forecast Variable Spend (see FORECASTERS)
     # We forecast the cumulative trend of variable spending
     variable_daily = history_variable['amount'].resample('D').sum().fillna(0).cumsum()
     
-    ai_forecast = []
+    variable_trend = np.zeros(days_ahead)
     if len(variable_daily) > 10:
         try:
-            # Additive trend is robust for spending accumulation
-            model = ExponentialSmoothing(variable_daily, trend='add').fit()
-            pred = model.forecast(days_ahead)
-            
+            pred = forecaster.predict(variable_daily, days_ahead)
             # Make relative to 0 start for combining
-            start_val = variable_daily.iloc[-1]
-            ai_forecast = [{"ds": pred.index[i], "val": v - start_val} for i, v in enumerate(pred)]
+            variable_trend = np.asarray(pred, dtype='float64')[:days_ahead] - variable_daily.iloc[-1]
         except Exception as e:
-            logger.error(f"ETS forecast failed: {e}")
-            pass
+            logger.error(f"{forecaster.name} forecast failed: {e}")
         
-    # 4. Combine
+    # 4. Combine: balance + variable trend + bills due so far, for day 1..days_ahead
     current_balance = df['amount'].sum()
-    final_curve = []
     last_date = df.index[-1]
-    
-    for i in range(1, days_ahead + 1):
-        day = last_date + timedelta(days=i)
-        val = current_balance
-        
-        if ai_forecast and i < len(ai_forecast):
-            val += ai_forecast[i-1]['val']
-            
-        if not future_recurring.empty:
-            bills_due = future_recurring[
-                (future_recurring['ds'] > last_date) & 
-                (future_recurring['ds'] <= day)
-            ]
-            val += bills_due['amount'].sum()
-            
-        final_curve.append({"ds": day.isoformat(), "val": val})
+    days = last_date + pd.to_timedelta(np.arange(1, days_ahead + 1), unit='D')
+    curve = current_balance + variable_trend + np.cumsum(bill_calendar(future_recurring, last_date, days_ahead))
+    final_curve = [{"ds": day.isoformat(), "val": float(val)} for day, val in zip(days, curve)]
 
     return {
         "net_forecast": final_curve,
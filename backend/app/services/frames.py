@@ -0,0 +1,62 @@
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.tables import Transaction
+
+# What the forecasting code actually reads; notably not raw_json
+TRANSACTION_COLUMNS = ("txn_id", "booked_at", "amount", "description", "merchant", "merchant_key", "category")
+
+# Low-cardinality strings repeated across many rows
+CATEGORICAL_COLUMNS = frozenset({"merchant", "merchant_key", "category", "account_id", "currency"})
+
+
+def _column(name: str, values: tuple, categoricals: bool):
+    if name == "booked_at":
+        return pd.to_datetime(pd.Series(values, dtype="object"))
+    if name == "amount":
+        return np.array(values, dtype="float64")
+    if name == "is_pending":
+        return np.array(values, dtype="bool")
+    if categoricals and name in CATEGORICAL_COLUMNS:
+        return pd.Categorical(values)
+    return np.array(values, dtype="object")
+
+
+def load_transactions_frame(
+    db: Session,
+    user_id: Optional[int] = None,
+    columns: Sequence[str] = TRANSACTION_COLUMNS,
+    where: Iterable = (),
+    order_by=None,
+    limit: Optional[int] = None,
+    categoricals: bool = True,
+) -> pd.DataFrame:
+    """
+    Loads transactions straight into typed columns, without building ORM objects.
+
+    Only `columns` are selected. `booked_at` becomes datetime64, `amount` float64,
+    and the repeated strings in CATEGORICAL_COLUMNS pandas categoricals (missing
+    values are NaN there). Extra filters go in `where`, as SQLAlchemy expressions.
+    """
+    stmt = select(*(getattr(Transaction, c) for c in columns))
+    if user_id is not None:
+        stmt = stmt.where(Transaction.user_id == user_id)
+    for clause in where:
+        stmt = stmt.where(clause)
+    if order_by is not None:
+        stmt = stmt.order_by(order_by)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    rows = db.execute(stmt).all()
+    if not rows:
+        return pd.DataFrame({c: pd.Series(dtype="object") for c in columns})
+
+    return pd.DataFrame({
+        name: _column(name, values, categoricals)
+        for name, values in zip(columns, zip(*rows))
+    })
@@ -0,0 +1,73 @@
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.tables import Transaction
+
+
+@dataclass
+class IngestResult:
+    inserted: int = 0
+    skipped: int = 0
+    duration: float = 0.0
+    inserted_ids: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        total = self.inserted + self.skipped
+        return total / self.duration if self.duration > 0 else float(total)
+
+
+def _insert_ignore(dialect_name: str):
+    """INSERT that silently drops rows whose txn_id already exists."""
+    table = Transaction.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing(index_elements=[table.c.txn_id])
+    if dialect_name == "sqlite":
+        return insert(table).prefix_with("OR IGNORE")
+    return insert(table)
+
+
+def ingest_transactions(db: Session, account_id: str, rows: list[dict]) -> IngestResult:
+    """
+    Inserts new transaction rows for one account in a single batched statement.
+
+    `rows` are Transaction column dicts. Existing txn_ids inside the batch's date
+    window are fetched in one query and filtered out up front; anything that still
+    collides (another account, outside the window, a concurrent sync) is ignored by
+    the database. Does not commit.
+    """
+    started = time.perf_counter()
+    result = IngestResult()
+    if not rows:
+        return result
+
+    # Drop duplicates within the payload itself, keeping the first occurrence
+    unique = {}
+    for row in rows:
+        unique.setdefault(row["txn_id"], row)
+
+    dates = [r["booked_at"] for r in unique.values() if r.get("booked_at") is not None]
+    existing_q = select(Transaction.txn_id).where(Transaction.account_id == account_id)
+    if dates:
+        existing_q = existing_q.where(Transaction.booked_at.between(min(dates), max(dates)))
+    existing = set(db.execute(existing_q).scalars())
+
+    new_rows = [r for txn_id, r in unique.items() if txn_id not in existing]
+    if new_rows:
+        dialect = db.get_bind().dialect
+        stmt = _insert_ignore(dialect.name)
+        if dialect.insert_executemany_returning:
+            stmt = stmt.returning(Transaction.__table__.c.txn_id)
+            result.inserted_ids = list(db.execute(stmt, new_rows).scalars())
+        else:
+            db.execute(stmt, new_rows)
+            result.inserted_ids = [r["txn_id"] for r in new_rows]
+
+    result.inserted = len(result.inserted_ids)
+    result.skipped = len(rows) - result.inserted
+    result.duration = time.perf_counter() - started
+    return result
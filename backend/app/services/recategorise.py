@@ -0,0 +1,149 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+
+from app.database import SessionLocal
+from app.models.tables import Transaction, JobCheckpoint
+from app.services import categoriser as categoriser_service
+from app.services import rollups
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+# A "running" checkpoint that hasn't moved for this long is treated as a crashed run
+STALE_AFTER = timedelta(minutes=5)
+
+
+def checkpoint_name(user_id: Optional[int] = None) -> str:
+    return f"recategorise:user:{user_id}" if user_id is not None else "recategorise:all"
+
+
+def checkpoint_status(db, user_id: Optional[int] = None) -> Optional[dict]:
+    ckpt = db.get(JobCheckpoint, checkpoint_name(user_id))
+    if ckpt is None:
+        return None
+    return {
+        "status": ckpt.status,
+        "processed": ckpt.processed,
+        "changed": ckpt.changed,
+        "cursor": ckpt.cursor,
+        "error": ckpt.error,
+        "started_at": ckpt.started_at,
+        "updated_at": ckpt.updated_at,
+        "finished_at": ckpt.finished_at,
+    }
+
+
+def is_running(db, user_id: Optional[int] = None) -> bool:
+    ckpt = db.get(JobCheckpoint, checkpoint_name(user_id))
+    return (
+        ckpt is not None
+        and ckpt.status == "running"
+        and ckpt.updated_at is not None
+        and datetime.utcnow() - ckpt.updated_at < STALE_AFTER
+    )
+
+
+def recategorise_all(
+    user_id: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    restart: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Re-runs categorisation over stored transactions (all users, or one user).
+
+    Transactions are streamed in txn_id order, `chunk_size` rows at a time, with
+    only the columns categorisation needs. Rows whose category changes are written
+    back with one bulk UPDATE per chunk, committed together with the checkpoint
+    cursor, so a crashed run resumes after the last committed chunk. A finished
+    run (or `restart=True`) starts again from the beginning.
+    """
+    db = SessionLocal()
+    name = checkpoint_name(user_id)
+    try:
+        now = datetime.utcnow()
+        ckpt = db.get(JobCheckpoint, name)
+        if ckpt is None:
+            ckpt = JobCheckpoint(name=name)
+            db.add(ckpt)
+        if restart or ckpt.status in (None, "done"):
+            ckpt.cursor = None
+            ckpt.processed = 0
+            ckpt.changed = 0
+            ckpt.started_at = now
+            ckpt.finished_at = None
+        elif ckpt.cursor:
+            logger.info(f"{name}: resuming after txn_id {ckpt.cursor} ({ckpt.processed} already processed)")
+        ckpt.status = "running"
+        ckpt.error = None
+        ckpt.updated_at = now
+        db.commit()
+
+        categoriser = categoriser_service.get_categoriser(db)
+
+        base = select(
+            Transaction.txn_id,
+            Transaction.user_id,
+            Transaction.booked_at,
+            Transaction.amount,
+            Transaction.description,
+            Transaction.merchant,
+            Transaction.category,
+            Transaction.raw_json,
+        )
+        if user_id is not None:
+            base = base.where(Transaction.user_id == user_id)
+
+        while True:
+            query = base.order_by(Transaction.txn_id).limit(chunk_size)
+            if ckpt.cursor is not None:
+                query = query.where(Transaction.txn_id > ckpt.cursor)
+            rows = db.execute(query).all()
+            if not rows:
+                break
+
+            changes = []
+            moves = []
+            for r in rows:
+                provider_classification = (r.raw_json or {}).get("transaction_classification")
+                category = categoriser.categorise(r.description, r.merchant, provider_classification)
+                if category != r.category:
+                    changes.append({"txn_id": r.txn_id, "category": category})
+                    moves.append((r.user_id, r.booked_at, r.amount, r.category, category))
+
+            if changes:
+                # ORM bulk UPDATE by primary key: one executemany per chunk
+                db.execute(update(Transaction), changes)
+                rollups.move_categories(db, moves)
+
+            ckpt.cursor = rows[-1].txn_id
+            ckpt.processed += len(rows)
+            ckpt.changed += len(changes)
+            ckpt.updated_at = datetime.utcnow()
+            db.commit()
+
+            if progress is not None:
+                progress(checkpoint_status(db, user_id))
+
+        ckpt.status = "done"
+        ckpt.finished_at = datetime.utcnow()
+        ckpt.updated_at = ckpt.finished_at
+        db.commit()
+        logger.info(f"{name}: finished, {ckpt.processed} processed, {ckpt.changed} changed")
+        return checkpoint_status(db, user_id)
+
+    except Exception as e:
+        db.rollback()
+        ckpt = db.get(JobCheckpoint, name)
+        if ckpt is not None:
+            ckpt.status = "failed"
+            ckpt.error = str(e)
+            ckpt.updated_at = datetime.utcnow()
+            db.commit()
+        logger.error(f"{name}: failed: {e}")
+        raise
+    finally:
+        db.close()
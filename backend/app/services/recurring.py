@@ -0,0 +1,265 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models.tables import RecurringSeries, Transaction
+from app.services import frames
+
+logger = logging.getLogger(__name__)
+
+# Cadences a group's median gap (in days) must fall into, and how far ahead to project
+FREQUENCIES = (
+    ("weekly", 6, 8, 7),
+    ("monthly", 26, 35, 30),
+    ("yearly", 360, 370, 365),
+)
+
+# Descriptions of internal money movements, which forecasts leave out
+TRANSFER_KEYWORDS = ('transfer', 'internal', 'save the change', 'credit card payment')
+
+SERIES_COLUMNS = ("txn_id", "booked_at", "amount", "description", "merchant_key")
+SERIES_FIELDS = (
+    "frequency", "median_gap_days", "txn_count", "first_at", "last_at", "next_at",
+    "last_amount", "mean_amount", "std_amount", "has_transfers", "updated_at",
+)
+# Namespace for the per-user advisory locks taken by refresh_series on Postgres
+_PG_LOCK_NAMESPACE = 7_340_113
+
+
+def merchant_key(merchant: Optional[str], description: Optional[str]) -> str:
+    """
+    Grouping key for recurring detection: the normalised merchant name when there
+    is one, else the first 20 characters of the lowercased description.
+    """
+    if isinstance(merchant, str) and merchant:
+        return merchant.lower().strip()
+    return str(description).lower()[:20]
+
+
+def pattern_keys(df: pd.DataFrame) -> pd.Series:
+    """merchant_key for every row of a transactions frame, using pandas string ops."""
+    if 'description' in df.columns:
+        keys = df['description'].astype(object).astype(str).str.lower().str[:20]
+    else:
+        keys = pd.Series('', index=df.index, dtype=object)
+
+    if 'merchant' in df.columns:
+        merchant = df['merchant'].astype(object)
+        # Missing merchants can be None or NaN (categorical frames); .str gives NaN for both
+        named = pd.to_numeric(merchant.str.len()).gt(0)
+        keys = keys.where(~named, merchant.str.lower().str.strip())
+    return keys
+
+
+def frame_keys(df: pd.DataFrame) -> pd.Series:
+    """The stored merchant_key where a row has one, computed otherwise."""
+    if 'merchant_key' not in df.columns:
+        return pattern_keys(df)
+    keys = df['merchant_key'].astype(object)
+    missing = keys.isna()
+    if missing.any():
+        keys = keys.where(~missing, pattern_keys(df))
+    return keys
+
+
+def is_transfer(description: Optional[str]) -> bool:
+    if not description:
+        return False
+    d = description.lower()
+    return any(k in d for k in TRANSFER_KEYWORDS)
+
+
+def find_series(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Finds the recurring series in a booked_at-indexed frame with `key` and
+    `amount` columns.
+
+    Returns the frame ordered by (key, booked_at) and one row per recurring key
+    (indexed by key, in key order) with its cadence and amount stats; `start`/`end`
+    are the key's row range in the ordered frame. A key recurs when its median gap
+    matches a cadence in FREQUENCIES and its amounts are consistent (CV < 0.2 or
+    std < 1). Ties on date keep input order.
+    """
+    columns = ['size', 'median_gap', 'mean_amt', 'std_amt', 'start', 'end', 'frequency', 'days_to_add']
+    if df.empty:
+        return df, pd.DataFrame(columns=columns)
+
+    codes, names = pd.factorize(df['key'], sort=True)
+    order = np.lexsort((df.index.values, codes))
+    ordered = df.iloc[order]
+    codes = codes[order]
+    dates = ordered.index
+
+    # Gap to the previous transaction of the same key, in whole days
+    gaps = pd.Series((dates[1:] - dates[:-1]).days, dtype='float64')
+    gaps = gaps.where(codes[1:] == codes[:-1])
+    work = pd.DataFrame({
+        'code': codes,
+        'amount': ordered['amount'].to_numpy(dtype='float64'),
+        'gap': np.concatenate(([np.nan], gaps.to_numpy())),
+    })
+    stats = work.groupby('code', sort=True).agg(
+        size=('amount', 'size'),
+        median_gap=('gap', 'median'),
+        mean_amt=('amount', 'mean'),
+        std_amt=('amount', 'std'),
+    )
+    stats['end'] = stats['size'].cumsum()
+    stats['start'] = stats['end'] - stats['size']
+
+    # 1. Interval Analysis
+    stats['frequency'] = None
+    stats['days_to_add'] = 0
+    for label, low, high, days in FREQUENCIES:
+        hit = stats['median_gap'].between(low, high)
+        stats.loc[hit, 'frequency'] = label
+        stats.loc[hit, 'days_to_add'] = days
+
+    # 2. Amount Consistency Analysis (cv stays 0 near a zero mean)
+    cv = (stats['std_amt'] / stats['mean_amt'].abs()).where(stats['mean_amt'].abs() > 0.01, 0)
+    is_consistent = (cv < 0.2) | (stats['std_amt'] < 1.0)
+    bills = stats[(stats['size'] >= 2) & stats['frequency'].notna() & is_consistent]
+    return ordered, bills.set_axis(names[bills.index])[columns]
+
+
+def _series_rows(user_id: int, df: pd.DataFrame, now: datetime) -> list[dict]:
+    df = df.set_index('booked_at')
+    df['key'] = df['merchant_key'].astype(object)
+    ordered, bills = find_series(df)
+    transfers = ordered['description'].map(is_transfer).to_numpy(dtype=bool) if len(bills) else None
+
+    rows = []
+    for key, bill in zip(bills.index, bills.itertuples(index=False)):
+        dates = ordered.index[bill.start:bill.end]
+        last_at = dates[-1].to_pydatetime()
+        rows.append({
+            "user_id": user_id,
+            "merchant_key": key,
+            "frequency": bill.frequency,
+            "median_gap_days": float(bill.median_gap),
+            "txn_count": int(bill.size),
+            "first_at": dates[0].to_pydatetime(),
+            "last_at": last_at,
+            "next_at": last_at + timedelta(days=int(bill.days_to_add)),
+            "last_amount": float(ordered['amount'].iloc[bill.end - 1]),
+            "mean_amount": float(bill.mean_amt),
+            "std_amount": float(bill.std_amt),
+            "has_transfers": bool(transfers[bill.start:bill.end].any()),
+            "updated_at": now,
+        })
+    return rows
+
+
+def _upsert(dialect_name: str):
+    """INSERT that overwrites the series already stored for a (user_id, merchant_key)."""
+    table = RecurringSeries.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table)
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.merchant_key],
+        set_={name: stmt.excluded[name] for name in SERIES_FIELDS},
+    )
+
+
+def refresh_series(db: Session, user_id: int, keys: Iterable[str]) -> int:
+    """
+    Re-derives the series for just these merchant keys of one user from their
+    full history, e.g. the keys touched by a sync. Returns how many of them
+    are recurring. Does not commit.
+
+    Connections of one user sync concurrently, so on Postgres this first takes
+    a per-user advisory lock held until commit: a second refresh then waits and
+    reads the first one's transactions instead of racing it. Rows are upserted,
+    and keys that no longer recur are deleted.
+    """
+    keys = sorted({k for k in keys if k is not None})
+    if not keys:
+        return 0
+
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :user_id)"),
+            {"namespace": _PG_LOCK_NAMESPACE, "user_id": user_id},
+        )
+
+    df = frames.load_transactions_frame(
+        db,
+        user_id=user_id,
+        columns=SERIES_COLUMNS,
+        where=[Transaction.merchant_key.in_(keys)],
+        order_by=Transaction.txn_id,
+        categoricals=False,
+    )
+    rows = _series_rows(user_id, df, datetime.utcnow()) if not df.empty else []
+
+    recurring = {row["merchant_key"] for row in rows}
+    gone = [k for k in keys if k not in recurring]
+    if gone:
+        db.execute(
+            delete(RecurringSeries)
+            .where(RecurringSeries.user_id == user_id, RecurringSeries.merchant_key.in_(gone))
+        )
+    if rows:
+        db.execute(_upsert(dialect_name), rows)
+    return len(rows)
+
+
+def rebuild_series(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recomputes recurring_series from scratch for one user, or everyone. Returns
+    the number of series written. Does not commit.
+    """
+    query = db.query(Transaction.user_id).filter(Transaction.user_id.isnot(None)).distinct()
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    user_ids = [row.user_id for row in query.all()]
+
+    stmt = delete(RecurringSeries)
+    if user_id is not None:
+        stmt = stmt.where(RecurringSeries.user_id == user_id)
+    db.execute(stmt)
+
+    now = datetime.utcnow()
+    written = 0
+    for uid in user_ids:
+        df = frames.load_transactions_frame(
+            db,
+            user_id=uid,
+            columns=SERIES_COLUMNS,
+            where=[Transaction.merchant_key.isnot(None)],
+            order_by=Transaction.txn_id,
+            categoricals=False,
+        )
+        rows = _series_rows(uid, df, now) if not df.empty else []
+        if rows:
+            db.execute(insert(RecurringSeries), rows)
+        written += len(rows)
+    logger.info(f"Rebuilt {written} recurring series for {len(user_ids)} users")
+    return written
+
+
+def load_series(db: Session, user_id: int) -> pd.DataFrame:
+    """A user's recurring series, in merchant_key order."""
+    rows = db.execute(
+        select(
+            RecurringSeries.merchant_key,
+            RecurringSeries.frequency,
+            RecurringSeries.next_at,
+            RecurringSeries.last_amount,
+            RecurringSeries.has_transfers,
+        )
+        .where(RecurringSeries.user_id == user_id)
+        .order_by(RecurringSeries.merchant_key)
+    ).all()
+    return pd.DataFrame(rows, columns=["merchant_key", "frequency", "next_at", "last_amount", "has_transfers"])
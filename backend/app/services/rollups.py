@@ -0,0 +1,171 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.tables import MonthlyCategoryTotal, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def month_key(booked_at: datetime) -> str:
+    # Wall-clock month of the stored timestamp, matching _month_expr below
+    return booked_at.strftime("%Y-%m")
+
+
+def _month_expr(dialect_name: str):
+    if dialect_name == "sqlite":
+        return func.strftime("%Y-%m", Transaction.booked_at)
+    return func.to_char(Transaction.booked_at, "YYYY-MM")
+
+
+def _upsert(dialect_name: str):
+    table = MonthlyCategoryTotal.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.month, table.c.category],
+        set_={
+            "total": table.c.total + stmt.excluded.total,
+            "txn_count": table.c.txn_count + stmt.excluded.txn_count,
+        },
+    )
+
+
+def apply_deltas(db: Session, deltas: dict):
+    """
+    Adds `{(user_id, month, category): (amount, count)}` onto the rollup with one
+    batched upsert. Buckets whose count drops to zero are removed. Does not commit.
+
+    Rows are written in key order, so concurrent syncs touching the same buckets
+    lock them in the same order and cannot deadlock.
+    """
+    rows = [
+        {"user_id": user_id, "month": month, "category": category, "total": amount, "txn_count": count}
+        for (user_id, month, category), (amount, count) in sorted(deltas.items())
+        if count or amount
+    ]
+    if not rows:
+        return
+
+    stmt = _upsert(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+    else:
+        for row in rows:
+            key = (row["user_id"], row["month"], row["category"])
+            bucket = db.get(MonthlyCategoryTotal, key)
+            if bucket is None:
+                db.add(MonthlyCategoryTotal(**row))
+            else:
+                bucket.total += row["total"]
+                bucket.txn_count += row["txn_count"]
+        db.flush()
+
+    if any(row["txn_count"] < 0 for row in rows):
+        db.query(MonthlyCategoryTotal).filter(MonthlyCategoryTotal.txn_count <= 0).delete(synchronize_session=False)
+
+
+def add_transactions(db: Session, rows: Iterable[dict]):
+    """Counts newly inserted Transaction column dicts into the rollup."""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        if row.get("user_id") is None or row.get("booked_at") is None:
+            continue
+        bucket = deltas[(row["user_id"], month_key(row["booked_at"]), row["category"])]
+        bucket[0] += row["amount"] or 0.0
+        bucket[1] += 1
+    apply_deltas(db, deltas)
+
+
+def move_categories(db: Session, moves: Iterable[tuple]):
+    """Applies recategorisations given as (user_id, booked_at, amount, old_category, new_category)."""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for user_id, booked_at, amount, old, new in moves:
+        if user_id is None or booked_at is None:
+            continue
+        month = month_key(booked_at)
+        out = deltas[(user_id, month, old)]
+        out[0] -= amount or 0.0
+        out[1] -= 1
+        into = deltas[(user_id, month, new)]
+        into[0] += amount or 0.0
+        into[1] += 1
+    apply_deltas(db, deltas)
+
+
+def move_account(db: Session, account_id: str, user_id: Optional[int]):
+    """
+    Moves an account's transactions from whichever users' buckets they are counted
+    in over to `user_id`'s. Call before rewriting their user_id. Does not commit.
+    """
+    month = _month_expr(db.get_bind().dialect.name).label("month")
+    groups = db.execute(
+        select(Transaction.user_id, month, Transaction.category, func.sum(Transaction.amount), func.count())
+        .where(
+            Transaction.account_id == account_id,
+            Transaction.booked_at.isnot(None),
+            Transaction.category.isnot(None),
+        )
+        .group_by(Transaction.user_id, month, Transaction.category)
+    ).all()
+    deltas = defaultdict(lambda: [0.0, 0])
+    for old_user_id, month, category, amount, count in groups:
+        if old_user_id == user_id:
+            continue
+        if old_user_id is not None:
+            out = deltas[(old_user_id, month, category)]
+            out[0] -= amount or 0.0
+            out[1] -= count
+        if user_id is not None:
+            into = deltas[(user_id, month, category)]
+            into[0] += amount or 0.0
+            into[1] += count
+    apply_deltas(db, deltas)
+
+
+def rebuild_monthly_totals(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recomputes the rollup from transactions (one user, or everyone) to repair drift.
+    Returns the number of buckets written. Does not commit.
+    """
+    delete_q = db.query(MonthlyCategoryTotal)
+    if user_id is not None:
+        delete_q = delete_q.filter(MonthlyCategoryTotal.user_id == user_id)
+    delete_q.delete(synchronize_session=False)
+
+    month = _month_expr(db.get_bind().dialect.name).label("month")
+    source = (
+        select(
+            Transaction.user_id,
+            month,
+            Transaction.category,
+            func.sum(Transaction.amount),
+            func.count(),
+        )
+        .where(
+            Transaction.user_id.isnot(None),
+            Transaction.booked_at.isnot(None),
+            Transaction.category.isnot(None),
+        )
+        .group_by(Transaction.user_id, month, Transaction.category)
+    )
+    if user_id is not None:
+        source = source.where(Transaction.user_id == user_id)
+
+    table = MonthlyCategoryTotal.__table__
+    db.execute(
+        insert(table).from_select(["user_id", "month", "category", "total", "txn_count"], source)
+    )
+    count_q = db.query(func.count()).select_from(MonthlyCategoryTotal)
+    if user_id is not None:
+        count_q = count_q.filter(MonthlyCategoryTotal.user_id == user_id)
+    return count_q.scalar()
@@ -0,0 +1,348 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import requests
+
+from app.config import settings
+from app import metrics
+from app.database import SessionLocal
+from app.models.tables import Connection, Account, Transaction, Balance
+from app.services import truelayer, tokens, ingest, balance_history, rollups, forecast_cache, recurring, sync_schedule
+from app.services import categoriser as categoriser_service
+
+logger = logging.getLogger(__name__)
+
+# A connection's first sync fetches this much history
+INITIAL_HISTORY_DAYS = 90
+
+
+@dataclass
+class ConnectionSyncResult:
+    connection_id: int
+    user_id: Optional[int] = None
+    ok: bool = True
+    accounts: int = 0
+    transactions_fetched: int = 0
+    transactions_inserted: int = 0
+    http_calls: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class SyncStats:
+    """Throughput numbers for one run of the sync engine."""
+    connections_total: int = 0
+    connections_ok: int = 0
+    connections_failed: int = 0
+    accounts: int = 0
+    transactions_fetched: int = 0
+    transactions_inserted: int = 0
+    http_calls: int = 0
+    tokens_refreshed: int = 0
+    duration: float = 0.0
+    slowest_connection: float = 0.0
+    errors: dict = field(default_factory=dict)
+    changed_users: set = field(default_factory=set)
+
+    def add(self, result: ConnectionSyncResult):
+        if result.ok:
+            self.connections_ok += 1
+        else:
+            self.connections_failed += 1
+            self.errors[result.connection_id] = result.error
+        self.accounts += result.accounts
+        self.transactions_fetched += result.transactions_fetched
+        self.transactions_inserted += result.transactions_inserted
+        self.http_calls += result.http_calls
+        if result.transactions_inserted and result.user_id is not None:
+            self.changed_users.add(result.user_id)
+        self.slowest_connection = max(self.slowest_connection, result.duration)
+
+    def as_dict(self):
+        elapsed = self.duration or 1e-9
+        return {
+            "connections_total": self.connections_total,
+            "connections_ok": self.connections_ok,
+            "connections_failed": self.connections_failed,
+            "accounts": self.accounts,
+            "transactions_fetched": self.transactions_fetched,
+            "transactions_inserted": self.transactions_inserted,
+            "http_calls": self.http_calls,
+            "tokens_refreshed": self.tokens_refreshed,
+            "users_changed": len(self.changed_users),
+            "duration_seconds": round(self.duration, 3),
+            "slowest_connection_seconds": round(self.slowest_connection, 3),
+            "connections_per_second": round(self.connections_total / elapsed, 2),
+            "transactions_per_second": round(self.transactions_fetched / elapsed, 2),
+        }
+
+
+class _Limiter:
+    """Caps the number of TrueLayer calls in flight across every worker of a run."""
+
+    def __init__(self, limit: int):
+        self._sem = threading.BoundedSemaphore(max(1, limit))
+        self._lock = threading.Lock()
+
+    def call(self, result: ConnectionSyncResult, fn, *args):
+        with self._lock:
+            result.http_calls += 1
+        with self._sem:
+            return fn(*args)
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _reassign_account(db, account: Account, conn: Connection):
+    previous = db.get(Connection, account.connection_id) if account.connection_id is not None else None
+    account.connection_id = conn.id
+    if previous is None or previous.user_id != conn.user_id:
+        rollups.move_account(db, account.account_id, conn.user_id)
+        for model in (Transaction, Balance):
+            db.query(model).filter(model.account_id == account.account_id).update(
+                {model.user_id: conn.user_id}, synchronize_session=False
+            )
+        # The moved transactions leave one user's recurring series and join the other's
+        keys = {
+            key for (key,) in
+            db.query(Transaction.merchant_key).filter(Transaction.account_id == account.account_id).distinct()
+        }
+        # In user order, so concurrent reassignments take refresh_series' user locks consistently
+        for user_id in sorted({previous.user_id if previous else None, conn.user_id} - {None}):
+            recurring.refresh_series(db, user_id, keys)
+            # The rows already exist, so the sync inserts nothing and would not bump it otherwise
+            forecast_cache.bump_data_version(db, user_id)
+
+
+def sync_connection(
+    connection_id: int,
+    fetch_pool: ThreadPoolExecutor,
+    limiter: _Limiter,
+    categoriser: Optional[categoriser_service.Categoriser] = None,
+) -> ConnectionSyncResult:
+    """
+    Syncs a single connection with its own session.
+
+    Balance and transaction fetches for every account are submitted to the shared
+    fetch pool up front; the DB writes then happen in account order on this thread,
+    committing after each account exactly like the sequential job did.
+    """
+    result = ConnectionSyncResult(connection_id=connection_id)
+    started = time.perf_counter()
+    db = SessionLocal()
+    pending = []
+    try:
+        if categoriser is None:
+            categoriser = categoriser_service.get_categoriser(db)
+
+        conn = db.get(Connection, connection_id)
+        if conn is None:
+            result.ok = False
+            result.error = "connection not found"
+            return result
+        result.user_id = conn.user_id
+
+        # Reuse the stored access token unless it is about to expire
+        def refresh_fn(refresh_token):
+            return limiter.call(result, truelayer.refresh_token, refresh_token)
+
+        access_token, refreshed = tokens.access_token(db, conn, refresh_fn)
+        try:
+            accounts_data = limiter.call(result, truelayer.get_accounts, access_token)
+        except requests.HTTPError as e:
+            if refreshed or e.response is None or e.response.status_code != 401:
+                raise
+            # Revoked or expired early: refresh once and carry on
+            access_token = tokens.refresh(db, conn, refresh_fn, force=True)
+            accounts_data = limiter.call(result, truelayer.get_accounts, access_token)
+
+        # Update Connection Provider if unknown
+        if accounts_data and (not conn.provider or conn.provider in ("unknown", "unknown_provider")):
+            p_id = accounts_data[0].get("provider", {}).get("provider_id")
+            if p_id:
+                conn.provider = p_id
+                db.commit()
+
+        account_ids = [acc["account_id"] for acc in accounts_data]
+        existing = {
+            a.account_id: a
+            for a in db.query(Account).filter(Account.account_id.in_(account_ids)).all()
+        } if account_ids else {}
+
+        # Fan out the per-account HTTP calls before touching the DB
+        to_date = datetime.now()
+        for acc in accounts_data:
+            account = existing.get(acc["account_id"])
+            # Default to 3 months if no history, else from last sync minus a 7 day overlap
+            # to catch delayed/settled transactions
+            from_date = to_date - timedelta(days=INITIAL_HISTORY_DAYS)
+            if account is not None and account.last_sync_at:
+                from_date = account.last_sync_at - timedelta(days=7)
+
+            balance_f = fetch_pool.submit(limiter.call, result, truelayer.get_balance, access_token, acc["account_id"])
+            txns_f = fetch_pool.submit(
+                limiter.call, result, truelayer.get_transactions,
+                access_token, acc["account_id"],
+                from_date.strftime("%Y-%m-%d"), to_date.strftime("%Y-%m-%d"),
+            )
+            pending.append((acc, balance_f, txns_f))
+
+        for acc, balance_f, txns_f in pending:
+            # Upsert account
+            account = existing.get(acc["account_id"])
+            if account is None:
+                account = Account(
+                    account_id=acc["account_id"],
+                    connection_id=conn.id,
+                    name=acc["display_name"],
+                    type=acc["account_type"],
+                    currency=acc["currency"],
+                    masked_number=acc.get("account_number", {}).get("swift_bic", "")  # Simplified
+                )
+                db.add(account)
+            elif account.connection_id != conn.id:
+                # Account re-linked under a new connection: move it, and its denormalised owner, over
+                _reassign_account(db, account, conn)
+
+            balances = balance_f.result()
+            if balances:
+                b = balances[0]
+                balance_history.record_balance(db, account, conn.user_id, b, _parse_ts(b["update_timestamp"]))
+
+            txns = txns_f.result()
+            result.transactions_fetched += len(txns)
+            categories = categoriser.categorise_many(txns)
+            rows = [
+                {
+                    "txn_id": t["transaction_id"],
+                    "account_id": acc["account_id"],
+                    "user_id": conn.user_id,
+                    "booked_at": _parse_ts(t["timestamp"]),
+                    "amount": t["amount"],
+                    "currency": t["currency"],
+                    "description": t["description"],
+                    "merchant": t.get("merchant_name"),
+                    "merchant_key": recurring.merchant_key(t.get("merchant_name"), t["description"]),
+                    "category": cat,
+                    "raw_json": t,
+                }
+                for t, cat in zip(txns, categories)
+            ]
+            # The account row must exist before its transactions reference it
+            db.flush()
+            ingested = ingest.ingest_transactions(db, acc["account_id"], rows)
+            result.transactions_inserted += ingested.inserted
+            if ingested.inserted:
+                inserted_ids = set(ingested.inserted_ids)
+                inserted = [r for r in rows if r["txn_id"] in inserted_ids]
+                rollups.add_transactions(db, inserted)
+                recurring.refresh_series(db, conn.user_id, {r["merchant_key"] for r in inserted})
+                forecast_cache.bump_data_version(db, conn.user_id)
+            logger.debug(
+                f"Account {acc['account_id']}: {ingested.inserted} inserted, {ingested.skipped} skipped "
+                f"({ingested.rows_per_second:.0f} rows/s)"
+            )
+
+            account.last_sync_at = to_date
+            db.commit()
+            result.accounts += 1
+
+        sync_schedule.record_sync(conn, result.transactions_inserted, INITIAL_HISTORY_DAYS)
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        for _, balance_f, txns_f in pending:
+            balance_f.cancel()
+            txns_f.cancel()
+        try:
+            conn = db.get(Connection, connection_id)
+            if conn is not None:
+                sync_schedule.record_failure(conn)
+                db.commit()
+        except Exception:
+            db.rollback()
+        result.ok = False
+        if hasattr(e, 'response') and e.response is not None:
+            result.error = f"{e.response.status_code} {e.response.text}"
+        else:
+            result.error = str(e)
+        logger.error(f"Error syncing connection {connection_id}: {result.error}")
+    finally:
+        db.close()
+        result.duration = time.perf_counter() - started
+    return result
+
+
+def run_sync(
+    user_id: Optional[int] = None,
+    connection_ids: Optional[Iterable[int]] = None,
+    due_only: bool = False,
+) -> SyncStats:
+    """
+    Syncs every active connection (optionally for one user, only the given
+    connections, or only those whose scheduled sync is due) on a worker pool.
+
+    SYNC_MAX_WORKERS connections are processed at once, each with its own session,
+    and SYNC_MAX_CONCURRENCY bounds the TrueLayer calls in flight across the run.
+    """
+    stats = SyncStats()
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        query = db.query(Connection.id).filter(Connection.status == "active")
+        if user_id is not None:
+            query = query.filter(Connection.user_id == user_id)
+        if connection_ids is not None:
+            query = query.filter(Connection.id.in_(list(connection_ids)))
+        if due_only:
+            query = query.filter(sync_schedule.is_due())
+        connection_ids = [row.id for row in query.all()]
+        # Compiled once per run and shared read-only by every worker
+        categoriser = categoriser_service.get_categoriser(db)
+    finally:
+        db.close()
+
+    stats.connections_total = len(connection_ids)
+    if connection_ids:
+        limiter = _Limiter(settings.SYNC_MAX_CONCURRENCY)
+        workers = max(1, min(settings.SYNC_MAX_WORKERS, len(connection_ids)))
+        with ThreadPoolExecutor(max_workers=settings.SYNC_MAX_CONCURRENCY, thread_name_prefix="sync-fetch") as fetch_pool, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync-conn") as conn_pool:
+            # Refresh every token that is about to expire up front, in parallel, so no
+            # connection waits on its own refresh before its first data call
+            db = SessionLocal()
+            try:
+                stats.tokens_refreshed = tokens.refresh_expiring(db, connection_ids, fetch_pool)
+            finally:
+                db.close()
+            stats.http_calls += stats.tokens_refreshed
+            futures = [
+                conn_pool.submit(sync_connection, conn_id, fetch_pool, limiter, categoriser)
+                for conn_id in connection_ids
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                stats.add(result)
+                metrics.SYNC_CONNECTION_SECONDS.labels("ok" if result.ok else "failed").observe(result.duration)
+
+    stats.duration = time.perf_counter() - started
+    metrics.SYNC_RUNS.inc()
+    metrics.SYNC_RUN_SECONDS.observe(stats.duration)
+    metrics.SYNC_TRANSACTIONS.labels("fetched").inc(stats.transactions_fetched)
+    metrics.SYNC_TRANSACTIONS.labels("inserted").inc(stats.transactions_inserted)
+    logger.info(f"Sync run finished: {stats.as_dict()}")
+
+    # Precompute forecasts for users with new data so the next dashboard load is a cache hit
+    if stats.changed_users:
+        forecast_cache.warm_up(sorted(stats.changed_users))
+    return stats
@@ -0,0 +1,309 @@
+"""
+DB-backed sync job queue, so API replicas and any number of workers share sync load.
+
+Each connection has at most one sync_jobs row. enqueue() marks it "queued"; a
+worker claims due jobs by moving them to "running" under a lease (lease_owner,
+lease_expires_at) that its heartbeat keeps extending while the sync runs. A
+job is claimable when it is queued and past run_after, or running with a lapsed
+lease (its worker died). Claims and state changes are UPDATEs guarded on the
+row still being in the expected state, so two workers never hold the same
+connection. On Postgres, claim candidates are picked with
+SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers pass over each other's
+rows instead of waiting on them; SQLite serialises writers, so the guarded
+UPDATE alone is enough there.
+
+A failed job is requeued with exponential backoff until it has been claimed
+SYNC_JOB_MAX_ATTEMPTS times, then stays "failed" until it is next enqueued.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, insert, or_, select, update
+
+from app.config import settings
+from app import metrics
+from app.database import SessionLocal
+from app.models.tables import Connection, SyncJob
+from app.services import sync_engine, sync_schedule
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class WorkerStats:
+    claimed: int = 0
+    done: int = 0
+    retry: int = 0
+    failed: int = 0
+    lost: int = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _insert_ignore(dialect_name: str):
+    """INSERT that leaves an existing job row for the connection alone."""
+    table = SyncJob.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing(index_elements=[table.c.connection_id])
+    if dialect_name == "sqlite":
+        return insert(table).prefix_with("OR IGNORE")
+    return insert(table)
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(SyncJob.status == "queued", SyncJob.run_after <= now),
+        and_(SyncJob.status == "running", SyncJob.lease_expires_at < now),
+    )
+
+
+def _held_by(worker_id: str):
+    return and_(SyncJob.status == "running", SyncJob.lease_owner == worker_id)
+
+
+def enqueue(db, connection_ids: Iterable[int], run_after: Optional[datetime] = None) -> int:
+    """
+    Queues a sync of each connection from `run_after` (default now), unless one
+    is already running. A queued job waiting on backoff is brought forward.
+    The caller commits. Returns how many jobs were queued or brought forward.
+    """
+    connection_ids = sorted(set(connection_ids))
+    if not connection_ids:
+        return 0
+    now = datetime.utcnow()
+    run_after = run_after or now
+
+    existing = set(db.execute(
+        select(SyncJob.connection_id).where(SyncJob.connection_id.in_(connection_ids))
+    ).scalars())
+    missing = [cid for cid in connection_ids if cid not in existing]
+    if missing:
+        # Another replica may be enqueueing the same connections
+        db.execute(_insert_ignore(db.get_bind().dialect.name), [
+            {"connection_id": cid, "status": "queued", "run_after": run_after, "attempts": 0, "enqueued_at": now}
+            for cid in missing
+        ])
+    requeued = db.execute(
+        update(SyncJob)
+        .where(SyncJob.connection_id.in_(connection_ids), SyncJob.status.in_(("done", "failed")))
+        .values(status="queued", run_after=run_after, attempts=0, enqueued_at=now, last_error=None)
+    ).rowcount
+    brought_forward = db.execute(
+        update(SyncJob)
+        .where(SyncJob.connection_id.in_(connection_ids), SyncJob.status == "queued", SyncJob.run_after > run_after)
+        .values(run_after=run_after)
+    ).rowcount
+    return len(missing) + requeued + brought_forward
+
+
+def enqueue_due(db, now: Optional[datetime] = None) -> int:
+    """Queues every connection whose scheduled sync is due and has no job queued or running."""
+    now = now or datetime.utcnow()
+    due = db.execute(
+        select(Connection.id)
+        .outerjoin(SyncJob, SyncJob.connection_id == Connection.id)
+        .where(
+            sync_schedule.is_due(now),
+            or_(SyncJob.connection_id.is_(None), SyncJob.status.in_(("done", "failed"))),
+        )
+    ).scalars().all()
+    return enqueue(db, due, run_after=now)
+
+
+def claim(db, worker_id: str, limit: int, lease_seconds: Optional[float] = None) -> list[int]:
+    """Leases up to `limit` due jobs to `worker_id` and commits. Returns their connection ids."""
+    now = datetime.utcnow()
+    lease = timedelta(seconds=lease_seconds or settings.SYNC_JOB_LEASE_SECONDS)
+    claimed, tried = [], set()
+    while len(claimed) < limit:
+        stmt = (
+            select(SyncJob.connection_id)
+            .where(_claimable(now), SyncJob.connection_id.notin_(tried))
+            .order_by(SyncJob.run_after, SyncJob.connection_id)
+            .limit(limit - len(claimed))
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            stmt = stmt.with_for_update(skip_locked=True)
+        candidates = db.execute(stmt).scalars().all()
+        if not candidates:
+            break
+        for connection_id in candidates:
+            tried.add(connection_id)
+            # Re-checked in the UPDATE: another worker may have claimed it since the SELECT
+            result = db.execute(
+                update(SyncJob)
+                .where(SyncJob.connection_id == connection_id, _claimable(now))
+                .values(
+                    status="running", lease_owner=worker_id, lease_expires_at=now + lease,
+                    started_at=now, attempts=SyncJob.attempts + 1,
+                )
+            )
+            if result.rowcount:
+                claimed.append(connection_id)
+    db.commit()
+    return claimed
+
+
+def heartbeat(db, worker_id: str, connection_ids: Iterable[int], lease_seconds: Optional[float] = None) -> set[int]:
+    """Extends the worker's leases and commits. Returns the connection ids it still holds."""
+    connection_ids = list(connection_ids)
+    lease = timedelta(seconds=lease_seconds or settings.SYNC_JOB_LEASE_SECONDS)
+    db.execute(
+        update(SyncJob)
+        .where(SyncJob.connection_id.in_(connection_ids), _held_by(worker_id))
+        .values(lease_expires_at=datetime.utcnow() + lease)
+    )
+    held = set(db.execute(
+        select(SyncJob.connection_id).where(SyncJob.connection_id.in_(connection_ids), _held_by(worker_id))
+    ).scalars())
+    db.commit()
+    return held
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(settings.SYNC_JOB_BACKOFF_MAX, settings.SYNC_JOB_BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def finish(db, worker_id: str, connection_id: int, error: Optional[str] = None) -> str:
+    """
+    Records a job's outcome and commits: "done", "retry" (requeued with backoff),
+    "failed" (out of attempts) or "lost" (the lease lapsed and was taken over).
+    """
+    now = datetime.utcnow()
+    job = db.get(SyncJob, connection_id, populate_existing=True)
+    if job is None or job.status != "running" or job.lease_owner != worker_id:
+        outcome = "lost"
+    else:
+        if error is None:
+            outcome = "done"
+            values = dict(status="done", attempts=0, last_error=None, finished_at=now)
+        elif job.attempts < settings.SYNC_JOB_MAX_ATTEMPTS:
+            outcome = "retry"
+            values = dict(status="queued", run_after=now + timedelta(seconds=_backoff(job.attempts)), last_error=error)
+        else:
+            outcome = "failed"
+            values = dict(status="failed", last_error=error, finished_at=now)
+        # Guarded on the lease too, in case it lapsed and was reclaimed since the read
+        result = db.execute(
+            update(SyncJob)
+            .where(SyncJob.connection_id == connection_id, _held_by(worker_id))
+            .values(lease_owner=None, lease_expires_at=None, **values)
+        )
+        if not result.rowcount:
+            outcome = "lost"
+    db.commit()
+    metrics.SYNC_JOBS.labels(outcome).inc()
+    if outcome == "lost":
+        logger.warning(f"Sync job for connection {connection_id}: lease lost by {worker_id}")
+    elif outcome != "done":
+        logger.warning(f"Sync job for connection {connection_id} {outcome}: {error}")
+    return outcome
+
+
+def _heartbeat_loop(worker_id: str, connection_ids: list[int], stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        db = SessionLocal()
+        try:
+            lost = set(connection_ids) - heartbeat(db, worker_id, connection_ids)
+            if lost:
+                logger.warning(f"Worker {worker_id} lost the leases on connections {sorted(lost)}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Sync job heartbeat failed: {e}")
+        finally:
+            db.close()
+
+
+def process_claimed(worker_id: str, connection_ids: list[int], stats: WorkerStats):
+    """Syncs claimed connections in one sync engine run, heartbeating their leases until it ends."""
+    stop = threading.Event()
+    beat = threading.Thread(
+        target=_heartbeat_loop, args=(worker_id, connection_ids, stop, settings.SYNC_JOB_LEASE_SECONDS / 3),
+        name="sync-heartbeat", daemon=True,
+    )
+    beat.start()
+    try:
+        errors = sync_engine.run_sync(connection_ids=connection_ids).errors
+    except Exception as e:
+        logger.error(f"Sync run for claimed jobs failed: {e}")
+        errors = {connection_id: str(e) for connection_id in connection_ids}
+    finally:
+        stop.set()
+        beat.join()
+
+    db = SessionLocal()
+    try:
+        for connection_id in connection_ids:
+            outcome = finish(db, worker_id, connection_id, errors.get(connection_id))
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+    finally:
+        db.close()
+
+
+def run_worker(
+    worker_id: Optional[str] = None,
+    batch: Optional[int] = None,
+    poll_seconds: Optional[float] = None,
+    stop: Optional[threading.Event] = None,
+    once: bool = False,
+) -> WorkerStats:
+    """
+    Claims and syncs due jobs, `batch` connections per sync engine run, until
+    `stop` is set. With `once`, returns as soon as nothing is due instead of
+    polling every `poll_seconds`.
+    """
+    worker_id = worker_id or default_worker_id()
+    batch = batch or settings.SYNC_MAX_WORKERS
+    poll_seconds = settings.SYNC_WORKER_POLL_SECONDS if poll_seconds is None else poll_seconds
+    stop = stop or threading.Event()
+    stats = WorkerStats()
+    logger.info(f"Sync worker {worker_id} started (batch {batch})")
+
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            claimed = claim(db, worker_id, batch)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Claiming sync jobs failed: {e}")
+            claimed = []
+        finally:
+            db.close()
+
+        if not claimed:
+            if once:
+                break
+            stop.wait(poll_seconds)
+            continue
+        stats.claimed += len(claimed)
+        process_claimed(worker_id, claimed, stats)
+
+    logger.info(f"Sync worker {worker_id} stopped: {stats.as_dict()}")
+    return stats
+
+
+def run_enqueue_job():
+    """Scheduler entry point in SYNC_QUEUE mode: queue every connection that is due."""
+    db = SessionLocal()
+    try:
+        queued = enqueue_due(db)
+        db.commit()
+        if queued:
+            logger.info(f"Queued {queued} sync jobs")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Enqueueing sync jobs failed: {e}")
+    finally:
+        db.close()
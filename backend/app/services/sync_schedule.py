@@ -0,0 +1,71 @@
+"""
+Per-connection sync scheduling from observed activity.
+
+After each successful sync a connection's arrival rate (new transactions per
+day) is updated as a time-decayed average with a RATE_HALF_LIFE_DAYS half-life,
+so the estimate forgets at the same speed however often the connection is
+synced. The next sync is due once about TARGET_NEW_TXNS new transactions are
+expected, clamped to [SYNC_MIN_INTERVAL_MINUTES, SYNC_MAX_INTERVAL_MINUTES]:
+busy connections sync more often than hourly and dormant ones drift out to a
+day. A connection that changed within SYNC_ACTIVE_DAYS is never left longer
+than SYNC_ACTIVE_INTERVAL_MINUTES, so active users are no staler than under a
+fixed hourly sync.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_
+
+from app.config import settings
+from app.models.tables import Connection
+
+# A sync is due once this many new transactions are expected since the last one
+TARGET_NEW_TXNS = 0.5
+RATE_HALF_LIFE_DAYS = 7.0
+
+
+def update_rate(rate: Optional[float], inserted: int, elapsed_days: float) -> float:
+    """Blends the rate observed over the last `elapsed_days` into the running estimate."""
+    observed = inserted / elapsed_days if elapsed_days > 0 else 0.0
+    if rate is None:
+        return observed
+    weight = 1 - 0.5 ** (elapsed_days / RATE_HALF_LIFE_DAYS)
+    return rate + weight * (observed - rate)
+
+
+def interval(rate: Optional[float], last_change_at: Optional[datetime], now: datetime) -> timedelta:
+    minimum = timedelta(minutes=settings.SYNC_MIN_INTERVAL_MINUTES)
+    maximum = timedelta(minutes=settings.SYNC_MAX_INTERVAL_MINUTES)
+    wait = timedelta(days=TARGET_NEW_TXNS / rate) if rate else maximum
+    if last_change_at is not None and now - last_change_at < timedelta(days=settings.SYNC_ACTIVE_DAYS):
+        wait = min(wait, timedelta(minutes=settings.SYNC_ACTIVE_INTERVAL_MINUTES))
+    return max(minimum, min(maximum, wait))
+
+
+def record_sync(conn: Connection, inserted: int, history_days: float, now: Optional[datetime] = None):
+    """
+    Updates the connection's activity stats after a successful sync and schedules
+    the next one; the caller commits. A first sync estimates the rate from the
+    `history_days` of history it fetched.
+    """
+    now = now or datetime.utcnow()
+    if conn.last_synced_at is None:
+        conn.txn_rate = update_rate(None, inserted, history_days)
+    else:
+        conn.txn_rate = update_rate(conn.txn_rate, inserted, (now - conn.last_synced_at).total_seconds() / 86400)
+    if inserted:
+        conn.last_change_at = now
+    conn.last_synced_at = now
+    conn.next_sync_at = now + interval(conn.txn_rate, conn.last_change_at, now)
+
+
+def record_failure(conn: Connection, now: Optional[datetime] = None):
+    """Retries a failed connection after its usual interval; the stats are left alone."""
+    now = now or datetime.utcnow()
+    conn.next_sync_at = now + interval(conn.txn_rate, conn.last_change_at, now)
+
+
+def is_due(now: Optional[datetime] = None):
+    """Filter for active connections whose next sync is due."""
+    now = now or datetime.utcnow()
+    return (Connection.status == "active") & or_(Connection.next_sync_at.is_(None), Connection.next_sync_at <= now)
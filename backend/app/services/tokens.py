@@ -0,0 +1,140 @@
+"""
+Access-token lifecycle for TrueLayer connections.
+
+An access token is stored (encrypted) with its `expires_at`, from the token
+response's `expires_in`, and reused until it is within TOKEN_REFRESH_MARGIN
+seconds of expiry. Decrypted tokens are kept in process, keyed on the stored
+ciphertext, so a reused token costs neither a refresh call nor a decrypt.
+Refreshes of one connection are serialised so concurrent callers don't spend
+the same refresh token twice.
+"""
+import logging
+import threading
+from concurrent.futures import Executor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.tables import Connection
+from app.services import crypto, truelayer
+
+logger = logging.getLogger(__name__)
+
+# TrueLayer access tokens last an hour; assumed when a response omits expires_in
+DEFAULT_LIFETIME_SECONDS = 3600
+
+# connection id -> (access_token_enc, access token)
+_plaintext: dict[int, tuple[str, str]] = {}
+_locks: dict[int, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _lock_for(connection_id: int) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(connection_id, threading.Lock())
+
+
+def _remember(conn: Connection, access_token: str):
+    if conn.id is not None:
+        with _registry_lock:
+            _plaintext[conn.id] = (conn.access_token_enc, access_token)
+
+
+def forget(connection_id: int):
+    """Drops a connection's cached token (call when the connection is deleted)."""
+    with _registry_lock:
+        _plaintext.pop(connection_id, None)
+        _locks.pop(connection_id, None)
+
+
+def store_tokens(conn: Connection, tokens: dict, now: Optional[datetime] = None):
+    """Writes a token response onto the connection; the caller commits."""
+    now = now or datetime.utcnow()
+    conn.access_token_enc = crypto.encrypt(tokens["access_token"])
+    if tokens.get("refresh_token"):
+        conn.refresh_token_enc = crypto.encrypt(tokens["refresh_token"])
+    # A wrong guess costs one 401 and a forced refresh
+    conn.expires_at = now + timedelta(seconds=int(tokens.get("expires_in") or DEFAULT_LIFETIME_SECONDS))
+    _remember(conn, tokens["access_token"])
+
+
+def is_fresh(conn: Connection, now: Optional[datetime] = None, margin: Optional[float] = None) -> bool:
+    """True while the stored access token has more than `margin` seconds left."""
+    if not conn.access_token_enc or conn.expires_at is None:
+        return False
+    margin = settings.TOKEN_REFRESH_MARGIN if margin is None else margin
+    return conn.expires_at > (now or datetime.utcnow()) + timedelta(seconds=margin)
+
+
+def cached_access_token(conn: Connection) -> str:
+    entry = _plaintext.get(conn.id)
+    if entry is not None and entry[0] == conn.access_token_enc:
+        return entry[1]
+    access_token = crypto.decrypt(conn.access_token_enc)
+    _remember(conn, access_token)
+    return access_token
+
+
+def refresh(db, conn: Connection, refresh_fn: Optional[Callable] = None, force: bool = False) -> str:
+    """
+    Refreshes and commits the connection's tokens, returning the new access token.
+
+    A still-fresh stored token is returned instead, unless `force` is set (the
+    provider rejected it); even then, one another caller refreshed while this
+    one waited for the lock is used rather than refreshing twice.
+    """
+    with _lock_for(conn.id):
+        seen = conn.access_token_enc
+        db.refresh(conn)
+        if is_fresh(conn) and (not force or conn.access_token_enc != seen):
+            return cached_access_token(conn)
+        tokens = (refresh_fn or truelayer.refresh_token)(crypto.decrypt(conn.refresh_token_enc))
+        store_tokens(conn, tokens)
+        db.commit()
+        return tokens["access_token"]
+
+
+def access_token(db, conn: Connection, refresh_fn: Optional[Callable] = None) -> tuple[str, bool]:
+    """The connection's access token, refreshed only if near expiry. Returns (token, refreshed)."""
+    if is_fresh(conn):
+        return cached_access_token(conn), False
+    return refresh(db, conn, refresh_fn), True
+
+
+def _refresh_connection(connection_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        conn = db.get(Connection, connection_id)
+        if conn is None:
+            return False
+        refresh(db, conn)
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Token refresh failed for connection {connection_id}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def refresh_expiring(db, connection_ids: Iterable[int], pool: Executor) -> int:
+    """
+    Refreshes, in parallel on `pool`, every listed connection whose access token
+    is missing or within the margin of expiry. Returns how many were refreshed.
+
+    Failures are logged and left for the connection's own sync to retry.
+    """
+    connection_ids = list(connection_ids)
+    if not connection_ids:
+        return 0
+    cutoff = datetime.utcnow() + timedelta(seconds=settings.TOKEN_REFRESH_MARGIN)
+    stale = [
+        row.id for row in db.query(Connection.id).filter(
+            Connection.id.in_(connection_ids),
+            Connection.refresh_token_enc.isnot(None),
+            (Connection.access_token_enc.is_(None)) | (Connection.expires_at.is_(None)) | (Connection.expires_at <= cutoff),
+        )
+    ]
+    futures = [pool.submit(_refresh_connection, connection_id) for connection_id in stale]
+    return sum(1 for future in as_completed(futures) if future.result())
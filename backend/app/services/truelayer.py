@@ -1,51 +1,318 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
 from app.config import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worth another attempt: throttled, or the provider (or a proxy in front of it) is struggling
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Statuses that say a POST was not processed, so resending it cannot apply it twice
+UNPROCESSED_STATUSES = frozenset({429, 503})
+# Latencies kept per endpoint for stats()
+LATENCY_WINDOW = 1024
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second on average, bursts of
+    up to `burst`. pause() stops every caller until a provider's Retry-After
+    has passed. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes one token, blocking until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                if self.rate > 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate <= 0 or self._tokens >= 1:
+                    if self.rate > 0:
+                        self._tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            # Resume gently rather than with a full burst
+            self._tokens = min(self._tokens, 1.0)
+
+
+@dataclass
+class EndpointStats:
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def as_dict(self):
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1) if ordered else 0.0
+
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency_ms_p50": pct(0.5),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_max": pct(1.0),
+        }
+
+
+def _never_sent(error: requests.RequestException) -> bool:
+    """True when the request failed before a connection was made (so the server never saw it)."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds from now; it may be delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TrueLayerClient:
+    """
+    TrueLayer auth and Data API calls over one pooled, keep-alive Session.
+
+    Every request has connect/read timeouts, goes through a shared token bucket
+    (TRUELAYER_RATE_LIMIT/s) and is retried up to TRUELAYER_MAX_RETRIES times
+    with full-jitter exponential backoff on connection errors, timeouts, 429 and
+    5xx. A Retry-After header replaces the backoff delay, and on a 429 pauses
+    the whole client for up to TRUELAYER_BACKOFF_MAX; one longer than that
+    fails the call instead. Token POSTs are only resent when the server cannot have processed
+    them: a failed connect, 429 or 503.
+
+    Safe to share between threads; the sync engine does.
+    """
+
+    def __init__(
+        self,
+        auth_url: Optional[str] = None,
+        api_url: Optional[str] = None,
+        timeout: Optional[tuple[float, float]] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        rate_limit: Optional[float] = None,
+        burst: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        sleep=time.sleep,
+    ):
+        self.auth_url = (auth_url or settings.TRUELAYER_AUTH_URL).rstrip("/")
+        self.api_url = (api_url or settings.TRUELAYER_API_URL).rstrip("/")
+        self.timeout = timeout or (settings.TRUELAYER_CONNECT_TIMEOUT, settings.TRUELAYER_READ_TIMEOUT)
+        self.max_retries = settings.TRUELAYER_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.TRUELAYER_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.TRUELAYER_BACKOFF_MAX if backoff_max is None else backoff_max
+        self._sleep = sleep
+        self.bucket = TokenBucket(
+            settings.TRUELAYER_RATE_LIMIT if rate_limit is None else rate_limit,
+            settings.TRUELAYER_RATE_BURST if burst is None else burst,
+            sleep=sleep,
+        )
+
+        self.session = requests.Session()
+        # One keep-alive connection per concurrent sync fetch, per host
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size or max(10, settings.SYNC_MAX_CONCURRENCY))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats: dict[str, EndpointStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> dict:
+        """Per-endpoint call counts and latency percentiles (over the last LATENCY_WINDOW attempts)."""
+        with self._stats_lock:
+            return {endpoint: s.as_dict() for endpoint, s in sorted(self._stats.items())}
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request(self, endpoint: str, method: str, url: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            stats.calls += 1
+        latency = metrics.TRUELAYER_REQUEST_SECONDS.labels(endpoint)
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            started = time.perf_counter()
+            resp, error, status = None, None, "error"
+            try:
+                resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                status = str(resp.status_code)
+            except requests.RequestException as e:
+                error = e
+            elapsed = time.perf_counter() - started
+            latency.observe(elapsed)
+            metrics.TRUELAYER_RESPONSES.labels(endpoint, status).inc()
+            with self._stats_lock:
+                stats.attempts += 1
+                stats.latencies.append(elapsed)
+
+            if error is not None:
+                retryable = idempotent or _never_sent(error)
+            else:
+                retryable = resp.status_code in (RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES)
+            retry_after = retry_after_seconds(resp.headers.get("Retry-After")) if retryable and resp is not None else None
+            if retry_after is not None:
+                if resp.status_code == 429:
+                    # The limit is per client, so every thread backs off, but never for longer
+                    # than a retry would wait: one huge Retry-After must not stall the process
+                    self.bucket.pause(min(retry_after, self.backoff_max))
+                if retry_after > self.backoff_max:
+                    # Not worth holding a sync worker for; fail now, the next run picks it up
+                    retryable = False
+
+            if not retryable or attempt >= self.max_retries:
+                if error is not None or resp.status_code >= 400:
+                    with self._stats_lock:
+                        stats.failures += 1
+                if error is not None:
+                    raise error
+                return resp
+
+            delay = self._backoff(attempt) if retry_after is None else retry_after
+            attempt += 1
+            with self._stats_lock:
+                stats.retries += 1
+            metrics.TRUELAYER_RETRIES.labels(endpoint).inc()
+            logger.warning(
+                f"TrueLayer {endpoint} {status if error is None else type(error).__name__}; "
+                f"retry {attempt}/{self.max_retries} in {delay:.2f}s"
+            )
+            self._sleep(delay)
+
+    def _token(self, data: dict) -> dict:
+        data = {"client_id": settings.TRUELAYER_CLIENT_ID, "client_secret": settings.TRUELAYER_CLIENT_SECRET, **data}
+        resp = self._request("token", "POST", f"{self.auth_url}/connect/token", idempotent=False, data=data)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _data(self, endpoint: str, path: str, access_token: str, params: Optional[dict] = None):
+        headers = {"Authorization": f"Bearer {access_token}"}
+        resp = self._request(endpoint, "GET", f"{self.api_url}/data/v1{path}", headers=headers, params=params)
+        resp.raise_for_status()
+        return resp.json()["results"]
+
+    def exchange_code(self, code: str):
+        return self._token({
+            "grant_type": "authorization_code",
+            "redirect_uri": settings.TRUELAYER_REDIRECT_URI,
+            "code": code,
+        })
+
+    def refresh_token(self, refresh_token: str):
+        return self._token({"grant_type": "refresh_token", "refresh_token": refresh_token})
+
+    def get_accounts(self, access_token: str):
+        return self._data("accounts", "/accounts", access_token)
+
+    def get_balance(self, access_token: str, account_id: str):
+        return self._data("balance", f"/accounts/{account_id}/balance", access_token)
+
+    def get_transactions(self, access_token: str, account_id: str, from_date: str, to_date: str):
+        # from_date, to_date in YYYY-MM-DD
+        return self._data(
+            "transactions", f"/accounts/{account_id}/transactions", access_token,
+            params={"from": from_date, "to": to_date},
+        )
+
+    def get_metadata(self, access_token: str):
+        return self._data("me", "/me", access_token)
+
+
+_client: Optional[TrueLayerClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> TrueLayerClient:
+    """The process-wide client, so every caller shares its connections and rate limit."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TrueLayerClient()
+    return _client
+
+
+def set_client(client: Optional[TrueLayerClient]):
+    """Replaces the process-wide client (None: a fresh one from settings on next use)."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None and previous is not client:
+        previous.close()
+
 
+# Module-level API, kept for existing callers
 def exchange_code(code: str):
-    data = {
-        "grant_type": "authorization_code",
-        "client_id": settings.TRUELAYER_CLIENT_ID,
-        "client_secret": settings.TRUELAYER_CLIENT_SECRET,
-        "redirect_uri": settings.TRUELAYER_REDIRECT_URI,
-        "code": code
-    }
-    resp = requests.post(f"{settings.TRUELAYER_AUTH_URL}/connect/token", data=data)
-    resp.raise_for_status()
-    return resp.json()
+    return get_client().exchange_code(code)
 
 def refresh_token(refresh_token: str):
-    data = {
-        "grant_type": "refresh_token",
-        "client_id": settings.TRUELAYER_CLIENT_ID,
-        "client_secret": settings.TRUELAYER_CLIENT_SECRET,
-        "refresh_token": refresh_token
-    }
-    resp = requests.post(f"{settings.TRUELAYER_AUTH_URL}/connect/token", data=data)
-    resp.raise_for_status()
-    return resp.json()
+    return get_client().refresh_token(refresh_token)
 
 def get_accounts(access_token: str):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(f"{settings.TRUELAYER_API_URL}/data/v1/accounts", headers=headers)
-    resp.raise_for_status()
-    return resp.json()["results"]
+    return get_client().get_accounts(access_token)
 
 def get_balance(access_token: str, account_id: str):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(f"{settings.TRUELAYER_API_URL}/data/v1/accounts/{account_id}/balance", headers=headers)
-    resp.raise_for_status()
-    return resp.json()["results"]
+    return get_client().get_balance(access_token, account_id)
 
 def get_transactions(access_token: str, account_id: str, from_date: str, to_date: str):
-    # from_date, to_date in YYYY-MM-DD
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"from": from_date, "to": to_date}
-    resp = requests.get(f"{settings.TRUELAYER_API_URL}/data/v1/accounts/{account_id}/transactions", headers=headers, params=params)
-    resp.raise_for_status()
-    return resp.json()["results"]
+    return get_client().get_transactions(access_token, account_id, from_date, to_date)
 
 def get_metadata(access_token: str):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(f"{settings.TRUELAYER_API_URL}/data/v1/me", headers=headers)
-    resp.raise_for_status()
-    return resp.json()["results"]
+    return get_client().get_metadata(access_token)
@@ -0,0 +1,52 @@
+import argparse
+import logging
+
+from app.config import settings
+from app.services.batch_forecast import run_batch
+
+
+def report(stats, slowest=5):
+    summary = stats.as_dict()
+    print(
+        f"  {summary['users_ok']}/{summary['users_total']} users on {summary['workers']} workers in "
+        f"{summary['wall_seconds']}s ({summary['users_per_second']} users/s, parallelism {summary['parallelism']})"
+    )
+    print(
+        f"  per-user fit: p50 {summary['fit_seconds_p50']}s, p95 {summary['fit_seconds_p95']}s, "
+        f"max {summary['fit_seconds_max']}s, total {summary['fit_seconds_total']}s"
+    )
+    worst = sorted(stats.fit_seconds.items(), key=lambda item: item[1], reverse=True)[:slowest]
+    if worst:
+        print("  slowest: " + ", ".join(f"user {u} {s:.3f}s" for u, s in worst))
+    for user_id, error in stats.errors.items():
+        print(f"  user {user_id} failed: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and store forecasts for every user on a process pool.")
+    parser.add_argument("--user-id", type=int, action="append", default=None, help="Only these users (repeatable)")
+    parser.add_argument("--days", type=int, action="append", default=None, help=f"Horizons to fit (default: {settings.FORECAST_BATCH_DAYS})")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: FORECAST_BATCH_WORKERS, or one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Refit users whose stored forecasts are already current")
+    parser.add_argument("--scaling", type=int, nargs="+", default=None, metavar="N",
+                        help="Refit everyone once per worker count given and compare wall times, e.g. --scaling 1 2 4 8")
+    parser.add_argument("--slowest", type=int, default=5, help="How many of the slowest users to list")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.scaling:
+        baseline = None
+        for workers in args.scaling:
+            stats = run_batch(user_ids=args.user_id, horizons=args.days, workers=workers, force=True)
+            baseline = baseline or stats.wall_seconds
+            print(f"workers={stats.workers} wall={stats.wall_seconds:.2f}s speedup={baseline / stats.wall_seconds:.2f}x")
+            report(stats, args.slowest)
+    else:
+        print("Fitting forecasts...")
+        report(run_batch(user_ids=args.user_id, horizons=args.days, workers=args.workers, force=args.force), args.slowest)
+
+
+# Worker processes are spawned and re-import this module, so only run under __main__
+if __name__ == "__main__":
+    main()
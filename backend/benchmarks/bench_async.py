@@ -0,0 +1,167 @@
+"""
+Load test: sync handlers (threadpool) vs ASYNC_DB=1 (async handlers, async engine).
+
+    python -m benchmarks.bench_async [--users 50] [--concurrency 10 50 200] [--seconds 10]
+
+Seeds a throwaway SQLite database (or BENCH_DATABASE_URL) with `--users` users,
+each with an account and a year of transactions, then starts the API under
+uvicorn once per mode and drives it with concurrent keep-alive clients for
+`--seconds` per concurrency level. Each client loops over /auth/me,
+/api/balances and a 50-row /api/transactions page as a random user.
+Reports requests per second and p50/p99 latency per mode.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_async_")
+os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ.setdefault("TRUELAYER_CLIENT_ID", "bench")
+os.environ.setdefault("TRUELAYER_CLIENT_SECRET", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.auth_utils import create_access_token  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
+from app.models.tables import User, Connection, Account, Transaction  # noqa: E402
+
+PATHS = ("/auth/me", "/api/balances", "/api/transactions?limit=50")
+
+
+def seed(n_users, txns_per_user=400, seed=7):
+    """Returns a bearer token per seeded user."""
+    rng = random.Random(seed)
+    db = SessionLocal()
+    tokens = []
+    try:
+        for u in range(n_users):
+            email = f"bench-async-{u}@example.com"
+            user = db.query(User).filter(User.email == email).first()
+            if user is None:
+                user = User(email=email, hashed_password="x")
+                db.add(user)
+                db.flush()
+                conn = Connection(user_id=user.id, provider="bench", status="active")
+                db.add(conn)
+                db.flush()
+                account_id = f"bench-async-acc-{u}"
+                db.add(Account(
+                    account_id=account_id, connection_id=conn.id, name="Current", currency="GBP",
+                    balance_current=1000.0, balance_available=900.0, balance_as_of=datetime(2026, 1, 1),
+                ))
+                db.flush()
+                start = datetime(2025, 1, 1)
+                db.execute(insert(Transaction), [
+                    {
+                        "txn_id": f"{account_id}-{i}", "account_id": account_id, "user_id": user.id,
+                        "booked_at": start + timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                        "amount": round(rng.uniform(-80, 20), 2), "currency": "GBP",
+                        "description": f"CARD PAYMENT {i % 40}", "merchant": f"Shop {i % 40}",
+                        "merchant_key": f"shop {i % 40}", "category": "Shopping", "raw_json": {},
+                    }
+                    for i in range(txns_per_user)
+                ])
+            tokens.append(create_access_token({"sub": email}))
+        db.commit()
+    finally:
+        db.close()
+    return tokens
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(async_db: bool):
+    port = _free_port()
+    env = dict(os.environ, ASYNC_DB="1" if async_db else "0", DISABLE_SCHEDULER="1")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            if httpx.get(f"{base}/health").status_code == 200:
+                return proc, base
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("API did not start")
+
+
+async def drive(base, tokens, concurrency, seconds):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def client_loop(client, rng):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+            path = PATHS[rng.randrange(len(PATHS))]
+            started = time.perf_counter()
+            try:
+                resp = await client.get(path, headers=headers)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        # Warm the pool and the app before measuring
+        await asyncio.gather(*(client.get("/health") for _ in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, random.Random(i)) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {"requests": len(latencies), "rps": len(latencies) / wall, "p50": pct(0.5), "p99": pct(0.99), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    run_migrations()
+    tokens = seed(args.users)
+
+    print(f"database: {os.environ['DATABASE_URL']}, {args.users} users, {args.seconds:g}s per run")
+    print(f"{'mode':<6} {'clients':>7} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for async_db in (False, True):
+        proc, base = start_server(async_db)
+        try:
+            for concurrency in args.concurrency:
+                r = asyncio.run(drive(base, tokens, concurrency, args.seconds))
+                print(
+                    f"{'async' if async_db else 'sync':<6} {concurrency:>7} {r['requests']:>9} {r['rps']:>8.1f} "
+                    f"{r['p50']:>8.1f} {r['p99']:>8.1f} {r['errors']:>7}"
+                )
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
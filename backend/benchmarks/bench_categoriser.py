@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: compiled Categoriser vs the old inline keyword loop.
+
+    python -m benchmarks.bench_categoriser [--rows 200000] [--custom-rules 300]
+
+The first comparison uses only the built-in rules against the old inline
+dict. The second adds N synthetic CategoryRule rows and compares against a
+plain "first rule whose keyword is in the text" loop over the same rules.
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("TRUELAYER_CLIENT_ID", "bench")
+os.environ.setdefault("TRUELAYER_CLIENT_SECRET", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
+
+from app.services.categoriser import Categoriser, DEFAULT_RULES  # noqa: E402
+
+WORDS = [
+    "card payment", "tesco stores 3021", "uber *trip", "pret a manger", "netflix.com", "amazon mktplace",
+    "council tax dd", "salary acme ltd", "transfer to savings", "pos 4492", "london", "contactless",
+    "ref 88231", "direct debit", "online", "bills", "gym", "hmrc", "refund", "the corner shop",
+]
+
+
+def legacy_categorise(t):
+    cat = "Uncategorised"
+    desc_lower = (t.get("description") or "").lower()
+    merchant_lower = (t.get("merchant_name") or "").lower()
+    combined = f"{desc_lower} {merchant_lower}"
+    rules = {
+        "Groceries": ["tesco", "sainsbury", "asda", "aldi", "lidl", "waitrose", "morrisons", "co-op"],
+        "Transport": ["uber", "train", "bus", "tfl", "petrol", "shell", "bp ", "esso", "parking"],
+        "Eating Out": ["restaurant", "cafe", "coffee", "starbucks", "costa", "pret", "mcdonalds", "kfc", "nandos", "deliveroo", "eats"],
+        "Entertainment": ["netflix", "spotify", "cinema", "odeon", "prime video", "disney", "ticketmaster"],
+        "Shopping": ["amazon", "ebay", "asos", "zara", "boots", "argos", "apple"],
+        "Bills": ["council tax", "water", "gas", "electricity", "energy", "virgin media", "bt ", "sky ", "vodafone", "o2", "ee "],
+        "Income": ["salary", "payroll", "dividend", "interest"],
+        "Transfers": ["transfer", "amex", "credit card", "save the change", "paypal"]
+    }
+    found = False
+    for category, keywords in rules.items():
+        if any(k in combined for k in keywords):
+            cat = category
+            found = True
+            break
+    if not found and t.get("transaction_classification"):
+        cat = t["transaction_classification"][0]
+    return cat
+
+
+def naive_categorise(rules, t):
+    combined = f"{(t.get('description') or '').lower()} {(t.get('merchant_name') or '').lower()}"
+    for keyword, category in rules:
+        if keyword in combined:
+            return category
+    if t.get("transaction_classification"):
+        return t["transaction_classification"][0]
+    return "Uncategorised"
+
+
+def make_custom_rules(n, seed=11):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [("".join(rng.choice(letters) for _ in range(rng.randint(5, 10))), f"Custom {i % 12}") for i in range(n)]
+
+
+def _time(label, rows, fn):
+    start = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12}: {elapsed:.3f}s  {rows / elapsed:>12,.0f} rows/s")
+    return out, elapsed
+
+
+def make_txns(n, seed=7):
+    rng = random.Random(seed)
+    txns = []
+    for _ in range(n):
+        txns.append({
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).upper(),
+            "merchant_name": rng.choice([None, "", "Tesco", "Costa Coffee", "Shell", "Local Cafe"]),
+            "transaction_classification": rng.choice([[], ["Shopping", "General"], ["Bills and Utilities"]]),
+        })
+    return txns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--custom-rules", type=int, default=300)
+    args = parser.parse_args()
+
+    txns = make_txns(args.rows)
+    keywords = sum(len(v) for v in DEFAULT_RULES.values())
+
+    print(f"rows={args.rows} built-in keywords={keywords}")
+    expected, legacy_s = _time("legacy dict", args.rows, lambda: [legacy_categorise(t) for t in txns])
+    categoriser = Categoriser.from_rule_rows([])
+    got, compiled_s = _time("compiled", args.rows, lambda: categoriser.categorise_many(txns))
+    assert got == expected, "compiled categoriser disagrees with the legacy rules"
+    print(f"speedup     : {legacy_s / compiled_s:.1f}x")
+
+    custom = make_custom_rules(args.custom_rules)
+    all_rules = custom + [(k, c) for c, ks in DEFAULT_RULES.items() for k in ks]
+    print(f"\nrows={args.rows} custom rules={len(custom)} total keywords={len(all_rules)}")
+    expected, naive_s = _time("naive loop", args.rows, lambda: [naive_categorise(all_rules, t) for t in txns])
+    start = time.perf_counter()
+    categoriser = Categoriser.from_rule_rows(custom)
+    compile_s = time.perf_counter() - start
+    got, compiled_s = _time("compiled", args.rows, lambda: categoriser.categorise_many(txns))
+    assert got == expected, "compiled categoriser disagrees with the naive rule loop"
+    print(f"speedup     : {naive_s / compiled_s:.1f}x  (compile {compile_s * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
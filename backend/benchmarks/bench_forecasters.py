@@ -0,0 +1,105 @@
+"""
+Benchmark and accuracy harness for the forecast engines in forecasting.FORECASTERS.
+
+    python -m benchmarks.bench_forecasters [--histories 200] [--horizon 30]
+
+Builds synthetic daily spend histories (weekday/weekend pattern, lumpy one-off
+purchases, occasional shifts in spending level, refunds), turns each into the
+cumulative series generate_forecast fits, holds out the last `horizon` days and
+scores each engine's projection of that window:
+
+- MAE: mean absolute error of the cumulative curve over the window (GBP)
+- end error: absolute error on the final day, as % of actual spend in the window
+
+Fit time is per history. The cost of importing statsmodels is measured in a
+fresh interpreter.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("TRUELAYER_CLIENT_ID", "bench")
+os.environ.setdefault("TRUELAYER_CLIENT_SECRET", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.services.forecasting import FORECASTERS  # noqa: E402
+
+
+def make_history(rng, days):
+    """Daily variable spend (negative) for one synthetic user."""
+    base = rng.uniform(10, 60)
+    weekly = np.where(pd.date_range("2024-01-01", periods=days).dayofweek >= 5, rng.uniform(1.2, 2.0), 1.0)
+    level = np.ones(days)
+    for _ in range(rng.poisson(1.5)):
+        # Spending habits change: a new level from some day onwards
+        level[rng.integers(days):] *= rng.uniform(0.6, 1.5)
+    active = rng.random(days) < rng.uniform(0.5, 0.95)
+    spend = base * weekly * level * rng.gamma(2.0, 0.5, days) * active
+    lumps = rng.random(days) < 0.02
+    spend[lumps] += rng.uniform(100, 1500, lumps.sum())
+    refunds = rng.random(days) < 0.01
+    spend[refunds] -= rng.uniform(20, 200, refunds.sum())
+    daily = pd.Series(-spend, index=pd.date_range("2024-01-01", periods=days, freq="D"))
+    return daily.cumsum()
+
+
+def score(engine, histories, horizon):
+    errors, end_errors, fit_seconds, failures = [], [], [], 0
+    for series in histories:
+        train, test = series.iloc[:-horizon], series.iloc[-horizon:]
+        start = time.perf_counter()
+        try:
+            pred = engine.predict(train, horizon)
+        except Exception:
+            failures += 1
+            continue
+        fit_seconds.append(time.perf_counter() - start)
+        actual = test.to_numpy() - train.iloc[-1]
+        projected = np.asarray(pred) - train.iloc[-1]
+        errors.append(np.mean(np.abs(projected - actual)))
+        end_errors.append(abs(projected[-1] - actual[-1]) / max(abs(actual[-1]), 1.0) * 100)
+    return {
+        "mae": np.mean(errors),
+        "end_err_median": np.median(end_errors),
+        "end_err_p90": np.percentile(end_errors, 90),
+        "fit_ms_mean": np.mean(fit_seconds) * 1000,
+        "fit_ms_p95": np.percentile(fit_seconds, 95) * 1000,
+        "failures": failures,
+    }
+
+
+def import_seconds(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--histories", type=int, default=200)
+    parser.add_argument("--days", type=int, nargs="+", default=[120, 365, 730], help="History lengths to test")
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"import statsmodels.tsa.holtwinters: {import_seconds('statsmodels.tsa.holtwinters'):.2f}s (fresh interpreter)")
+    for days in args.days:
+        rng = np.random.default_rng(args.seed + days)
+        histories = [make_history(rng, days) for _ in range(args.histories)]
+        print(f"\n{args.histories} histories x {days} days, horizon {args.horizon}")
+        print(f"{'engine':<12} {'MAE':>9} {'end% p50':>9} {'end% p90':>9} {'fit ms':>8} {'p95 ms':>8} {'failed':>7}")
+        for name, engine in FORECASTERS.items():
+            r = score(engine, histories, args.horizon)
+            print(
+                f"{name:<12} {r['mae']:>9.1f} {r['end_err_median']:>9.1f} {r['end_err_p90']:>9.1f} "
+                f"{r['fit_ms_mean']:>8.2f} {r['fit_ms_p95']:>8.2f} {r['failures']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: column-projected frame loader vs the old ORM `__dict__` path.
+
+    python -m benchmarks.bench_frames [--rows 10000 100000 1000000]
+
+Seeds a throwaway SQLite database (or BENCH_DATABASE_URL) with one user's
+transactions, each carrying a TrueLayer-sized raw_json payload, then times
+building the forecasting DataFrame both ways. Peak Python allocations are
+measured with tracemalloc in a second run, so they are relative, not RSS.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_frames_")
+os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ.setdefault("TRUELAYER_CLIENT_ID", "bench")
+os.environ.setdefault("TRUELAYER_CLIENT_SECRET", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
+
+import pandas as pd  # noqa: E402
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
+from app.models.tables import User, Connection, Account, Transaction  # noqa: E402
+from app.services import frames  # noqa: E402
+
+MERCHANTS = ["Tesco", "Costa Coffee", "Shell", "Netflix", "Amazon", "TfL", None, "Pret A Manger", "Council Tax"]
+CATEGORIES = ["Groceries", "Eating Out", "Transport", "Entertainment", "Shopping", "Bills", "Uncategorised"]
+
+
+def _raw_json(i, booked_at, amount, merchant):
+    # Roughly what TrueLayer returns per transaction
+    return {
+        "transaction_id": f"bench-{i}",
+        "timestamp": booked_at.isoformat() + "Z",
+        "description": f"CARD PAYMENT TO {merchant or 'UNKNOWN'} REF {i}",
+        "amount": amount,
+        "currency": "GBP",
+        "transaction_type": "DEBIT" if amount < 0 else "CREDIT",
+        "transaction_category": "PURCHASE",
+        "transaction_classification": ["Shopping", "General"],
+        "merchant_name": merchant,
+        "running_balance": {"amount": 1234.56, "currency": "GBP"},
+        "meta": {"provider_transaction_category": "DEB", "provider_reference": f"{i:012d}"},
+    }
+
+
+def seed(db, user_id, account_id, n, seed=3):
+    rng = random.Random(seed)
+    db.execute(delete(Transaction).where(Transaction.user_id == user_id))
+    start = datetime(2020, 1, 1)
+    batch = []
+    for i in range(n):
+        booked_at = start + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 3))
+        amount = round(rng.uniform(-120, 40), 2)
+        merchant = rng.choice(MERCHANTS)
+        batch.append({
+            "txn_id": f"bench-{i}",
+            "account_id": account_id,
+            "user_id": user_id,
+            "booked_at": booked_at,
+            "amount": amount,
+            "currency": "GBP",
+            "description": f"CARD PAYMENT TO {merchant or 'UNKNOWN'} REF {i}",
+            "merchant": merchant,
+            "category": rng.choice(CATEGORIES),
+            "raw_json": _raw_json(i, booked_at, amount, merchant),
+        })
+        if len(batch) == 10_000:
+            db.execute(insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Transaction), batch)
+    db.commit()
+
+
+def legacy_frame(db, user_id):
+    raw_tx = db.query(Transaction).filter(Transaction.user_id == user_id).all()
+    df = pd.DataFrame([t.__dict__ for t in raw_tx])
+    df["booked_at"] = pd.to_datetime(df["booked_at"])
+    return df
+
+
+def _measure(fn):
+    # Timed and memory-traced separately: tracemalloc slows allocation-heavy code a lot
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        df = fn(db)
+        elapsed = time.perf_counter() - start
+        frame_bytes = df.memory_usage(deep=True).sum()
+        rows = len(df)
+        del df
+        db.expunge_all()
+
+        tracemalloc.start()
+        fn(db)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return rows, elapsed, peak, frame_bytes
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    run_migrations()
+    db = SessionLocal()
+    user = db.query(User).filter(User.email == "bench-frames@example.com").first()
+    if user is None:
+        user = User(email="bench-frames@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        conn = Connection(user_id=user.id, provider="bench", status="active")
+        db.add(conn)
+        db.flush()
+        db.add(Account(account_id="bench-frames-acc", connection_id=conn.id, name="Bench", currency="GBP"))
+        db.commit()
+    user_id = user.id
+
+    print(f"database: {os.environ['DATABASE_URL']}")
+    print(f"{'rows':>10} {'path':<8} {'seconds':>8} {'peak MB':>9} {'frame MB':>9}")
+    for n in args.rows:
+        seed(db, user_id, "bench-frames-acc", n)
+        results = {}
+        for label, fn in (
+            ("legacy", lambda s: legacy_frame(s, user_id)),
+            ("loader", lambda s: frames.load_transactions_frame(s, user_id=user_id)),
+        ):
+            rows, elapsed, peak, frame_bytes = _measure(fn)
+            results[label] = (elapsed, peak)
+            assert rows == n
+            print(f"{n:>10,} {label:<8} {elapsed:>8.3f} {peak / 2**20:>9.1f} {frame_bytes / 2**20:>9.1f}")
+        (legacy_s, legacy_peak), (loader_s, loader_peak) = results["legacy"], results["loader"]
+        print(f"{'':>10} {'gain':<8} {legacy_s / loader_s:>7.1f}x {legacy_peak / loader_peak:>8.1f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: vectorised analyze_patterns vs the old per-group loop.
+
+    python -m benchmarks.bench_patterns [--rows 10000 100000] [--merchants 2000]
+
+Generates a synthetic history mixing weekly, monthly and yearly bills with
+noisy one-off spending, checks both detectors agree, and times each.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("TRUELAYER_CLIENT_ID", "bench")
+os.environ.setdefault("TRUELAYER_CLIENT_SECRET", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.services.forecasting import analyze_patterns  # noqa: E402
+
+
+def legacy_analyze_patterns(df):
+    """The row-wise implementation analyze_patterns replaced, kept as the reference."""
+    if df.empty:
+        return [], set(df.index)
+
+    def get_key(row):
+        merchant = row.get('merchant')
+        if isinstance(merchant, str) and merchant:
+            return merchant.lower().strip()
+        return str(row.get('description', '')).lower()[:20]
+
+    df = df.copy()
+    df['key'] = df.apply(get_key, axis=1)
+
+    recurring_groups = []
+    variable_indices = set(df.index)
+
+    for name, group in df.groupby('key'):
+        if len(group) < 2: continue
+        group = group.sort_index()
+        dates = group.index
+        amounts = group['amount']
+
+        gaps = (dates[1:] - dates[:-1]).days
+        if len(gaps) == 0: continue
+        median_gap = np.median(gaps)
+
+        is_weekly = 6 <= median_gap <= 8
+        is_monthly = 26 <= median_gap <= 35
+        is_yearly = 360 <= median_gap <= 370
+        if not (is_weekly or is_monthly or is_yearly):
+            continue
+
+        mean_amt = amounts.mean()
+        std_amt = amounts.std()
+        cv = 0
+        if abs(mean_amt) > 0.01:
+            cv = std_amt / abs(mean_amt)
+        if (cv < 0.2) or (std_amt < 1.0):
+            variable_indices -= set(group.index)
+            days_to_add = 7 if is_weekly else (30 if is_monthly else 365)
+            recurring_groups.append({
+                "name": name,
+                "txns": group,
+                "frequency": "monthly" if is_monthly else ("weekly" if is_weekly else "yearly"),
+                "next_date": dates[-1] + timedelta(days=days_to_add),
+                "next_amount": amounts.iloc[-1],
+            })
+
+    return recurring_groups, variable_indices
+
+
+def make_history(rows, merchants=500, seed=5, categorical=False):
+    """
+    A sorted, booked_at-indexed frame shaped like frames.load_transactions_frame
+    output: a share of merchants bill on a fixed cadence, the rest are noise.
+    """
+    rng = random.Random(seed)
+    start = datetime(2022, 1, 1)
+    records = []
+    cadences = [7, 30, 31, 365, None, None, None]
+    profiles = [
+        (f"Merchant {m:04d}" if rng.random() < 0.8 else rng.choice([None, ""]),
+         rng.choice(cadences), round(rng.uniform(-200, -2), 2), rng.random() < 0.7)
+        for m in range(merchants)
+    ]
+    while len(records) < rows:
+        merchant, cadence, amount, steady = profiles[rng.randrange(merchants)]
+        when = start + timedelta(days=rng.randint(0, 30), hours=rng.randint(0, 23))
+        for _ in range(rng.randint(1, 24)):
+            if len(records) >= rows:
+                break
+            noise = 0 if steady else rng.uniform(-0.6, 0.6) * amount
+            records.append({
+                "txn_id": f"t{len(records)}",
+                "booked_at": when,
+                "amount": round(amount + noise, 2),
+                "description": f"CARD PAYMENT {rng.choice(['LONDON', 'ONLINE', 'REF 1', 'DD'])} {len(records) % 7}",
+                "merchant": merchant,
+                "category": "Bills",
+            })
+            when += timedelta(days=cadence or rng.randint(1, 60), minutes=rng.randint(0, 59))
+
+    df = pd.DataFrame(records)
+    if categorical:
+        df["merchant"] = df["merchant"].astype("category")
+        df["category"] = df["category"].astype("category")
+    return df.set_index("booked_at").sort_index()
+
+
+def _time(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--merchants", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy s':>9} {'vector s':>9} {'speedup':>8} {'bills':>6}")
+    for n in args.rows:
+        df = make_history(n, merchants=args.merchants, categorical=True)
+        (old_groups, old_variable), legacy_s = _time(legacy_analyze_patterns, df, args.repeat)
+        (new_groups, new_variable), vector_s = _time(analyze_patterns, df, args.repeat)
+        assert [g["name"] for g in new_groups] == [g["name"] for g in old_groups]
+        assert new_variable == old_variable
+        print(f"{n:>10,} {legacy_s:>9.3f} {vector_s:>9.3f} {legacy_s / vector_s:>7.1f}x {len(new_groups):>6}")
+
+
+if __name__ == "__main__":
+    main()
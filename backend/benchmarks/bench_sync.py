@@ -0,0 +1,200 @@
+"""
+End-to-end sync benchmark against the local fake TrueLayer server.
+
+    python -m benchmarks.bench_sync [--scenarios 10x3x200 50x3x500] [--latency-ms 40] [--error-rate 0.01]
+
+A scenario is USERSxACCOUNTSxTRANSACTIONS (transactions per account). For each
+one, the fake server (benchmarks/fake_truelayer.py) starts in its own process,
+and a throwaway SQLite database (or BENCH_DATABASE_URL) is seeded with one
+connection per user. Two syncs of those connections follow, each in a fresh
+interpreter: the initial sync fetches and inserts 90 days, and the resync
+fetches the incremental window (7 days back from the last sync), all of it
+already stored. Seeded users (emails, and so fake-server accounts) carry a
+per-scenario tag, so a shared BENCH_DATABASE_URL takes any number of scenarios
+and each one syncs only its own connections.
+
+Reported per run:
+- rows/s: inserted (first) or fetched (resync) transactions per wall second
+- HTTP s / DB s: time summed over all threads inside TrueLayer calls and SQL
+  statements, from the /metrics histograms. Threads overlap, so these can
+  exceed wall time; their ratio shows where the sync path spends its time.
+- peak MB: how far the sync raised its interpreter's peak RSS
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _email_prefix(tag: str) -> str:
+    return f"bench-sync-{tag}-"
+
+
+def seed(tag: str, users: int):
+    """Runs in a child interpreter: one connection per user, whose fake-server user carries the scenario's tag too."""
+    from app.database import SessionLocal
+    from app.migrations import run_migrations
+    from app.models.tables import Connection, User
+    from app.services import crypto
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        for u in range(users):
+            user = User(email=f"{_email_prefix(tag)}{u}@example.com", hashed_password="x")
+            db.add(user)
+            db.flush()
+            db.add(Connection(
+                user_id=user.id, provider="fake-bank", status="active",
+                refresh_token_enc=crypto.encrypt(f"fake-{tag}-u{u}"),
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_phase(tag: str, label: str) -> dict:
+    """
+    Runs in a child interpreter, whose environment already points at the fake
+    server: syncs the scenario's connections once. A fresh interpreter per run
+    keeps one run's peak RSS out of the next one's.
+    """
+    from prometheus_client import REGISTRY
+
+    from app.database import SessionLocal
+    from app.models.tables import Connection, User
+    from app.services import sync_engine
+
+    def totals():
+        """Seconds summed over all threads: in TrueLayer calls, and in SQL on the sync engine."""
+        http_s = db_s = 0.0
+        for metric in REGISTRY.collect():
+            for sample in metric.samples:
+                if sample.name == "vault_truelayer_request_seconds_sum":
+                    http_s += sample.value
+                elif sample.name == "vault_db_statement_seconds_sum" and sample.labels.get("engine") == "sync":
+                    db_s += sample.value
+        return http_s, db_s
+
+    db = SessionLocal()
+    try:
+        connection_ids = [
+            row.id for row in db.query(Connection.id).join(User, User.id == Connection.user_id)
+            .filter(User.email.startswith(_email_prefix(tag)))
+        ]
+    finally:
+        db.close()
+
+    baseline_peak = _peak_rss_mb()
+    http_before, db_before = totals()
+    started = time.perf_counter()
+    # What run_sync_job_logic runs, limited to this scenario's connections
+    stats = sync_engine.run_sync(connection_ids=connection_ids).as_dict()
+    wall = time.perf_counter() - started
+    http_after, db_after = totals()
+    rows = stats["transactions_inserted"] if label == "first" else stats["transactions_fetched"]
+    return {
+        "wall_s": wall,
+        "rows": rows,
+        "rows_per_s": rows / wall if wall else 0.0,
+        "http_calls": stats["http_calls"],
+        "failed": stats["connections_failed"],
+        "http_s": http_after - http_before,
+        "db_s": db_after - db_before,
+        "peak_mb": _peak_rss_mb() - baseline_peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["10x3x200", "50x3x500"], help="USERSxACCOUNTSxTXNS")
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0, help="TRUELAYER_RATE_LIMIT for the run (0: off)")
+    # Child modes
+    parser.add_argument("--tag", help=argparse.SUPPRESS)
+    parser.add_argument("--seed-users", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--run-phase", choices=("first", "resync"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed_users is not None:
+        seed(args.tag, args.seed_users)
+        return
+    if args.run_phase is not None:
+        print(json.dumps(run_phase(args.tag, args.run_phase)))
+        return
+
+    print(f"fake TrueLayer latency {args.latency_ms:g}ms, error rate {args.error_rate:g}")
+    print(
+        f"{'scenario':<12} {'run':<7} {'rows':>8} {'wall s':>7} {'rows/s':>8} {'calls':>6} "
+        f"{'HTTP s':>7} {'DB s':>7} {'peak MB':>8} {'failed':>6}"
+    )
+    for scenario in args.scenarios:
+        users, accounts, txns = (int(x) for x in scenario.lower().split("x"))
+        port = _free_port()
+        server = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_truelayer", "--port", str(port),
+            "--accounts", str(accounts), "--txns", str(txns),
+            "--latency-ms", str(args.latency_ms), "--error-rate", str(args.error_rate),
+        ], stdout=subprocess.DEVNULL)
+        try:
+            with tempfile.TemporaryDirectory(prefix="bench_sync_") as tmpdir:
+                url = f"http://127.0.0.1:{port}"
+                env = dict(
+                    os.environ,
+                    DATABASE_URL=os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{tmpdir}/bench.db"),
+                    TRUELAYER_AUTH_URL=url,
+                    TRUELAYER_API_URL=url,
+                    TRUELAYER_RATE_LIMIT=str(args.rate_limit),
+                    DISABLE_SCHEDULER="1",
+                    # Forecast warm-up after sync is not part of the sync path
+                    FORECAST_WARM_DAYS="[]",
+                )
+                env.setdefault("TRUELAYER_CLIENT_ID", "bench")
+                env.setdefault("TRUELAYER_CLIENT_SECRET", "bench")
+                env.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
+                for _ in range(100):
+                    try:
+                        socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                        break
+                    except OSError:
+                        time.sleep(0.05)
+
+                tag = f"{scenario.lower()}-{uuid.uuid4().hex[:8]}"
+                child = [sys.executable, "-m", "benchmarks.bench_sync", "--tag", tag]
+                subprocess.run(child + ["--seed-users", str(users)], env=env, capture_output=True, check=True)
+                results = {}
+                for label in ("first", "resync"):
+                    out = subprocess.run(
+                        child + ["--run-phase", label], env=env, capture_output=True, text=True, check=True,
+                    )
+                    results[label] = json.loads(out.stdout.strip().splitlines()[-1])
+        finally:
+            server.terminate()
+            server.wait()
+
+        for label, r in results.items():
+            print(
+                f"{scenario:<12} {label:<7} {r['rows']:>8} {r['wall_s']:>7.2f} {r['rows_per_s']:>8.0f} "
+                f"{r['http_calls']:>6} {r['http_s']:>7.2f} {r['db_s']:>7.2f} {r['peak_mb']:>8.1f} {r['failed']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Local stand-in for the TrueLayer auth and Data APIs, for load-testing sync.
+
+    python -m benchmarks.fake_truelayer [--port 9400] [--accounts 3] [--txns 500]
+                                        [--latency-ms 40] [--error-rate 0.01] [--today 2026-01-31]
+
+Serves /connect/token, /data/v1/me, /data/v1/accounts,
+/data/v1/accounts/{id}/balance and /data/v1/accounts/{id}/transactions over
+keep-alive HTTP/1.1. Point the API at it with
+TRUELAYER_AUTH_URL=TRUELAYER_API_URL=http://127.0.0.1:9400.
+
+Data is synthetic and deterministic. The refresh token names the user: "fake-<user>"
+is exchanged for access token "access-<user>". Each user has `--accounts`
+accounts with `--txns` transactions spread over the 90 days before `--today`;
+an account's transactions depend only on its id and are filtered to the
+requested from/to window. Any authorization code is accepted and becomes user
+"code-<code>".
+
+Each response is delayed by `--latency-ms` (±50% jitter). `--error-rate` of them
+fail, half as 503 and half as 429 with `Retry-After: 0`. Both are drawn from a
+seeded RNG.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MERCHANTS = [
+    ("Tesco", "TESCO STORES"), ("Costa Coffee", "COSTA COFFEE"), ("Shell", "SHELL PETROL"),
+    ("Netflix", "NETFLIX.COM"), ("Amazon", "AMZN MKTP UK"), ("TfL", "TFL TRAVEL CHARGE"),
+    (None, "TRANSFER TO SAVINGS"), ("Pret A Manger", "PRET A MANGER"), (None, "DD COUNCIL TAX"),
+]
+HISTORY_DAYS = 90
+
+
+class FakeTrueLayer:
+    """The data model behind the server: deterministic accounts and transactions per user."""
+
+    def __init__(self, accounts=3, txns=500, today=None):
+        self.accounts = accounts
+        self.txns = txns
+        self.today = today or date.today()
+
+    def token(self, form: dict) -> dict:
+        if form.get("grant_type") == "authorization_code":
+            user = f"code-{form.get('code', '')}"
+        else:
+            user = form.get("refresh_token", "").removeprefix("fake-")
+        return {
+            "access_token": f"access-{user}",
+            "refresh_token": f"fake-{user}",
+            "expires_in": 3600,
+            "token_type": "Bearer",
+        }
+
+    def user(self, access_token: str) -> str:
+        return access_token.removeprefix("access-")
+
+    def list_accounts(self, user: str) -> list[dict]:
+        return [
+            {
+                "account_id": f"{user}-acc{i}",
+                "display_name": f"Account {i}",
+                "account_type": "TRANSACTION",
+                "currency": "GBP",
+                "account_number": {"swift_bic": "FAKEGB00"},
+                "provider": {"provider_id": "fake-bank"},
+            }
+            for i in range(self.accounts)
+        ]
+
+    def owns(self, user: str, account_id: str) -> bool:
+        prefix, _, index = account_id.rpartition("-acc")
+        return prefix == user and index.isdigit() and int(index) < self.accounts
+
+    def balance(self, account_id: str) -> list[dict]:
+        rng = random.Random(zlib.crc32(account_id.encode()))
+        current = round(rng.uniform(100, 5000), 2)
+        return [{
+            "currency": "GBP",
+            "current": current,
+            "available": round(current - rng.uniform(0, 100), 2),
+            "update_timestamp": f"{self.today.isoformat()}T06:00:00Z",
+        }]
+
+    def transactions(self, account_id: str, from_date: date, to_date: date) -> list[dict]:
+        rng = random.Random(zlib.crc32(account_id.encode()))
+        start = datetime.combine(self.today, datetime.min.time()) - timedelta(days=HISTORY_DAYS)
+        spacing = HISTORY_DAYS * 24 * 60 / max(self.txns, 1)
+        results = []
+        for i in range(self.txns):
+            # Draw for every row so a row's values don't depend on the window
+            merchant, description = MERCHANTS[rng.randrange(len(MERCHANTS))]
+            amount = round(rng.uniform(-120, -1), 2) if rng.random() < 0.9 else round(rng.uniform(50, 2500), 2)
+            booked_at = start + timedelta(minutes=int(i * spacing) + rng.randrange(60))
+            if not from_date <= booked_at.date() <= to_date:
+                continue
+            txn = {
+                "transaction_id": f"{account_id}-t{i}",
+                "timestamp": booked_at.isoformat() + "Z",
+                "description": description,
+                "amount": amount,
+                "currency": "GBP",
+                "transaction_type": "DEBIT" if amount < 0 else "CREDIT",
+                "transaction_category": "PURCHASE",
+                "transaction_classification": [],
+                "meta": {"provider_transaction_category": "DEB"},
+            }
+            if merchant:
+                txn["merchant_name"] = merchant
+            results.append(txn)
+        return results
+
+
+def make_server(port=0, accounts=3, txns=500, latency_ms=40.0, error_rate=0.0, seed=1, today=None):
+    """A ThreadingHTTPServer on 127.0.0.1:`port` (0 picks one); call serve_forever() to run it."""
+    fake = FakeTrueLayer(accounts=accounts, txns=txns, today=today)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, headers=None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _delay_or_fail(self) -> bool:
+            with rng_lock:
+                delay = latency_ms / 1000 * rng.uniform(0.5, 1.5)
+                fail = rng.random() < error_rate
+                throttle = rng.random() < 0.5
+            time.sleep(delay)
+            if fail:
+                if throttle:
+                    self._send(429, {"error": "rate_limited"}, {"Retry-After": "0"})
+                else:
+                    self._send(503, {"error": "unavailable"})
+            return fail
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+            if self._delay_or_fail():
+                return
+            if urlparse(self.path).path != "/connect/token":
+                return self._send(404, {"error": "not_found"})
+            self._send(200, fake.token(form))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if self._delay_or_fail():
+                return
+            auth = self.headers.get("Authorization", "")
+            if not auth.startswith("Bearer access-"):
+                return self._send(401, {"error": "invalid_token"})
+            user = fake.user(auth.removeprefix("Bearer "))
+            parts = url.path.strip("/").split("/")
+
+            if parts == ["data", "v1", "me"]:
+                return self._send(200, {"results": [{"provider": {"provider_id": "fake-bank", "display_name": "Fake Bank"}}]})
+            if parts == ["data", "v1", "accounts"]:
+                return self._send(200, {"results": fake.list_accounts(user)})
+            if len(parts) == 5 and parts[:3] == ["data", "v1", "accounts"] and fake.owns(user, parts[3]):
+                if parts[4] == "balance":
+                    return self._send(200, {"results": fake.balance(parts[3])})
+                if parts[4] == "transactions":
+                    query = parse_qs(url.query)
+                    from_date = date.fromisoformat(query.get("from", ["1970-01-01"])[0])
+                    to_date = date.fromisoformat(query.get("to", [fake.today.isoformat()])[0])
+                    return self._send(200, {"results": fake.transactions(parts[3], from_date, to_date)})
+            self._send(404, {"error": "not_found"})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9400)
+    parser.add_argument("--accounts", type=int, default=3, help="Accounts per user")
+    parser.add_argument("--txns", type=int, default=500, help="Transactions per account over 90 days")
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="Last day of history (default: today)")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.accounts, args.txns, args.latency_ms, args.error_rate, args.seed, args.today)
+    print(f"Fake TrueLayer on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
-from app.models.tables import Account, Connection
+from app.models.tables import Account, Connection, Transaction, Balance
+from app.services import forecast_cache, recurring, rollups
 
 db = SessionLocal()
 try:
@@ -14,11 +15,24 @@ try:
     orphans = db.query(Account).filter(Account.connection_id.notin_(valid_conn_ids)).all()
     print(f"Found {len(orphans)} orphaned accounts.")
     
-    # Delete them
+    # Delete them (and their transactions/balances, which carry a stale user_id)
     if orphans:
+        orphan_ids = [a.account_id for a in orphans]
+        # Users whose rollups, recurring series and forecasts still count these rows
+        user_ids = sorted({
+            user_id for model in (Transaction, Balance)
+            for (user_id,) in db.query(model.user_id).filter(model.account_id.in_(orphan_ids)).distinct()
+            if user_id is not None
+        })
+        db.query(Transaction).filter(Transaction.account_id.in_(orphan_ids)).delete(synchronize_session=False)
+        db.query(Balance).filter(Balance.account_id.in_(orphan_ids)).delete(synchronize_session=False)
         db.query(Account).filter(Account.connection_id.notin_(valid_conn_ids)).delete(synchronize_session=False)
+        for user_id in user_ids:
+            rollups.rebuild_monthly_totals(db, user_id=user_id)
+            recurring.rebuild_series(db, user_id=user_id)
+            forecast_cache.bump_data_version(db, user_id)
         db.commit()
-        print("Deleted orphans.")
+        print(f"Deleted orphans; rebuilt derived data for users {user_ids}.")
         
     # Check remaining count
     count = db.query(Account).count()
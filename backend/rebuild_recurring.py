@@ -0,0 +1,18 @@
+import argparse
+
+from app.database import SessionLocal
+from app.services.recurring import rebuild_series
+
+parser = argparse.ArgumentParser(description="Rebuild recurring_series from transactions.")
+parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's series (default: everyone)")
+args = parser.parse_args()
+
+db = SessionLocal()
+try:
+    scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"Rebuilding recurring series for {scope}...")
+    written = rebuild_series(db, user_id=args.user_id)
+    db.commit()
+    print(f"Done. {written} recurring series.")
+finally:
+    db.close()
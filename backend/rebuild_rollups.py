@@ -0,0 +1,18 @@
+import argparse
+
+from app.database import SessionLocal
+from app.services.rollups import rebuild_monthly_totals
+
+parser = argparse.ArgumentParser(description="Rebuild monthly_category_totals from transactions.")
+parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's rollup (default: everyone)")
+args = parser.parse_args()
+
+db = SessionLocal()
+try:
+    scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"Rebuilding monthly category totals for {scope}...")
+    buckets = rebuild_monthly_totals(db, user_id=args.user_id)
+    db.commit()
+    print(f"Done. {buckets} month/category buckets.")
+finally:
+    db.close()
@@ -0,0 +1,18 @@
+import argparse
+
+from app.services.recategorise import recategorise_all, DEFAULT_CHUNK_SIZE
+
+parser = argparse.ArgumentParser(description="Re-apply category rules to stored transactions.")
+parser.add_argument("--user-id", type=int, default=None, help="Only this user's transactions (default: everyone)")
+parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint and start from the beginning")
+args = parser.parse_args()
+
+
+def report(status):
+    print(f"  processed={status['processed']} changed={status['changed']} cursor={status['cursor']}")
+
+
+print("Recategorising transactions...")
+result = recategorise_all(user_id=args.user_id, chunk_size=args.chunk_size, restart=args.restart, progress=report)
+print(f"Done. {result['processed']} processed, {result['changed']} changed.")
@@ -0,0 +1,48 @@
+import argparse
+import logging
+import signal
+import threading
+
+from app.config import settings
+from app.database import SessionLocal
+from app.migrations import run_migrations
+from app.services import sync_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run queued sync jobs (SYNC_QUEUE mode). Start as many workers, on as many hosts, as needed."
+    )
+    parser.add_argument("--worker-id", default=None, help="Lease owner name (default: host:pid)")
+    parser.add_argument("--batch", type=int, default=None,
+                        help=f"Connections claimed per sync run (default: SYNC_MAX_WORKERS, {settings.SYNC_MAX_WORKERS})")
+    parser.add_argument("--poll", type=float, default=None,
+                        help=f"Seconds between polls when idle (default: {settings.SYNC_WORKER_POLL_SECONDS})")
+    parser.add_argument("--enqueue", action="store_true", help="Queue every due connection before starting")
+    parser.add_argument("--once", action="store_true", help="Exit once nothing is due instead of polling")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    run_migrations()
+
+    if args.enqueue:
+        db = SessionLocal()
+        try:
+            print(f"Queued {sync_queue.enqueue_due(db)} connections")
+            db.commit()
+        finally:
+            db.close()
+
+    # Finish the current batch on SIGTERM/SIGINT, then exit (a killed worker's leases lapse and are reclaimed)
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    stats = sync_queue.run_worker(
+        worker_id=args.worker_id, batch=args.batch, poll_seconds=args.poll, stop=stop, once=args.once,
+    )
+    print(f"Jobs: {stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
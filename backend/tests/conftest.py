@@ -6,3 +6,10 @@ os.environ.setdefault("TRUELAYER_CLIENT_SECRET", "test-client-secret")
 os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OUFCQ0RFRjAxMjM0NTY3ODlBQkNERUY=")
 os.environ.setdefault("JWT_SECRET", "test-jwt-secret")
 os.environ.setdefault("DISABLE_SCHEDULER", "1")
+
+# Start every run from an empty SQLite file so row counts in tests are deterministic
+if os.environ["DATABASE_URL"] == "sqlite:///./test.db":
+    # Including WAL files, which a fresh database file would otherwise replay
+    for path in ("test.db", "test.db-wal", "test.db-shm"):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,76 @@
+import inspect
+import uuid
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import async_database_url
+from app.routers import data_async, users, users_async
+
+from tests.test_data_api import client, seed_user_with_history
+from tests.test_transactions_api import _add_same_day
+
+
+def _async_app():
+    async_app = FastAPI()
+    async_app.include_router(users_async.router)
+    async_app.include_router(data_async.router)
+    return async_app
+
+
+def test_sync_get_current_user_does_not_block_the_event_loop():
+    # An `async def` dependency runs on the loop itself; a plain def goes to the threadpool
+    assert not inspect.iscoroutinefunction(users.get_current_user)
+    assert inspect.iscoroutinefunction(users_async.get_current_user)
+
+
+def test_async_database_url_swaps_drivers():
+    assert str(async_database_url("sqlite:///./test.db")) == "sqlite+aiosqlite:///./test.db"
+    assert async_database_url("postgresql://u:p@db:5432/bank").drivername == "postgresql+asyncpg"
+    assert async_database_url("postgresql+psycopg2://u:p@db/bank").drivername == "postgresql+asyncpg"
+    url = async_database_url("postgres://u:p@host/bank?sslmode=require")
+    assert url.drivername == "postgresql+asyncpg"
+    assert dict(url.query) == {"ssl": "require"}
+
+
+def test_async_routes_answer_like_the_sync_ones():
+    user_id, headers, account_id, _ = seed_user_with_history(3)
+    _add_same_day(user_id, account_id, 3)
+
+    with TestClient(_async_app()) as async_client:
+        for path in (
+            "/auth/me",
+            "/api/balances",
+            "/api/connections",
+            "/api/summary/monthly",
+            "/api/transactions?start_date=2026-01-02",
+            "/api/forecast?engine=fast",
+        ):
+            expected = client.get(path, headers=headers)
+            got = async_client.get(path, headers=headers)
+            assert got.status_code == expected.status_code == 200, path
+            if path != "/api/balances":  # updated_at falls back to now() for never-synced accounts
+                assert got.json() == expected.json(), path
+
+        # Keyset pages and NDJSON streaming
+        page = async_client.get("/api/transactions?limit=4", headers=headers)
+        assert page.headers["X-Next-Cursor"] == client.get("/api/transactions?limit=4", headers=headers).headers["X-Next-Cursor"]
+        rest = async_client.get(f"/api/transactions?format=ndjson&cursor={page.headers['X-Next-Cursor']}", headers=headers)
+        assert rest.headers["content-type"].startswith("application/x-ndjson")
+        ids = [t["txn_id"] for t in page.json()] + [json.loads(line)["txn_id"] for line in rest.text.splitlines()]
+        assert ids == [t["txn_id"] for t in client.get("/api/transactions", headers=headers).json()]
+
+        assert async_client.get("/api/transactions", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_async_register_and_login():
+    with TestClient(_async_app()) as async_client:
+        email = f"async-{uuid.uuid4()}@example.com"
+        assert async_client.post("/auth/register", json={"email": email, "password": "pw123456"}).status_code == 200
+        assert async_client.post("/auth/register", json={"email": email, "password": "pw123456"}).status_code == 400
+        token = async_client.post("/auth/token", data={"username": email, "password": "pw123456"}).json()["access_token"]
+        me = async_client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert me.json()["email"] == email
+        assert async_client.post("/auth/token", data={"username": email, "password": "wrong"}).status_code == 401
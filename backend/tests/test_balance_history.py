@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import app.main  # noqa: F401  (runs the migrations)
+from app.database import SessionLocal
+from app.models.tables import Account, Balance
+from app.services.balance_history import record_balance, compact_balances
+
+
+def _account(db):
+    account = Account(account_id=f"acc-{uuid.uuid4()}", name="Current", type="TRANSACTION", currency="GBP")
+    db.add(account)
+    db.flush()
+    return account
+
+
+def test_record_balance_upserts_latest_and_skips_unchanged_snapshots():
+    db = SessionLocal()
+    try:
+        account = _account(db)
+        t0 = datetime(2026, 3, 1, 9, tzinfo=timezone.utc)
+        record_balance(db, account, None, {"current": 10.0, "available": 8.0}, t0)
+        record_balance(db, account, None, {"current": 10.0, "available": 8.0}, t0)  # same provider timestamp
+        record_balance(db, account, None, {"current": 12.0, "available": 9.0}, t0 + timedelta(hours=1))
+        record_balance(db, account, None, {"current": 1.0, "available": 1.0}, t0 - timedelta(hours=1))  # stale
+        db.commit()
+
+        assert db.query(Balance).filter(Balance.account_id == account.account_id).count() == 2
+        db.refresh(account)
+        assert (account.balance_current, account.balance_available) == (12.0, 9.0)
+        assert account.balance_as_of == datetime(2026, 3, 1, 10)
+    finally:
+        db.close()
+
+
+def test_compaction_keeps_last_snapshot_per_day_beyond_raw_window():
+    db = SessionLocal()
+    try:
+        account = _account(db)
+        now = datetime(2026, 3, 20, 12)
+        for day in (1, 2, 19):
+            for hour in range(0, 24, 6):
+                db.add(Balance(account_id=account.account_id, as_of=datetime(2026, 3, day, hour), current=float(hour)))
+        db.commit()
+
+        deleted = compact_balances(db, raw_days=7, now=now)
+        db.commit()
+
+        assert deleted >= 6  # the table is shared with other tests
+        rows = db.query(Balance).filter(Balance.account_id == account.account_id).order_by(Balance.as_of).all()
+        old = [(b.as_of, b.current) for b in rows if b.as_of < now - timedelta(days=7)]
+        assert old == [(datetime(2026, 3, 1, 18), 18.0), (datetime(2026, 3, 2, 18), 18.0)]
+        assert len(rows) == 2 + 4
+    finally:
+        db.close()
@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timedelta
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import User, Transaction, Forecast
+from app.services import batch_forecast, forecast_cache, forecasting
+
+
+def _seed_user(db, days=60):
+    user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    for i in range(days):
+        db.add(Transaction(
+            txn_id=f"{user.id}-{uuid.uuid4()}", user_id=user.id, booked_at=datetime(2025, 1, 1) + timedelta(days=i),
+            amount=-10.0 - (i % 7), currency="GBP", description="SHOP", category="Shopping", raw_json={},
+        ))
+    db.commit()
+    return user.id
+
+
+def test_batch_writes_forecasts_that_the_api_path_serves(monkeypatch):
+    db = SessionLocal()
+    try:
+        users = [_seed_user(db) for _ in range(3)]
+    finally:
+        db.close()
+
+    stats = batch_forecast.run_batch(user_ids=users, horizons=[7, 30], workers=2)
+    assert (stats.users_total, stats.users_ok, stats.workers) == (3, 3, 2)
+    assert set(stats.fit_seconds) == set(users)
+    assert stats.as_dict()["wall_seconds"] > 0
+
+    db = SessionLocal()
+    try:
+        stored = db.query(Forecast).filter(Forecast.user_id.in_(users)).all()
+        assert sorted((f.user_id, f.days) for f in stored) == sorted((u, d) for u in users for d in (7, 30))
+        assert len(stored[0].payload["net_forecast"]) in (7, 30)
+
+        # Everything is current, so a second run has nothing to do
+        assert batch_forecast.stale_users(db, [7, 30], users) == []
+
+        # The API path serves the stored row without fitting
+        monkeypatch.setattr(forecasting, "generate_forecast", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+        forecast_cache.cache.clear()
+        served = forecast_cache.get_forecast(db, users[0], 30)
+        assert served == next(f.payload for f in stored if f.user_id == users[0] and f.days == 30)
+
+        # New data makes the stored forecast stale
+        forecast_cache.bump_data_version(db, users[0])
+        db.commit()
+        assert batch_forecast.stale_users(db, [7, 30], users) == [users[0]]
+        assert batch_forecast.load_stored(db, users[0], 30, forecast_cache.get_data_version(db, users[0])) is None
+    finally:
+        db.close()
+
+
+def test_overlapping_runs_upsert_and_keep_the_newest_fit():
+    db = SessionLocal()
+    try:
+        user_id = _seed_user(db, days=1)
+
+        def result(version, payload):
+            return batch_forecast.UserForecastResult(user_id=user_id, data_version=version, payloads={30: payload})
+
+        batch_forecast.store_results(db, [result(2, {"run": "a"})])
+        db.commit()
+        # A second run stores the same user: no primary key collision
+        batch_forecast.store_results(db, [result(2, {"run": "b"})])
+        db.commit()
+        # A run that read older data finishes last and must not overwrite the newer fit
+        batch_forecast.store_results(db, [result(1, {"run": "stale"})])
+        db.commit()
+
+        stored = db.query(Forecast).filter(Forecast.user_id == user_id).one()
+        db.refresh(stored)
+        assert (stored.data_version, stored.payload) == (2, {"run": "b"})
+    finally:
+        db.close()
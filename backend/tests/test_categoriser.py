@@ -0,0 +1,62 @@
+import random
+
+import app.main  # noqa: F401  (creates the tables)
+from app.database import SessionLocal
+from app.models.tables import CategoryRule
+from app.services import categoriser as categoriser_service
+from app.services.categoriser import Categoriser, DEFAULT_RULES
+
+
+def naive(rules, text):
+    for keyword, category in rules:
+        if keyword in text:
+            return category
+    return None
+
+
+def test_matches_first_rule_in_priority_order():
+    rules = [(k, c) for c, ks in DEFAULT_RULES.items() for k in ks]
+    categoriser = Categoriser(rules)
+    rng = random.Random(3)
+    pieces = [k for k, _ in rules] + ["card", "payment", " ", "x", "ref", "co", "s", "tes"]
+    for _ in range(5000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 6)))
+        assert categoriser.match(text) == naive(rules, text), text
+
+
+def test_overlapping_keywords_respect_priority():
+    # "bus" starts inside "uber" would be missed by a non-overlapping scan
+    categoriser = Categoriser([("busy", "A"), ("uber", "B"), ("ub", "C")])
+    assert categoriser.match("uberbusy") == "A"
+    assert categoriser.match("uber") == "B"
+    # A keyword containing a higher-priority keyword takes that keyword's category
+    categoriser = Categoriser([("tea", "Drinks"), ("steak", "Food")])
+    assert categoriser.match("steak") == "Drinks"
+
+
+def test_categorise_falls_back_to_provider_classification():
+    categoriser = Categoriser.from_rule_rows([])
+    assert categoriser.categorise("TESCO STORES", None) == "Groceries"
+    assert categoriser.categorise("Unknown shop", None, ["Shopping", "General"]) == "Shopping"
+    assert categoriser.categorise(None, None) == "Uncategorised"
+
+
+def test_custom_rules_take_precedence_and_reload_on_change():
+    db = SessionLocal()
+    try:
+        before = categoriser_service.get_categoriser(db)
+        assert before is categoriser_service.get_categoriser(db)
+        assert before.categorise("TESCO EXPRESS", None) == "Groceries"
+
+        rule = CategoryRule(pattern="tesco express", category="Convenience")
+        db.add(rule)
+        db.commit()
+        after = categoriser_service.get_categoriser(db)
+        assert after is not before
+        assert after.categorise("TESCO EXPRESS", None) == "Convenience"
+
+        db.delete(rule)
+        db.commit()
+        assert categoriser_service.get_categoriser(db).categorise("TESCO EXPRESS", None) == "Groceries"
+    finally:
+        db.close()
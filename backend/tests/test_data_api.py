@@ -0,0 +1,86 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.auth_utils import create_access_token
+from app.database import SessionLocal
+from app.models.tables import User, Connection, Account, Transaction, Balance
+
+client = TestClient(app)
+
+
+def seed_user_with_history(n_txns=3):
+    """Creates a user with one connection, one account and `n_txns` transactions; returns (user_id, headers, account_id)."""
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        conn = Connection(user_id=user.id, provider="mock", status="active")
+        db.add(conn)
+        db.commit()
+        account_id = f"acc-{uuid.uuid4()}"
+        db.add(Account(
+            account_id=account_id, connection_id=conn.id, name="Current", type="TRANSACTION", currency="GBP",
+            balance_current=100.0, balance_available=90.0, balance_as_of=datetime(2026, 1, 5),
+        ))
+        db.flush()
+        for i in range(n_txns):
+            db.add(Transaction(
+                txn_id=f"{account_id}-{i}", account_id=account_id, user_id=user.id,
+                booked_at=datetime(2026, 1, 1 + i), amount=-10.0, currency="GBP",
+                description="TESCO", category="Groceries", raw_json={},
+            ))
+        db.add(Balance(account_id=account_id, user_id=user.id, as_of=datetime(2026, 1, 5), current=100.0, available=90.0, raw_json={}))
+        db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+        return user.id, headers, account_id, conn.id
+    finally:
+        db.close()
+
+
+def test_transactions_are_scoped_by_denormalised_user_id():
+    _, headers, account_id, _ = seed_user_with_history(3)
+    seed_user_with_history(2)  # someone else's data
+
+    resp = client.get("/api/transactions", headers=headers)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body) == 3
+    assert {t["account_id"] for t in body} == {account_id}
+    assert body[0]["account_name"] == "Current"
+    assert body[0]["provider_id"] == "mock"
+
+
+def test_balances_come_from_the_account_row():
+    _, headers, account_id, _ = seed_user_with_history(1)
+
+    resp = client.get("/api/balances", headers=headers)
+    assert resp.status_code == 200
+    assert resp.json() == [{
+        "account_id": account_id,
+        "account_name": "Current",
+        "provider_id": "mock",
+        "currency": "GBP",
+        "current": 100.0,
+        "available": 90.0,
+        "updated_at": "2026-01-05T00:00:00",
+    }]
+
+
+def test_delete_connection_removes_denormalised_rows():
+    user_id, headers, account_id, conn_id = seed_user_with_history(3)
+
+    resp = client.delete(f"/api/connections/{conn_id}", headers=headers)
+    assert resp.status_code == 200
+
+    db = SessionLocal()
+    try:
+        assert db.query(Transaction).filter(Transaction.user_id == user_id).count() == 0
+        assert db.query(Balance).filter(Balance.user_id == user_id).count() == 0
+        assert db.get(Account, account_id) is None
+    finally:
+        db.close()
+    assert client.get("/api/transactions", headers=headers).json() == []
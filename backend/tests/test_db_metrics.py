@@ -0,0 +1,71 @@
+import logging
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+import app.main  # noqa: F401  (runs migrations)
+from app import metrics
+from app.config import settings
+from app.database import configure_engine, engine, engine_options
+
+from tests.test_data_api import client, seed_user_with_history
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_engine_options_follow_the_backend():
+    assert engine_options("sqlite://") == {}
+    assert engine_options("sqlite:///:memory:") == {}
+
+    sqlite_file = engine_options("sqlite:///./x.db")
+    assert sqlite_file["pool_size"] == settings.DB_POOL_SIZE
+    assert sqlite_file["max_overflow"] == settings.DB_MAX_OVERFLOW
+    assert "pool_pre_ping" not in sqlite_file and "pool_recycle" not in sqlite_file
+
+    postgres = engine_options("postgresql://u:p@db/bank")
+    assert postgres["poolclass"] is metrics.InstrumentedQueuePool
+    assert postgres["pool_recycle"] == settings.DB_POOL_RECYCLE
+    assert postgres["pool_pre_ping"] is settings.DB_POOL_PRE_PING
+
+
+def test_sqlite_connections_use_wal_and_a_busy_timeout():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_requests_record_statement_and_checkout_metrics():
+    _, headers, _, _ = seed_user_with_history(2)
+    selects = _sample("vault_db_statement_seconds_count", engine="sync", operation="SELECT")
+    checkouts = _sample("vault_db_pool_checkout_seconds_count", engine="sync")
+
+    assert client.get("/api/transactions", headers=headers).status_code == 200
+
+    assert _sample("vault_db_statement_seconds_count", engine="sync", operation="SELECT") >= selects + 3
+    assert _sample("vault_db_pool_checkout_seconds_count", engine="sync") > checkouts
+    body = client.get("/metrics").text
+    assert 'vault_db_pool_connections{engine="sync",state="checked_out"}' in body
+    assert "# TYPE vault_db_statement_seconds histogram" in body
+
+
+def test_slow_statements_are_logged_and_counted(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 1)
+    slow_engine = configure_engine(create_engine("sqlite://"), "test-slow")
+    query = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 300000) SELECT count(*) FROM n"
+    with caplog.at_level(logging.WARNING, logger="app.metrics"), slow_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert conn.execute(text(query)).scalar() == 300000
+
+    assert _sample("vault_db_slow_statements_total", engine="test-slow", operation="WITH") == 1
+    assert _sample("vault_db_statement_seconds_count", engine="test-slow", operation="SELECT") == 1
+    assert any("Slow query" in r.getMessage() and "WITH RECURSIVE" in r.getMessage() for r in caplog.records)
+
+
+def test_metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    resp = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timedelta
+
+import app.main  # noqa: F401  (runs the migrations)
+from app.database import SessionLocal
+from app.models.tables import User, Transaction
+from app.services import forecast_cache, forecasting
+from app.services.forecast_cache import DiskBackend, ForecastCache, MemoryBackend
+
+
+def test_memory_backend_is_a_bounded_lru():
+    lru = MemoryBackend(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+
+
+def test_disk_backend_keeps_one_version_per_user_and_horizon(tmp_path):
+    disk = DiskBackend(str(tmp_path))
+    disk.set((1, 30, "fast", 1), {"net_forecast": []})
+    disk.set((1, 30, "fast", 2), {"net_forecast": [{"ds": "2026-01-01", "val": 1.5}]})
+    disk.set((1, 30, "statsmodels", 1), {})
+    disk.set((1, 90, "fast", 2), {})
+    assert disk.get((1, 30, "fast", 1)) is None
+    assert disk.get((1, 30, "fast", 2)) == {"net_forecast": [{"ds": "2026-01-01", "val": 1.5}]}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["1_30_fast_2.json", "1_30_statsmodels_1.json", "1_90_fast_2.json"]
+
+    # A fresh process finds the disk entry and promotes it to memory
+    cache = ForecastCache(MemoryBackend(4), disk)
+    assert cache.get((1, 90, "fast", 2)) == {}
+    assert cache.memory.get((1, 90, "fast", 2)) == {}
+
+
+def test_forecast_is_cached_until_data_version_changes(monkeypatch):
+    calls = []
+    real = forecasting.generate_forecast
+
+    def counting(db, days_ahead=30, user_id=None, engine=forecasting.DEFAULT_ENGINE):
+        calls.append((user_id, days_ahead))
+        return real(db, days_ahead=days_ahead, user_id=user_id, engine=engine)
+
+    monkeypatch.setattr(forecasting, "generate_forecast", counting)
+
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        for i in range(20):
+            db.add(Transaction(
+                txn_id=f"{user.id}-{uuid.uuid4()}", user_id=user.id, booked_at=datetime(2026, 1, 1) + timedelta(days=i),
+                amount=-5.0 - i % 3, currency="GBP", description=f"SHOP {i % 4}", category="Shopping", raw_json={},
+            ))
+        db.commit()
+
+        first = forecast_cache.get_forecast(db, user.id, 30)
+        assert forecast_cache.get_forecast(db, user.id, 30) is first
+        assert len(calls) == 1
+        assert len(first["net_forecast"]) > 0
+
+        forecast_cache.bump_data_version(db, user.id)
+        db.commit()
+        forecast_cache.get_forecast(db, user.id, 30)
+        assert len(calls) == 2
+
+        # warm_up fills the cache for the configured horizons
+        forecast_cache.warm_up([user.id], horizons=[7])
+        forecast_cache.get_forecast(db, user.id, 7)
+        assert calls.count((user.id, 7)) == 1
+
+        # Each engine is cached separately
+        fast = forecast_cache.get_forecast(db, user.id, 30, engine="fast")
+        assert fast is not forecast_cache.get_forecast(db, user.id, 30)
+        assert forecast_cache.get_forecast(db, user.id, 30, engine="fast") is fast
+        assert len(calls) == 4
+    finally:
+        db.close()
@@ -0,0 +1,92 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import User, Transaction
+from app.services import forecasting
+
+PERIODS = {"weekly": 7, "monthly": 30, "yearly": 365}
+
+
+def reference_calendar(bills, last_date, days_ahead):
+    """Day-by-day loop: every occurrence of every live bill, counted on its first forecast day."""
+    totals = np.zeros(days_ahead)
+    for b in bills.itertuples():
+        period = timedelta(days=PERIODS.get(b.frequency, 0))
+        if period and b.ds < last_date - period:
+            continue
+        when = b.ds
+        while period and when <= last_date:
+            when += period
+        while when <= last_date + timedelta(days=days_ahead):
+            if when > last_date:
+                for i in range(1, days_ahead + 1):
+                    if last_date + timedelta(days=i) >= when:
+                        totals[i - 1] += b.amount
+                        break
+            if not period:
+                break
+            when += period
+    return totals
+
+
+@pytest.mark.parametrize("days_ahead", [1, 30, 400])
+def test_bill_calendar_matches_day_by_day_loop(days_ahead):
+    rng = random.Random(days_ahead)
+    last_date = pd.Timestamp("2026-03-10 14:30")
+    bills = pd.DataFrame([
+        {
+            "ds": last_date + timedelta(days=rng.randint(-60, 40), hours=rng.randint(0, 23)),
+            "amount": -round(rng.uniform(1, 500), 2),
+            "name": f"bill {i}",
+            "frequency": rng.choice(["weekly", "monthly", "yearly"]),
+        }
+        for i in range(40)
+    ])
+    np.testing.assert_allclose(
+        forecasting.bill_calendar(bills, last_date, days_ahead),
+        reference_calendar(bills, last_date, days_ahead),
+    )
+
+
+def test_weekly_bill_repeats_and_overdue_bill_is_dropped():
+    last_date = pd.Timestamp("2026-01-01")
+    bills = pd.DataFrame({
+        "ds": [last_date + timedelta(days=3), last_date - timedelta(days=45)],
+        "amount": [-10.0, -99.0],
+        "name": ["gym", "cancelled"],
+        "frequency": ["weekly", "monthly"],
+    })
+    calendar = forecasting.bill_calendar(bills, last_date, 28)
+    assert calendar.sum() == -40.0
+    assert list(np.flatnonzero(calendar) + 1) == [3, 10, 17, 24]
+    assert forecasting.bill_calendar(pd.DataFrame(), last_date, 5).tolist() == [0.0] * 5
+
+
+def test_forecast_covers_every_requested_day():
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        for i in range(90):
+            db.add(Transaction(
+                txn_id=f"{user.id}-{uuid.uuid4()}", user_id=user.id, booked_at=datetime(2026, 1, 1) + timedelta(days=i),
+                amount=-5.0 - i % 4, currency="GBP", description=f"SHOP {i % 3}", category="Shopping", raw_json={},
+            ))
+        db.commit()
+
+        for days in (30, 365):
+            curve = forecasting.generate_forecast(db, days_ahead=days, user_id=user.id, engine="fast")["net_forecast"]
+            assert len(curve) == days
+            assert curve[-1]["ds"] == (datetime(2026, 1, 1) + timedelta(days=89 + days)).isoformat()
+            # The last day carries the variable trend too
+            assert curve[-1]["val"] < curve[-2]["val"]
+    finally:
+        db.close()
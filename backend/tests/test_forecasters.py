@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app.main  # noqa: F401  (runs migrations)
+from app.services import forecasting
+from app.services.forecasting import HoltForecaster, TrendForecaster
+
+from tests.test_data_api import client, seed_user_with_history
+
+
+def _daily(values):
+    return pd.Series(values, index=pd.date_range("2026-01-01", periods=len(values), freq="D"), dtype="float64")
+
+
+@pytest.mark.parametrize("forecaster", [HoltForecaster(), TrendForecaster()])
+def test_fast_engines_continue_a_straight_line(forecaster):
+    history = _daily(-12.5 * np.arange(60) + 100)
+    pred = forecaster.predict(history, 5)
+    np.testing.assert_allclose(pred, -12.5 * np.arange(60, 65) + 100)
+
+
+def test_trend_engine_ignores_a_one_off_payment():
+    values = -10.0 * np.arange(90)
+    values[80:] -= 2000  # e.g. a holiday booked last week
+    pred = TrendForecaster().predict(_daily(values), 10)
+    assert np.allclose(np.diff(pred), -10.0)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        forecasting.get_forecaster("prophet")
+
+    _, headers, _, _ = seed_user_with_history(3)
+    assert client.get("/api/forecast?engine=prophet", headers=headers).status_code == 400
+    resp = client.get("/api/forecast?engine=fast", headers=headers)
+    assert resp.status_code == 200
+
+
+def test_forecast_horizon_is_bounded():
+    _, headers, _, _ = seed_user_with_history(3)
+    for days in (-5, 0, 1826):
+        assert client.get(f"/api/forecast?engine=fast&days={days}", headers=headers).status_code == 422
+    resp = client.get("/api/forecast?engine=fast&days=1", headers=headers)
+    assert resp.status_code == 200
+    assert len(resp.json()["net_forecast"]) == 1
+
+
+def test_statsmodels_is_not_imported_with_the_api():
+    code = "import sys, app.services.forecasting, app.routers.data; print('statsmodels' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
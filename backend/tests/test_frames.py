@@ -0,0 +1,39 @@
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import Transaction
+from app.services import frames
+
+from tests.test_data_api import client, seed_user_with_history
+
+
+def test_loader_projects_and_types_columns():
+    user_id, _, _, _ = seed_user_with_history(3)
+    db = SessionLocal()
+    try:
+        df = frames.load_transactions_frame(db, user_id=user_id, order_by=Transaction.booked_at)
+    finally:
+        db.close()
+
+    assert list(df.columns) == list(frames.TRANSACTION_COLUMNS)
+    assert len(df) == 3
+    assert str(df["booked_at"].dtype).startswith("datetime64")
+    assert df["amount"].dtype == "float64"
+    assert df["category"].dtype == "category"
+    assert df["booked_at"].is_monotonic_increasing
+
+
+def test_loader_returns_empty_frame_with_columns():
+    db = SessionLocal()
+    try:
+        df = frames.load_transactions_frame(db, user_id=-1)
+    finally:
+        db.close()
+    assert df.empty
+    assert list(df.columns) == list(frames.TRANSACTION_COLUMNS)
+
+
+def test_transactions_endpoint_returns_null_for_missing_merchant():
+    _, headers, _, _ = seed_user_with_history(2)
+
+    body = client.get("/api/transactions", headers=headers).json()
+    assert [t["merchant"] for t in body] == [None, None]
@@ -0,0 +1,57 @@
+import uuid
+from datetime import datetime
+
+import app.main  # noqa: F401  (creates the tables)
+from app.database import SessionLocal
+from app.models.tables import Transaction
+from app.services.ingest import ingest_transactions
+
+
+def _row(account_id, txn_id, day):
+    return {
+        "txn_id": txn_id,
+        "account_id": account_id,
+        "booked_at": datetime(2026, 1, day),
+        "amount": -1.0,
+        "currency": "GBP",
+        "description": "COFFEE",
+        "merchant": None,
+        "category": "Eating Out",
+        "raw_json": {},
+    }
+
+
+def test_ingest_counts_inserted_and_skipped():
+    account_id = f"acc-{uuid.uuid4()}"
+    db = SessionLocal()
+    try:
+        first = ingest_transactions(db, account_id, [_row(account_id, f"{account_id}-{i}", i + 1) for i in range(5)])
+        db.commit()
+        assert (first.inserted, first.skipped) == (5, 0)
+
+        # Overlapping window: 3 known rows, 2 new ones, and an in-payload duplicate
+        batch = [_row(account_id, f"{account_id}-{i}", i + 1) for i in range(2, 7)]
+        batch.append(_row(account_id, f"{account_id}-6", 7))
+        second = ingest_transactions(db, account_id, batch)
+        db.commit()
+        assert (second.inserted, second.skipped) == (2, 4)
+        assert sorted(second.inserted_ids) == [f"{account_id}-5", f"{account_id}-6"]
+
+        assert db.query(Transaction).filter(Transaction.account_id == account_id).count() == 7
+        assert db.get(Transaction, f"{account_id}-0").is_pending is False
+    finally:
+        db.close()
+
+
+def test_ingest_ignores_conflicts_outside_the_prefetch_window():
+    account_id = f"acc-{uuid.uuid4()}"
+    db = SessionLocal()
+    try:
+        ingest_transactions(db, account_id, [_row(account_id, f"{account_id}-x", 1)])
+        db.commit()
+        # Same txn_id re-reported with a later date falls outside the prefetched window
+        result = ingest_transactions(db, account_id, [_row(account_id, f"{account_id}-x", 20)])
+        db.commit()
+        assert (result.inserted, result.skipped) == (0, 1)
+    finally:
+        db.close()
@@ -0,0 +1,62 @@
+from prometheus_client import REGISTRY
+
+import app.main  # noqa: F401  (runs migrations)
+from app.services import sync_engine, truelayer
+
+from tests.test_data_api import client, seed_user_with_history
+from tests.test_sync_engine import FakeTrueLayer, _seed_user
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_are_labelled_by_route_template_and_status():
+    _, headers, _, _ = seed_user_with_history(1)
+    route = "/api/connections/{connection_id}"
+    before = _sample("vault_http_requests_total", method="DELETE", route=route, status="404")
+    before_count = _sample("vault_http_request_duration_seconds_count", method="DELETE", route=route)
+    unmatched = _sample("vault_http_requests_total", method="GET", route="<unmatched>", status="404")
+
+    assert client.delete("/api/connections/999999", headers=headers).status_code == 404
+    assert client.delete("/api/connections/999998", headers=headers).status_code == 404
+    assert client.get("/no/such/page").status_code == 404
+
+    assert _sample("vault_http_requests_total", method="DELETE", route=route, status="404") == before + 2
+    assert _sample("vault_http_request_duration_seconds_count", method="DELETE", route=route) == before_count + 2
+    assert _sample("vault_http_requests_total", method="GET", route="<unmatched>", status="404") == unmatched + 1
+
+    body = client.get("/metrics").text
+    assert 'vault_http_request_duration_seconds_bucket{le="0.005",method="DELETE",route="/api/connections/{connection_id}"}' in body
+
+
+def test_sync_runs_record_durations_and_rows(monkeypatch):
+    fake = FakeTrueLayer(accounts_per_conn=2, txns_per_account=3, delay=0)
+    for name in ("refresh_token", "get_accounts", "get_balance", "get_transactions"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+    runs = _sample("vault_sync_runs_total")
+    ok = _sample("vault_sync_connection_seconds_count", outcome="ok")
+    fetched = _sample("vault_sync_transactions_total", stage="fetched")
+    inserted = _sample("vault_sync_transactions_total", stage="inserted")
+
+    user_id = _seed_user(2)
+    sync_engine.run_sync(user_id=user_id)
+    sync_engine.run_sync(user_id=user_id)
+
+    assert _sample("vault_sync_runs_total") == runs + 2
+    assert _sample("vault_sync_connection_seconds_count", outcome="ok") == ok + 4
+    assert _sample("vault_sync_transactions_total", stage="fetched") == fetched + 24
+    # The second run refetches the same rows and inserts none
+    assert _sample("vault_sync_transactions_total", stage="inserted") == inserted + 12
+
+
+def test_forecasts_record_compute_time_and_cache_hits():
+    _, headers, _, _ = seed_user_with_history(5)
+    computed = _sample("vault_forecast_seconds_count", engine="fast", source="inline")
+    hits = _sample("vault_forecast_requests_total", result="cache")
+
+    assert client.get("/api/forecast?engine=fast", headers=headers).status_code == 200
+    assert client.get("/api/forecast?engine=fast", headers=headers).status_code == 200
+
+    assert _sample("vault_forecast_seconds_count", engine="fast", source="inline") == computed + 1
+    assert _sample("vault_forecast_requests_total", result="cache") == hits + 1
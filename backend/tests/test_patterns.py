@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import app.main  # noqa: F401  (runs migrations)
+from app.services import forecasting
+from benchmarks.bench_patterns import legacy_analyze_patterns, make_history
+
+
+def assert_same_patterns(df):
+    expected_groups, expected_variable = legacy_analyze_patterns(df)
+    groups, variable = forecasting.analyze_patterns(df)
+
+    assert variable == expected_variable
+    assert [g["name"] for g in groups] == [g["name"] for g in expected_groups]
+    for got, want in zip(groups, expected_groups):
+        assert got["frequency"] == want["frequency"]
+        assert got["next_date"] == want["next_date"]
+        assert got["next_amount"] == want["next_amount"]
+        pdt.assert_frame_equal(got["txns"], want["txns"])
+    return groups
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("categorical", [False, True])
+def test_matches_legacy_on_synthetic_histories(seed, categorical):
+    groups = assert_same_patterns(make_history(3000, merchants=150, seed=seed, categorical=categorical))
+    assert {g["frequency"] for g in groups} >= {"weekly", "monthly"}
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=["booked_at", "amount", "description", "merchant"])
+    df["txn_id"] = [f"t{i}" for i in range(len(df))]
+    return df.set_index("booked_at").sort_index()
+
+
+def test_matches_legacy_on_edge_cases():
+    day = datetime(2025, 1, 1)
+    df = _frame(
+        # Monthly bill whose merchant is sometimes missing: those rows key on the description
+        [(day + timedelta(days=30 * i), -9.99, "NETFLIX.COM 123456789012345", "Netflix ") for i in range(4)]
+        + [(day + timedelta(days=30 * i, hours=1), -9.99, "NETFLIX.COM 123456789012345", None) for i in range(3)]
+        # Weekly, near-zero mean: cv is forced to 0
+        + [(day + timedelta(days=7 * i), 0.005 * (-1) ** i, "ROUNDING", "") for i in range(5)]
+        # Yearly but inconsistent amounts
+        + [(day + timedelta(days=365 * i), amount, "INSURANCE", "Aviva") for i, amount in enumerate([-100, -400, -50])]
+        # Same-day duplicates and a single transaction
+        + [(day, -5.0, "COFFEE", "Costa"), (day, -5.0, "COFFEE", "Costa"), (day, -3.0, "ONE OFF", "Shop")]
+        # No description at all
+        + [(day + timedelta(days=7 * i), -20.0, None, None) for i in range(3)]
+    )
+    groups = assert_same_patterns(df)
+    assert [g["name"] for g in groups] == ["netflix", "netflix.com 12345678", "none", "rounding"]
+
+
+def test_empty_frame():
+    df = _frame([])
+    assert forecasting.analyze_patterns(df) == ([], set())
@@ -0,0 +1,77 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app.main  # noqa: F401  (creates the tables)
+from app.database import SessionLocal
+from app.models.tables import User, Connection, Account, Transaction, CategoryRule
+from app.services import recategorise
+
+
+def _seed(n):
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        conn = Connection(user_id=user.id, provider="mock", status="active")
+        db.add(conn)
+        db.commit()
+        account_id = f"acc-{uuid.uuid4()}"
+        db.add(Account(account_id=account_id, connection_id=conn.id, name="Current", type="TRANSACTION", currency="GBP"))
+        for i in range(n):
+            db.add(Transaction(
+                txn_id=f"{account_id}-{i:04d}",
+                account_id=account_id,
+                user_id=user.id,
+                booked_at=datetime(2026, 1, 1),
+                amount=-3.0,
+                currency="GBP",
+                description="ZORBLAX MARKET" if i % 2 else "TESCO",
+                category="Uncategorised" if i % 2 else "Groceries",
+                raw_json={},
+            ))
+        db.commit()
+        return user.id, account_id
+    finally:
+        db.close()
+
+
+def test_recategorise_writes_only_changes_and_resumes_after_crash():
+    user_id, account_id = _seed(25)
+    db = SessionLocal()
+    rule = CategoryRule(pattern="zorblax", category="Markets")
+    db.add(rule)
+    db.commit()
+    try:
+        seen = []
+
+        def crash_after_two_chunks(status):
+            seen.append(status["processed"])
+            if len(seen) == 2:
+                raise RuntimeError("worker killed")
+
+        with pytest.raises(RuntimeError):
+            recategorise.recategorise_all(user_id, chunk_size=10, progress=crash_after_two_chunks)
+
+        status = recategorise.checkpoint_status(db, user_id)
+        assert status["status"] == "failed"
+        assert status["processed"] == 20
+
+        result = recategorise.recategorise_all(user_id, chunk_size=10)
+        assert result["status"] == "done"
+        assert result["processed"] == 25
+        assert result["changed"] == 12
+
+        db.expire_all()
+        categories = {t.category for t in db.query(Transaction).filter(Transaction.account_id == account_id)}
+        assert categories == {"Markets", "Groceries"}
+
+        # Nothing left to change on a fresh run
+        again = recategorise.recategorise_all(user_id, chunk_size=10)
+        assert (again["processed"], again["changed"]) == (25, 0)
+    finally:
+        db.delete(rule)
+        db.commit()
+        db.close()
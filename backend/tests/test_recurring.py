@@ -0,0 +1,235 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import User, Connection, Account, Transaction, RecurringSeries
+from app.services import crypto, forecasting, frames, recurring, sync_engine, truelayer
+
+from tests.test_data_api import client
+from tests.test_sync_engine import FakeTrueLayer, _seed_user
+
+
+def _seed_account(db):
+    user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    conn = Connection(user_id=user.id, provider="mock", status="active")
+    db.add(conn)
+    db.flush()
+    account_id = f"acc-{uuid.uuid4()}"
+    db.add(Account(account_id=account_id, connection_id=conn.id, name="Current", currency="GBP"))
+    db.flush()
+    return user.id, account_id
+
+
+def _add(db, user_id, account_id, rows):
+    for booked_at, amount, description, merchant in rows:
+        db.add(Transaction(
+            txn_id=f"{account_id}-{uuid.uuid4()}", account_id=account_id, user_id=user_id,
+            booked_at=booked_at, amount=amount, currency="GBP", description=description, merchant=merchant,
+            merchant_key=recurring.merchant_key(merchant, description), category="Bills", raw_json={},
+        ))
+    db.flush()
+
+
+def _history(start, months):
+    rows = []
+    for i in range(months):
+        day = start + timedelta(days=30 * i)
+        rows.append((day, -9.99, "NETFLIX.COM", "Netflix"))
+        rows.append((day + timedelta(days=3), -45.0 - i, "DD COUNCIL TAX", None))
+        rows.append((day + timedelta(days=5), -12.0 * (i % 3 + 1), "CORNER SHOP", "Corner Shop"))
+        rows.append((day + timedelta(days=1), -100.0, "TRANSFER TO SAVINGS", None))
+    for i in range(8):
+        rows.append((start + timedelta(days=7 * i, hours=9), -4.5, "GYM CLASS", "Gym"))
+    return rows
+
+
+def _series(db, user_id):
+    return {
+        s.merchant_key: (s.frequency, s.txn_count, s.next_at, s.last_amount, s.has_transfers)
+        for s in db.query(RecurringSeries).filter(RecurringSeries.user_id == user_id)
+    }
+
+
+def test_merchant_key_matches_vectorised_keys():
+    cases = [
+        ("Netflix ", "x"), ("", "A Very Long Description Indeed"), (None, "Short"),
+        (None, None), ("  ", "blank merchant"), ("ÉCOLE", "x"), (float("nan"), "NaN merchant"),
+    ]
+    df = pd.DataFrame(cases, columns=["merchant", "description"])
+    assert list(recurring.pattern_keys(df)) == [recurring.merchant_key(m, d) for m, d in cases]
+
+
+def test_incremental_refresh_matches_rebuild_and_legacy_detection():
+    db = SessionLocal()
+    try:
+        user_id, account_id = _seed_account(db)
+        history = sorted(_history(datetime(2025, 1, 1), 6))
+        # Arrive in three sync-sized batches, refreshing only the keys each one touched
+        for chunk in (history[:5], history[5:20], history[20:]):
+            _add(db, user_id, account_id, chunk)
+            recurring.refresh_series(db, user_id, {recurring.merchant_key(m, d) for _, _, d, m in chunk})
+        incremental = _series(db, user_id)
+
+        recurring.rebuild_series(db, user_id=user_id)
+        assert _series(db, user_id) == incremental
+
+        df = frames.load_transactions_frame(db, user_id=user_id).set_index("booked_at").sort_index()
+        groups, _ = forecasting.analyze_patterns(df)
+        assert {g["name"]: (g["frequency"], len(g["txns"]), g["next_date"], g["next_amount"]) for g in groups} == {
+            key: (frequency, count, next_at, last_amount)
+            for key, (frequency, count, next_at, last_amount, _) in incremental.items()
+        }
+        assert set(incremental) == {"netflix", "dd council tax", "gym", "transfer to savings"}
+        assert incremental["transfer to savings"][4] is True
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_migration_backfills_series_for_existing_history(tmp_path):
+    from alembic import command
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.migrations import alembic_config
+
+    engine = create_engine(f"sqlite:///{tmp_path}/upgrade.db")
+    with engine.begin() as connection:
+        command.upgrade(alembic_config(connection), "0011")
+    with Session(engine) as db:
+        user_id, account_id = _seed_account(db)
+        _add(db, user_id, account_id, _history(datetime(2025, 1, 1), 6))
+        db.commit()
+        assert _series(db, user_id) == {}
+    with engine.begin() as connection:
+        command.upgrade(alembic_config(connection), "head")
+    with Session(engine) as db:
+        backfilled = _series(db, user_id)
+        recurring.rebuild_series(db, user_id=user_id)
+        assert backfilled == _series(db, user_id)
+        assert set(backfilled) == {"netflix", "dd council tax", "gym", "transfer to savings"}
+    engine.dispose()
+
+
+def test_forecast_projection_from_series_matches_detection():
+    db = SessionLocal()
+    try:
+        user_id, account_id = _seed_account(db)
+        _add(db, user_id, account_id, _history(datetime(2025, 1, 1), 6))
+        recurring.rebuild_series(db, user_id=user_id)
+
+        df = frames.load_transactions_frame(db, user_id=user_id).set_index("booked_at").sort_index()
+        df = df[~df["description"].map(recurring.is_transfer)]
+        expected_future, expected_variable = forecasting.detect_recurring(df)
+        future, variable = forecasting.detect_recurring(df, recurring.load_series(db, user_id))
+
+        key = ["name", "ds", "amount", "frequency"]
+        assert future[key].sort_values("name").values.tolist() == expected_future[key].sort_values("name").values.tolist()
+        assert sorted(variable["txn_id"]) == sorted(expected_variable["txn_id"])
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_transactions_endpoint_classifies_from_series():
+    from app.auth_utils import create_access_token
+
+    db = SessionLocal()
+    try:
+        user_id, account_id = _seed_account(db)
+        _add(db, user_id, account_id, _history(datetime(2025, 1, 1), 4))
+        recurring.rebuild_series(db, user_id=user_id)
+        email = db.get(User, user_id).email
+        db.commit()
+    finally:
+        db.close()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    # A one-month window holds a single Netflix payment; it is still a bill
+    body = client.get("/api/transactions?start_date=2025-01-01&end_date=2025-01-10", headers=headers).json()
+    by_desc = {t["description"]: t["classification"] for t in body}
+    assert by_desc["NETFLIX.COM"] == "bill"
+    assert by_desc["CORNER SHOP"] == "variable"
+
+
+def test_sync_sets_merchant_key_and_refreshes_series(monkeypatch):
+    class MonthlyBills(FakeTrueLayer):
+        def get_transactions(self, access_token, account_id, from_date, to_date):
+            return [
+                {
+                    "transaction_id": f"{account_id}-m{i}",
+                    "timestamp": f"2025-{i + 1:02d}-15T00:00:00Z",
+                    "amount": -30.0,
+                    "currency": "GBP",
+                    "description": "VODAFONE LTD",
+                    "merchant_name": "Vodafone",
+                }
+                for i in range(4)
+            ]
+
+    fake = MonthlyBills(accounts_per_conn=1, delay=0)
+    for name in ("refresh_token", "get_accounts", "get_balance", "get_transactions"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+
+    user_id = _seed_user(1)
+    sync_engine.run_sync(user_id=user_id)
+
+    db = SessionLocal()
+    try:
+        keys = {k for (k,) in db.query(Transaction.merchant_key).filter(Transaction.user_id == user_id)}
+        assert keys == {"vodafone"}
+        series = _series(db, user_id)
+        assert series["vodafone"][:2] == ("monthly", 4)
+        assert series["vodafone"][2] == datetime(2025, 4, 15) + timedelta(days=30)
+    finally:
+        db.close()
+
+
+def test_concurrent_connections_of_one_user_share_a_series(monkeypatch):
+    class AlternateMonths(FakeTrueLayer):
+        # Each connection sees every other month of the same bill; only together are they monthly
+        def get_transactions(self, access_token, account_id, from_date, to_date):
+            offset = int(access_token.rsplit("-", 1)[-1])
+            return [
+                {
+                    "transaction_id": f"{account_id}-m{month}",
+                    "timestamp": f"2025-{month:02d}-15T00:00:00Z",
+                    "amount": -12.0,
+                    "currency": "GBP",
+                    "description": "NETFLIX.COM",
+                    "merchant_name": "Netflix",
+                }
+                for month in range(1 + offset, 13, 2)
+            ]
+
+        def refresh_token(self, refresh_token):
+            return {"access_token": f"access-{refresh_token}", "refresh_token": refresh_token}
+
+    fake = AlternateMonths(accounts_per_conn=1, delay=0.02)
+    for name in ("refresh_token", "get_accounts", "get_balance", "get_transactions"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+    monkeypatch.setattr(sync_engine.settings, "SYNC_MAX_WORKERS", 2)
+
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        for offset in range(2):
+            db.add(Connection(
+                user_id=user.id, provider="mock", status="active",
+                refresh_token_enc=crypto.encrypt(f"{uuid.uuid4().hex}-{offset}"),
+            ))
+        db.commit()
+
+        stats = sync_engine.run_sync(user_id=user.id)
+        assert stats.connections_ok == 2
+        series = _series(db, user.id)
+        assert series["netflix"][:2] == ("monthly", 12)
+    finally:
+        db.close()
@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.auth_utils import create_access_token
+from app.database import SessionLocal
+from app.models.tables import User, Connection, Account, CategoryRule, MonthlyCategoryTotal
+from app.services import ingest, recategorise, rollups
+
+client = TestClient(app)
+
+
+def _snapshot(db, user_id):
+    return {
+        (r.month, r.category): (round(r.total, 2), r.txn_count)
+        for r in db.query(MonthlyCategoryTotal).filter(MonthlyCategoryTotal.user_id == user_id, MonthlyCategoryTotal.txn_count > 0)
+    }
+
+
+def test_rollup_tracks_ingest_and_recategorise_and_matches_rebuild():
+    db = SessionLocal()
+    rule = None
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        conn = Connection(user_id=user.id, provider="mock", status="active")
+        db.add(conn)
+        db.commit()
+        account_id = f"acc-{uuid.uuid4()}"
+        db.add(Account(account_id=account_id, connection_id=conn.id, name="Current", type="TRANSACTION", currency="GBP"))
+        db.flush()
+
+        rows = [
+            {"txn_id": f"{account_id}-{i}", "account_id": account_id, "user_id": user.id,
+             "booked_at": datetime(2026, 1 + i % 2, 10), "amount": -10.0 - i, "currency": "GBP",
+             "description": "QUUXMART" if i % 3 == 0 else "TESCO", "merchant": None,
+             "category": "Uncategorised" if i % 3 == 0 else "Groceries", "raw_json": {}}
+            for i in range(6)
+        ]
+        result = ingest.ingest_transactions(db, account_id, rows)
+        rollups.add_transactions(db, (r for r in rows if r["txn_id"] in set(result.inserted_ids)))
+        db.commit()
+        # Re-ingesting the same rows inserts nothing and must not double count
+        again = ingest.ingest_transactions(db, account_id, rows)
+        rollups.add_transactions(db, (r for r in rows if r["txn_id"] in set(again.inserted_ids)))
+        db.commit()
+
+        assert _snapshot(db, user.id) == {
+            ("2026-01", "Uncategorised"): (-10.0, 1),
+            ("2026-01", "Groceries"): (-26.0, 2),
+            ("2026-02", "Uncategorised"): (-13.0, 1),
+            ("2026-02", "Groceries"): (-26.0, 2),
+        }
+
+        rule = CategoryRule(pattern="quuxmart", category="Markets")
+        db.add(rule)
+        db.commit()
+        recategorise.recategorise_all(user.id, restart=True)
+        db.expire_all()
+        incremental = _snapshot(db, user.id)
+        assert ("2026-01", "Uncategorised") not in incremental
+        assert incremental[("2026-02", "Markets")] == (-13.0, 1)
+
+        rollups.rebuild_monthly_totals(db, user_id=user.id)
+        db.commit()
+        assert _snapshot(db, user.id) == incremental
+
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+        resp = client.get("/api/summary/monthly", headers=headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert [r["month"] for r in body] == ["2026-02", "2026-02", "2026-01", "2026-01"]
+        assert {"month": "2026-01", "category": "Markets", "total": -10.0} in body
+    finally:
+        if rule is not None:
+            db.delete(rule)
+            db.commit()
+        db.close()
@@ -0,0 +1,224 @@
+import threading
+import time
+import uuid
+
+import requests
+
+import app.main  # noqa: F401  (creates the tables)
+from app.database import SessionLocal
+from app.models.tables import User, Connection, Account, Transaction, Balance, MonthlyCategoryTotal
+from app.services import crypto, sync_engine, truelayer
+
+
+class FakeTrueLayer:
+    def __init__(self, accounts_per_conn=3, txns_per_account=5, delay=0.02):
+        self.accounts_per_conn = accounts_per_conn
+        self.txns_per_account = txns_per_account
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+
+    def refresh_token(self, refresh_token):
+        self._enter()
+        return {"access_token": f"access-{refresh_token}", "refresh_token": refresh_token}
+
+    def get_accounts(self, access_token):
+        self._enter()
+        prefix = access_token.replace("access-", "")
+        return [
+            {
+                "account_id": f"{prefix}-acc{i}",
+                "display_name": f"Account {i}",
+                "account_type": "TRANSACTION",
+                "currency": "GBP",
+                "provider": {"provider_id": "mock"},
+            }
+            for i in range(self.accounts_per_conn)
+        ]
+
+    def get_balance(self, access_token, account_id):
+        self._enter()
+        return [{"update_timestamp": "2026-01-01T00:00:00Z", "available": 10.0, "current": 12.0}]
+
+    def get_transactions(self, access_token, account_id, from_date, to_date):
+        self._enter()
+        return [
+            {
+                "transaction_id": f"{account_id}-t{i}",
+                "timestamp": f"2026-01-{i + 1:02d}T00:00:00Z",
+                "amount": -5.0,
+                "currency": "GBP",
+                "description": "TESCO STORES",
+            }
+            for i in range(self.txns_per_account)
+        ]
+
+
+def _seed_user(n_connections):
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        for _ in range(n_connections):
+            db.add(Connection(
+                user_id=user.id,
+                provider="mock",
+                refresh_token_enc=crypto.encrypt(uuid.uuid4().hex),
+                status="active",
+            ))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def test_run_sync_is_concurrent_and_bounded(monkeypatch):
+    fake = FakeTrueLayer()
+    for name in ("refresh_token", "get_accounts", "get_balance", "get_transactions"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+    monkeypatch.setattr(sync_engine.settings, "SYNC_MAX_WORKERS", 4)
+    monkeypatch.setattr(sync_engine.settings, "SYNC_MAX_CONCURRENCY", 6)
+
+    user_id = _seed_user(6)
+    stats = sync_engine.run_sync(user_id=user_id)
+
+    assert stats.connections_ok == 6
+    assert stats.connections_failed == 0
+    assert stats.accounts == 18
+    assert stats.transactions_inserted == 90
+    assert stats.http_calls == 6 * 2 + 18 * 2
+    assert 1 < fake.max_in_flight <= 6
+
+    db = SessionLocal()
+    try:
+        conn_ids = [c.id for c in db.query(Connection).filter(Connection.user_id == user_id)]
+        acc_ids = [a.account_id for a in db.query(Account).filter(Account.connection_id.in_(conn_ids))]
+        assert len(acc_ids) == 18
+        assert db.query(Transaction).filter(Transaction.account_id.in_(acc_ids)).count() == 90
+        assert db.query(Balance).filter(Balance.account_id.in_(acc_ids)).count() == 18
+        # user_id is denormalised onto every ingested row
+        assert db.query(Transaction).filter(Transaction.user_id == user_id).count() == 90
+        assert db.query(Balance).filter(Balance.user_id == user_id).count() == 18
+    finally:
+        db.close()
+
+    # A second run re-fetches the overlap window but inserts nothing new
+    again = sync_engine.run_sync(user_id=user_id)
+    assert again.transactions_fetched == 90
+    assert again.transactions_inserted == 0
+    # ...and reuses the access tokens from the first run instead of refreshing them
+    assert again.tokens_refreshed == 0
+    assert again.http_calls == 6 + 18 * 2
+
+
+def test_failed_connection_does_not_stop_the_run(monkeypatch):
+    fake = FakeTrueLayer(delay=0)
+    for name in ("refresh_token", "get_accounts", "get_balance"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+
+    def flaky_transactions(access_token, account_id, from_date, to_date):
+        if account_id.endswith("acc1"):
+            raise RuntimeError("provider unavailable")
+        return fake.get_transactions(access_token, account_id, from_date, to_date)
+
+    monkeypatch.setattr(truelayer, "get_transactions", flaky_transactions)
+
+    user_id = _seed_user(2)
+    stats = sync_engine.run_sync(user_id=user_id)
+
+    assert stats.connections_failed == 2
+    # acc0 of each connection was committed before acc1 failed
+    assert stats.accounts == 2
+    assert all("provider unavailable" in err for err in stats.errors.values())
+
+
+def test_rejected_access_token_is_refreshed_once(monkeypatch):
+    fake = FakeTrueLayer(accounts_per_conn=1, delay=0)
+    for name in ("refresh_token", "get_balance", "get_transactions"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+    user_id = _seed_user(1)
+    sync_engine.run_sync(user_id=user_id)
+
+    # The provider revokes the stored token before it expires
+    refreshes = []
+    rejected = set()
+
+    def refresh_token(refresh_token):
+        refreshes.append(refresh_token)
+        return {"access_token": f"access-{uuid.uuid4().hex}", "refresh_token": refresh_token, "expires_in": 3600}
+
+    def get_accounts(access_token):
+        if not refreshes:
+            rejected.add(access_token)
+            response = requests.Response()
+            response.status_code = 401
+            raise requests.HTTPError("401 Unauthorized", response=response)
+        return fake.get_accounts(access_token)
+
+    monkeypatch.setattr(truelayer, "refresh_token", refresh_token)
+    monkeypatch.setattr(truelayer, "get_accounts", get_accounts)
+    stats = sync_engine.run_sync(user_id=user_id)
+
+    assert stats.connections_ok == 1
+    assert len(refreshes) == 1 and len(rejected) == 1
+
+
+def test_relinked_account_moves_its_rollup_and_forecasts_to_the_new_owner(monkeypatch):
+    fake = FakeTrueLayer(accounts_per_conn=1, delay=0)
+    for name in ("refresh_token", "get_accounts", "get_balance", "get_transactions"):
+        monkeypatch.setattr(truelayer, name, getattr(fake, name))
+
+    # Both users' connections reach the same bank account
+    refresh_token = uuid.uuid4().hex
+    db = SessionLocal()
+    try:
+        old_owner, new_owner = (User(email=f"{uuid.uuid4()}@example.com", hashed_password="x") for _ in range(2))
+        db.add_all([old_owner, new_owner])
+        db.flush()
+        for user in (old_owner, new_owner):
+            db.add(Connection(
+                user_id=user.id, provider="mock", refresh_token_enc=crypto.encrypt(refresh_token), status="active",
+            ))
+        db.commit()
+        old_id, new_id = old_owner.id, new_owner.id
+    finally:
+        db.close()
+
+    def buckets(db, user_id):
+        return {
+            (r.month, r.category): (r.total, r.txn_count)
+            for r in db.query(MonthlyCategoryTotal).filter(MonthlyCategoryTotal.user_id == user_id)
+        }
+
+    def versions(db):
+        return [db.get(User, user_id).data_version for user_id in (old_id, new_id)]
+
+    sync_engine.run_sync(user_id=old_id)
+    db = SessionLocal()
+    try:
+        before = versions(db)
+    finally:
+        db.close()
+    relinked = sync_engine.run_sync(user_id=new_id)
+    assert relinked.transactions_inserted == 0
+
+    db = SessionLocal()
+    try:
+        # Both users' cached forecasts are stale
+        assert all(after > was for after, was in zip(versions(db), before))
+        assert buckets(db, old_id) == {}
+        moved = buckets(db, new_id)
+        assert sum(count for _, count in moved.values()) == 5
+        assert sum(total for total, _ in moved.values()) == -25.0
+    finally:
+        db.close()
@@ -0,0 +1,146 @@
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import Connection, SyncJob, User
+from app.services import crypto, sync_queue, truelayer
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    # Jobs left by other tests would be claimed too
+    session.query(SyncJob).delete()
+    session.commit()
+    yield session
+    session.close()
+
+
+def _connections(db, n):
+    user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    conns = [
+        Connection(user_id=user.id, provider="mock", status="active", refresh_token_enc=crypto.encrypt(f"rt-{i}"))
+        for i in range(n)
+    ]
+    db.add_all(conns)
+    db.commit()
+    return [c.id for c in conns]
+
+
+def _job(db, connection_id):
+    return db.get(SyncJob, connection_id, populate_existing=True)
+
+
+def test_enqueue_is_idempotent_and_claims_never_overlap(db):
+    ids = _connections(db, 4)
+    assert sync_queue.enqueue(db, ids) == 4
+    db.commit()
+    assert sync_queue.enqueue(db, ids) == 0  # already queued
+
+    first = sync_queue.claim(db, "w1", limit=3)
+    second = sync_queue.claim(db, "w2", limit=3)
+    assert len(first) == 3 and len(second) == 1
+    assert set(first) | set(second) == set(ids)
+    assert sync_queue.claim(db, "w3", limit=3) == []
+
+    job = _job(db, second[0])
+    assert (job.status, job.lease_owner, job.attempts) == ("running", "w2", 1)
+    assert sync_queue.heartbeat(db, "w2", second + first) == set(second)
+
+    # Running jobs are not requeued underneath their worker
+    assert sync_queue.enqueue(db, ids) == 0
+    assert sync_queue.finish(db, "w2", second[0]) == "done"
+    job = _job(db, second[0])
+    assert (job.status, job.lease_owner, job.attempts) == ("done", None, 0)
+
+
+def test_lapsed_lease_is_reclaimed_and_the_old_worker_loses_it(db):
+    (cid,) = _connections(db, 1)
+    sync_queue.enqueue(db, [cid])
+    db.commit()
+    assert sync_queue.claim(db, "w1", limit=1, lease_seconds=60) == [cid]
+    assert sync_queue.claim(db, "w2", limit=1) == []
+
+    # w1 stopped heartbeating
+    db.query(SyncJob).filter(SyncJob.connection_id == cid).update(
+        {SyncJob.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+    assert sync_queue.claim(db, "w2", limit=1) == [cid]
+    assert _job(db, cid).attempts == 2
+    assert sync_queue.heartbeat(db, "w1", [cid]) == set()
+    assert sync_queue.finish(db, "w1", cid) == "lost"
+    assert sync_queue.finish(db, "w2", cid) == "done"
+
+
+def test_failures_back_off_then_give_up(db, monkeypatch):
+    monkeypatch.setattr(sync_queue.settings, "SYNC_JOB_MAX_ATTEMPTS", 2)
+    (cid,) = _connections(db, 1)
+    sync_queue.enqueue(db, [cid])
+    db.commit()
+
+    sync_queue.claim(db, "w1", limit=1)
+    assert sync_queue.finish(db, "w1", cid, "503 unavailable") == "retry"
+    job = _job(db, cid)
+    assert job.status == "queued" and job.last_error == "503 unavailable"
+    assert job.run_after > datetime.utcnow() + timedelta(seconds=20)
+    assert sync_queue.claim(db, "w1", limit=1) == []  # still backing off
+
+    # A manual sync brings it forward
+    assert sync_queue.enqueue(db, [cid]) == 1
+    db.commit()
+    assert sync_queue.claim(db, "w1", limit=1) == [cid]
+    assert sync_queue.finish(db, "w1", cid, "503 unavailable") == "failed"
+    assert _job(db, cid).status == "failed"
+
+
+def test_enqueue_due_only_queues_connections_that_are_due(db):
+    ids = _connections(db, 3)
+    now = datetime.utcnow()
+    for cid, next_sync_at in zip(ids, (now + timedelta(minutes=30), now - timedelta(minutes=1), None)):
+        db.get(Connection, cid).next_sync_at = next_sync_at
+    db.add(SyncJob(connection_id=ids[1], status="done", run_after=now, attempts=0, finished_at=now - timedelta(hours=1)))
+    db.commit()
+    sync_queue.enqueue_due(db)
+    db.commit()
+    assert _job(db, ids[0]) is None
+    assert _job(db, ids[1]).status == "queued"
+    assert _job(db, ids[2]).status == "queued"
+
+
+def test_concurrent_workers_sync_each_connection_once(db, monkeypatch):
+    ids = _connections(db, 6)
+    refreshed = Counter()
+    lock = threading.Lock()
+
+    def refresh_token(refresh_token):
+        with lock:
+            refreshed[refresh_token] += 1
+        return {"access_token": f"access-{refresh_token}", "refresh_token": refresh_token, "expires_in": 3600}
+
+    monkeypatch.setattr(truelayer, "refresh_token", refresh_token)
+    monkeypatch.setattr(truelayer, "get_accounts", lambda access_token: [])
+    sync_queue.enqueue(db, ids)
+    db.commit()
+
+    results = []
+    workers = [
+        threading.Thread(target=lambda i=i: results.append(sync_queue.run_worker(f"w{i}", batch=2, once=True)))
+        for i in range(3)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    assert sum(r.claimed for r in results) == 6
+    assert sum(r.done for r in results) == 6
+    assert sorted(refreshed.values()) == [1] * 6
+    assert {_job(db, cid).status for cid in ids} == {"done"}
@@ -0,0 +1,86 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import Connection, User
+from app.services import crypto, sync_engine, sync_schedule, truelayer
+
+NOW = datetime(2026, 10, 17, 12, 0)
+
+
+def _minutes(rate, last_change_at=None):
+    return sync_schedule.interval(rate, last_change_at, NOW).total_seconds() / 60
+
+
+def test_interval_follows_activity():
+    assert _minutes(None) == 1440  # never seen a transaction
+    assert _minutes(0.1) == 1440  # one every ten days
+    assert _minutes(4) == 180  # 0.5 expected new transactions every 3 hours
+    assert _minutes(48) == 30  # clamped to the minimum
+    # Anything that changed this week keeps at least the old hourly sync
+    assert _minutes(4, last_change_at=NOW - timedelta(days=2)) == 60
+    assert _minutes(48, last_change_at=NOW - timedelta(days=2)) == 30
+    assert _minutes(4, last_change_at=NOW - timedelta(days=8)) == 180
+
+
+def test_rate_decays_with_a_half_life():
+    assert sync_schedule.update_rate(None, 90, 90) == 1
+    # A week of silence halves it, whether seen in one sync or many
+    assert sync_schedule.update_rate(10, 0, 7) == pytest.approx(5)
+    rate = 10
+    for _ in range(7 * 24):
+        rate = sync_schedule.update_rate(rate, 0, 1 / 24)
+    assert rate == pytest.approx(5)
+    assert sync_schedule.update_rate(2, 7, 1) > 2
+
+
+def test_record_sync_schedules_the_next_one():
+    conn = Connection()
+    sync_schedule.record_sync(conn, inserted=360, history_days=90, now=NOW)
+    assert conn.txn_rate == 4
+    assert conn.last_change_at == conn.last_synced_at == NOW
+    assert conn.next_sync_at == NOW + timedelta(hours=1)
+
+    later = NOW + timedelta(days=10)
+    sync_schedule.record_sync(conn, inserted=0, history_days=90, now=later)
+    assert conn.txn_rate < 2
+    assert conn.last_change_at == NOW
+    assert conn.next_sync_at > later + timedelta(hours=6)
+
+
+def test_scheduled_run_only_syncs_due_connections(monkeypatch):
+    synced = []
+
+    def refresh_token(refresh_token):
+        synced.append(refresh_token)
+        return {"access_token": f"access-{refresh_token}", "refresh_token": refresh_token, "expires_in": 3600}
+
+    monkeypatch.setattr(truelayer, "refresh_token", refresh_token)
+    monkeypatch.setattr(truelayer, "get_accounts", lambda access_token: [])
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        due, later = (
+            Connection(user_id=user.id, provider="mock", status="active",
+                       refresh_token_enc=crypto.encrypt(name), next_sync_at=next_sync_at)
+            for name, next_sync_at in (("due", now - timedelta(minutes=1)), ("later", now + timedelta(hours=1)))
+        )
+        db.add_all([due, later])
+        db.commit()
+
+        stats = sync_engine.run_sync(user_id=user.id, due_only=True)
+        assert stats.connections_total == 1
+        assert synced == ["due"]
+        db.refresh(due)
+        # Nothing new, and never any activity: the next sync is a day away
+        assert due.next_sync_at > now + timedelta(hours=23)
+        assert due.txn_rate == 0
+    finally:
+        db.close()
@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import Connection, User
+from app.services import crypto, tokens
+
+
+def _connection(expires_at=None, access_token="old-access"):
+    db = SessionLocal()
+    user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    conn = Connection(
+        user_id=user.id, provider="mock", status="active",
+        refresh_token_enc=crypto.encrypt("refresh"),
+        access_token_enc=crypto.encrypt(access_token) if access_token else None,
+        expires_at=expires_at,
+    )
+    db.add(conn)
+    db.commit()
+    return db, conn
+
+
+def test_store_tokens_records_expiry():
+    conn = Connection()
+    now = datetime(2026, 1, 1, 12, 0)
+    tokens.store_tokens(conn, {"access_token": "a", "refresh_token": "r", "expires_in": 1800}, now=now)
+    assert conn.expires_at == now + timedelta(seconds=1800)
+    assert crypto.decrypt(conn.access_token_enc) == "a"
+    assert crypto.decrypt(conn.refresh_token_enc) == "r"
+    assert tokens.is_fresh(conn, now=now + timedelta(seconds=1400), margin=300)
+    assert not tokens.is_fresh(conn, now=now + timedelta(seconds=1600), margin=300)
+
+
+def test_fresh_token_is_reused_and_stale_one_refreshed():
+    calls = []
+
+    def refresh_fn(refresh_token):
+        calls.append(refresh_token)
+        return {"access_token": "new-access", "refresh_token": "refresh-2", "expires_in": 3600}
+
+    db, conn = _connection(expires_at=datetime.utcnow() + timedelta(hours=1))
+    try:
+        assert tokens.access_token(db, conn, refresh_fn) == ("old-access", False)
+        assert calls == []
+
+        conn.expires_at = datetime.utcnow() + timedelta(seconds=60)  # inside the margin
+        db.commit()
+        assert tokens.access_token(db, conn, refresh_fn) == ("new-access", True)
+        assert calls == ["refresh"]
+        db.expire_all()
+        assert crypto.decrypt(conn.refresh_token_enc) == "refresh-2"
+        assert conn.expires_at > datetime.utcnow() + timedelta(minutes=55)
+    finally:
+        db.close()
+
+
+def test_concurrent_refreshes_spend_the_refresh_token_once():
+    db, conn = _connection(access_token=None)
+    connection_id = conn.id
+    db.close()
+    calls = []
+    lock = threading.Lock()
+
+    def refresh_fn(refresh_token):
+        with lock:
+            calls.append(refresh_token)
+        time.sleep(0.05)
+        return {"access_token": "new-access", "refresh_token": "refresh-2", "expires_in": 3600}
+
+    def worker(_):
+        session = SessionLocal()
+        try:
+            return tokens.access_token(session, session.get(Connection, connection_id), refresh_fn)[0]
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(worker, range(4))) == ["new-access"] * 4
+    assert len(calls) == 1
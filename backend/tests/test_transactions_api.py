@@ -0,0 +1,106 @@
+import json
+from datetime import datetime
+
+import app.main  # noqa: F401  (runs migrations)
+from app.database import SessionLocal
+from app.models.tables import Transaction
+
+from tests.test_data_api import client, seed_user_with_history
+
+
+def _add_same_day(user_id, account_id, n):
+    """n transactions sharing one timestamp, so only txn_id orders them."""
+    db = SessionLocal()
+    try:
+        for i in range(n):
+            db.add(Transaction(
+                txn_id=f"{account_id}-same-{i}", account_id=account_id, user_id=user_id,
+                booked_at=datetime(2026, 1, 2), amount=-1.0, currency="GBP",
+                description="CAFE", category="Eating out", raw_json={},
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _all_pages(headers, limit):
+    seen, cursor, pages = [], None, 0
+    while True:
+        url = f"/api/transactions?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(url, headers=headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert len(body) <= limit
+        seen.extend(t["txn_id"] for t in body)
+        pages += 1
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen, pages
+
+
+def test_keyset_pages_cover_every_row_once_newest_first():
+    user_id, headers, account_id, _ = seed_user_with_history(5)
+    _add_same_day(user_id, account_id, 4)
+
+    full = client.get("/api/transactions", headers=headers)
+    assert "X-Next-Cursor" not in full.headers
+    expected = [t["txn_id"] for t in full.json()]
+    booked = [t["booked_at"] for t in full.json()]
+    assert len(expected) == 9
+    assert booked == sorted(booked, reverse=True)
+
+    seen, pages = _all_pages(headers, limit=2)
+    assert seen == expected
+    assert pages == 5
+
+
+def test_undated_rows_never_end_a_page():
+    user_id, headers, account_id, _ = seed_user_with_history(3)
+    db = SessionLocal()
+    try:
+        for i in range(2):
+            db.add(Transaction(
+                txn_id=f"{account_id}-undated-{i}", account_id=account_id, user_id=user_id,
+                booked_at=None, amount=-1.0, currency="GBP", description="CAFE", category="Eating out", raw_json={},
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+    # Wherever the dialect sorts NULLs, a 4-row page would end on an undated row
+    seen, _ = _all_pages(headers, limit=4)
+    assert len(seen) == 3
+    assert not any("undated" in txn_id for txn_id in seen)
+
+
+def test_bad_cursor_and_limit_are_rejected():
+    _, headers, _, _ = seed_user_with_history(1)
+    assert client.get("/api/transactions?cursor=not-a-cursor", headers=headers).status_code == 400
+    assert client.get("/api/transactions?limit=0", headers=headers).status_code == 422
+    assert client.get("/api/transactions?format=xml", headers=headers).status_code == 422
+
+
+def test_ndjson_streams_the_same_rows_as_json():
+    user_id, headers, account_id, _ = seed_user_with_history(3)
+    _add_same_day(user_id, account_id, 2)
+
+    expected = client.get("/api/transactions", headers=headers).json()
+    resp = client.get("/api/transactions?format=ndjson", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["txn_id"] for r in rows] == [t["txn_id"] for t in expected]
+    assert rows[0]["account_name"] == "Current"
+    assert rows[0]["classification"] == "variable"
+
+    # A cursor resumes the stream where a JSON page stopped
+    page = client.get("/api/transactions?limit=2", headers=headers)
+    rest = client.get(f"/api/transactions?format=ndjson&cursor={page.headers['X-Next-Cursor']}", headers=headers)
+    assert [json.loads(line)["txn_id"] for line in rest.text.splitlines()] == [t["txn_id"] for t in expected[2:]]
+
+
+def test_other_users_rows_never_appear_in_a_stream():
+    _, headers, account_id, _ = seed_user_with_history(2)
+    seed_user_with_history(3)
+    rows = client.get("/api/transactions?format=ndjson", headers=headers).text.splitlines()
+    assert {json.loads(line)["account_id"] for line in rows} == {account_id}
@@ -0,0 +1,225 @@
+import json
+import socket
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from prometheus_client import REGISTRY
+
+import app.main  # noqa: F401  (runs migrations)
+from app.services import truelayer
+from app.services.truelayer import TokenBucket, TrueLayerClient
+
+
+class StubServer:
+    """
+    Local HTTP server answering from per-path scripts of (status, headers, body, delay)
+    steps; the last step repeats. Records each request's path and client port.
+    """
+
+    def __init__(self):
+        self.scripts = defaultdict(lambda: [(200, {}, {"results": []}, 0)])
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def _answer(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                path = self.path.split("?")[0]
+                stub.requests.append((self.command, path, self.client_address[1]))
+                script = stub.scripts[path]
+                status, headers, body, delay = script.pop(0) if len(script) > 1 else script[0]
+                time.sleep(delay)
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client timed out and hung up
+
+            do_GET = do_POST = _answer
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def script(self, path, *steps):
+        self.scripts[path] = [
+            (step + (0,)) if len(step) == 3 else step for step in steps
+        ]
+
+    def attempts(self, path):
+        return sum(1 for _, p, _ in self.requests if p == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+class Sleeps(list):
+    """Records requested sleeps; waits only briefly so bucket pauses still elapse."""
+
+    def __call__(self, seconds):
+        self.append(seconds)
+        time.sleep(min(seconds, 0.02))
+
+
+def _client(stub, **kwargs):
+    options = dict(auth_url=stub.url, api_url=stub.url, timeout=(1, 1), backoff_base=0.1, rate_limit=0, sleep=Sleeps())
+    options.update(kwargs)
+    return TrueLayerClient(**options)
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_calls_reuse_one_keep_alive_connection(stub):
+    stub.script("/data/v1/accounts", (200, {}, {"results": [{"account_id": "a1"}]}))
+    client = _client(stub)
+    for _ in range(5):
+        assert client.get_accounts("token") == [{"account_id": "a1"}]
+    assert len({port for _, _, port in stub.requests}) == 1
+    assert client.stats()["accounts"]["calls"] == 5
+
+
+def test_server_errors_are_retried_with_jittered_backoff(stub):
+    stub.script("/data/v1/accounts/a1/transactions", (503, {}, {}), (502, {}, {}), (200, {}, {"results": [1, 2]}))
+    retries = _sample("vault_truelayer_retries_total", endpoint="transactions")
+    client = _client(stub)
+
+    assert client.get_transactions("token", "a1", "2026-01-01", "2026-01-31") == [1, 2]
+    assert stub.attempts("/data/v1/accounts/a1/transactions") == 3
+    assert len(client._sleep) == 2
+    assert 0 <= client._sleep[0] <= 0.1 and 0 <= client._sleep[1] <= 0.2
+    stats = client.stats()["transactions"]
+    assert (stats["calls"], stats["attempts"], stats["retries"], stats["failures"]) == (1, 3, 2, 0)
+    assert _sample("vault_truelayer_retries_total", endpoint="transactions") == retries + 2
+    assert _sample("vault_truelayer_responses_total", endpoint="transactions", status="503") >= 1
+
+
+def test_retries_give_up_after_max_retries(stub):
+    stub.script("/data/v1/accounts", (500, {}, {}))
+    client = _client(stub, max_retries=2)
+    with pytest.raises(requests.HTTPError) as exc:
+        client.get_accounts("token")
+    assert exc.value.response.status_code == 500
+    assert stub.attempts("/data/v1/accounts") == 3
+    assert client.stats()["accounts"]["failures"] == 1
+
+
+def test_429_retry_after_pauses_the_whole_client(stub):
+    stub.script("/data/v1/accounts", (429, {"Retry-After": "0.3"}, {}), (200, {}, {"results": []}))
+    client = _client(stub)
+    started = time.monotonic()
+    assert client.get_accounts("token") == []
+    assert client._sleep[0] == pytest.approx(0.3)
+    # The bucket held the retry until Retry-After had passed, for every thread
+    assert time.monotonic() - started >= 0.3
+
+
+def test_retry_after_beyond_backoff_max_fails_fast(stub):
+    stub.script("/data/v1/accounts", (429, {"Retry-After": "120"}, {}))
+    client = _client(stub, backoff_max=5)
+    with pytest.raises(requests.HTTPError):
+        client.get_accounts("token")
+    assert stub.attempts("/data/v1/accounts") == 1
+    # The other threads back off for at most backoff_max, not the full two minutes
+    assert time.monotonic() < client.bucket._paused_until <= time.monotonic() + 5
+
+
+def test_token_posts_are_only_resent_when_unprocessed(stub):
+    client = _client(stub)
+    stub.script("/connect/token", (500, {}, {}))
+    with pytest.raises(requests.HTTPError):
+        client.refresh_token("rt")
+    assert stub.attempts("/connect/token") == 1
+
+    stub.script("/connect/token", (503, {}, {}), (200, {}, {"access_token": "a", "refresh_token": "r"}))
+    assert client.refresh_token("rt") == {"access_token": "a", "refresh_token": "r"}
+    assert stub.attempts("/connect/token") == 3
+
+
+def test_read_timeouts_retry_gets_but_not_token_posts(stub):
+    client = _client(stub, timeout=(1, 0.2))
+    stub.script("/data/v1/accounts/a1/balance", (200, {}, {"results": []}, 0.5), (200, {}, {"results": [{"current": 1}]}))
+    assert client.get_balance("token", "a1") == [{"current": 1}]
+
+    stub.script("/connect/token", (200, {}, {}, 0.5))
+    with pytest.raises(requests.ReadTimeout):
+        client.refresh_token("rt")
+    assert stub.attempts("/connect/token") == 1
+
+
+def test_refused_connections_are_retried_even_for_posts():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    url = f"http://127.0.0.1:{port}"
+    client = TrueLayerClient(auth_url=url, api_url=url, timeout=(1, 1), max_retries=2, rate_limit=0, sleep=Sleeps())
+    errors = _sample("vault_truelayer_responses_total", endpoint="token", status="error")
+    with pytest.raises(requests.ConnectionError):
+        client.refresh_token("rt")
+    assert client.stats()["token"]["attempts"] == 3
+    assert _sample("vault_truelayer_responses_total", endpoint="token", status="error") == errors + 3
+
+
+def test_token_bucket_rate_and_burst():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0], sleep=sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    now[0] += 10  # refills to the burst, not beyond
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    bucket.pause(4)
+    assert bucket.acquire() == pytest.approx(4)
+
+
+def test_retry_after_http_date():
+    assert truelayer.retry_after_seconds("7") == 7
+    assert truelayer.retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert truelayer.retry_after_seconds("soon") is None
+    assert truelayer.retry_after_seconds(None) is None
+
+
+def test_module_functions_use_the_shared_client(stub):
+    stub.script("/data/v1/me", (200, {}, {"results": [{"provider": {"provider_id": "mock"}}]}))
+    client = _client(stub)
+    truelayer.set_client(client)
+    try:
+        assert truelayer.get_client() is client
+        assert truelayer.get_metadata("token") == [{"provider": {"provider_id": "mock"}}]
+    finally:
+        truelayer.set_client(None)
+    assert truelayer.get_client() is not client